@@ -0,0 +1,31 @@
+import json
+import numpy as np
+import pandas as pd
+from turtletrader.backtest import run_backtest
+from turtletrader.config import TurtleConfig, SystemConfig
+
+
+def _random_walk(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n)))
+    dates = pd.date_range("2005-01-03", periods=n, freq="B").strftime("%Y-%m-%d")
+    return pd.DataFrame({"date": dates, "open": open_, "high": high, "low": low, "close": close})
+
+
+def test_fast_engine_matches_reference():
+    cfgs = [
+        TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20)),
+        TurtleConfig(s1=SystemConfig(20, 10)),
+        TurtleConfig(atr_len=14, s2=SystemConfig(55, 20)),
+    ]
+    for seed in range(3):
+        df = _random_walk(seed=seed)
+        for cfg in cfgs:
+            ref = run_backtest(df, cfg)
+            fast = run_backtest(df, cfg, engine="fast")
+            assert ref["trades"] == fast["trades"]
+            assert json.dumps(ref["metrics"]) == json.dumps(fast["metrics"])
+            pd.testing.assert_series_equal(ref["equity"], fast["equity"])
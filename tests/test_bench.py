@@ -0,0 +1,44 @@
+import numpy as np
+from turtletrader.bench import compare, run_bench
+from turtletrader.config import PortfolioConfig
+from turtletrader.portfolio import Portfolio
+from turtletrader.synthetic import synthetic_ohlcv, synthetic_universe
+
+
+def test_synthetic_reproducible_and_consistent():
+    a = synthetic_ohlcv(800, seed=7, limit_rate=0.10, lock_prob=0.05)
+    b = synthetic_ohlcv(800, seed=7, limit_rate=0.10, lock_prob=0.05)
+    assert a.equals(b) and not a.equals(synthetic_ohlcv(800, seed=8, limit_rate=0.10))
+    assert (a["high"] >= a[["open", "close"]].max(axis=1) - 1e-9).all()
+    assert (a["low"] <= a[["open", "close"]].min(axis=1) + 1e-9).all()
+    chg = a["close"].pct_change().dropna().abs()
+    assert chg.max() <= 0.10 + 1e-9
+    locked = (a["high"] == a["low"]).to_numpy()
+    assert locked.sum() > 10 and np.allclose(chg[locked[1:]], 0.10)
+
+    data, instruments = synthetic_universe(10, 300, seed=1, cn_fraction=0.3)
+    assert len(data) == 10 and sum(i.rules.t_plus_one for i in instruments) == 3
+
+
+def test_synthetic_lock_bars_block_fills():
+    df = synthetic_ohlcv(2000, seed=7, limit_rate=0.10, lock_prob=0.05)
+    port = Portfolio(PortfolioConfig(instruments=[]))
+    prev = df["close"].shift(1).to_numpy()
+    locked = [i for i in range(1, len(df)) if df["high"].iat[i] == df["low"].iat[i]]
+    assert len(locked) > 50
+    for i in locked:
+        row = df.iloc[i]
+        side = "buy" if row["close"] > prev[i] else "sell"
+        assert port._cn_limit_block(prev[i], row, side, 0.10)
+
+
+def test_bench_runs_and_compares():
+    res = run_bench(["prepare_indicators", "backtest_fast"], quick=True, repeat=1)
+    case = res["cases"]["backtest_fast"]
+    assert case["seconds"] > 0 and case["items"] == case["params"]["bars"]
+    slow = {"cases": {k: dict(v, seconds=v["seconds"] * 0.5) for k, v in res["cases"].items()}}
+    table = compare(res, slow, threshold=0.25)
+    assert (table["status"] == "regressed").all()
+    assert (compare(res, res)["status"] == "ok").all()
+    other = {"cases": {k: dict(v, params={"bars": -1}) for k, v in res["cases"].items()}}
+    assert (compare(res, other)["status"] == "skipped").all()
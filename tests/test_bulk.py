@@ -0,0 +1,65 @@
+import time
+from turtletrader import bulk
+from turtletrader.bulk import DownloadJob, RateLimiter, bulk_download
+from test_store import FakeSource, _bars
+
+
+class FlakySource(FakeSource):
+    def __init__(self, df, fail_first=1):
+        super().__init__(df)
+        self.fail_first = fail_first
+
+    def get_history(self, symbol, start, end, interval):
+        if self.fail_first > 0:
+            self.fail_first -= 1
+            raise ConnectionError("boom")
+        return super().get_history(symbol, start, end, interval)
+
+
+def test_bulk_download_retries_and_resumes(tmp_path):
+    src = FlakySource(_bars(30), fail_first=2)
+    jobs = [DownloadJob(f"S{i}", "fake") for i in range(6)]
+    res = bulk_download(jobs, str(tmp_path), workers=4, rates={"fake": 0}, backoff=0.0,
+                        sources={"fake": src})
+    assert [r.job.symbol for r in res] == [j.symbol for j in jobs]
+    assert all(r.error is None and r.rows == 30 for r in res)
+    n_calls = len(src.calls)
+    # 重跑：库中已有且未过期，不再请求
+    res = bulk_download(jobs, str(tmp_path), workers=4, rates={"fake": 0}, sources={"fake": src})
+    assert len(src.calls) == n_calls and all(r.rows == 30 for r in res)
+
+
+def test_bulk_download_reports_failures_without_store():
+    src = FlakySource(_bars(10), fail_first=100)
+    res = bulk_download([DownloadJob("A", "fake")], workers=1, rates={"fake": 0}, retries=1,
+                        backoff=0.0, sources={"fake": src}, keep=True)
+    assert res[0].error.startswith("ConnectionError") and res[0].data is None
+
+
+def test_rate_limiter_spaces_requests():
+    lim = RateLimiter(rate=50.0, burst=1)
+    t0 = time.monotonic()
+    for _ in range(6):
+        lim.acquire()
+    assert time.monotonic() - t0 >= 0.09
+
+
+def test_aliases_share_source_and_user_rate_wins():
+    src = FakeSource(_bars(10))
+    jobs = [DownloadJob(f"S{i}", "yf" if i % 2 else "yfinance") for i in range(8)]
+    t0 = time.monotonic()
+    # 默认 yfinance 2 次/秒；用户按别名给出的 0（不限速）应生效，且两个别名用同一个数据源实例
+    res = bulk_download(jobs, workers=4, rates={"yf": 0}, sources={"YF": src}, keep=True)
+    assert all(r.error is None for r in res) and len(src.calls) == 8
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_unavailable_source_fails_only_its_jobs(monkeypatch):
+    def get_source(name):
+        raise ImportError(f"{name} is not installed")
+
+    monkeypatch.setattr(bulk, "get_source", get_source)
+    jobs = [DownloadJob("AAPL", "yf"), DownloadJob("A", "fake"), DownloadJob("MSFT", "yfinance")]
+    res = bulk_download(jobs, workers=2, rates={"fake": 0}, sources={"fake": FakeSource(_bars(10))})
+    assert [r.error for r in res[::2]] == ["ImportError: yfinance is not installed"] * 2
+    assert res[1].error is None and res[1].rows == 10
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from turtletrader import cal
+from turtletrader.cal import TradingCalendar
+from turtletrader.config import InstrumentConfig, PortfolioConfig
+
+
+def _weekday_calendar(market="TEST"):
+    days = pd.bdate_range("2024-01-01", "2024-12-31")
+    days = days[days != pd.Timestamp("2024-07-04")]
+    opens = (days + pd.Timedelta(hours=14, minutes=30)).as_unit("ns").asi8
+    closes = (days + pd.Timedelta(hours=21)).as_unit("ns").asi8
+    return TradingCalendar(market, days.as_unit("ns").asi8, opens, closes,
+                           cal._day_ns("2024-01-01"), cal._day_ns("2024-12-31"))
+
+
+def test_calendar_queries_and_roundtrip(tmp_path):
+    c = _weekday_calendar()
+    assert c.is_session(pd.Timestamp("2024-07-03 15:00", tz="America/New_York"))
+    assert not c.is_session("2024-07-04") and not c.is_session("2024-07-06")
+    assert c.next_session("2024-07-03") == pd.Timestamp("2024-07-05")
+    assert c.next_session("2024-07-05", inclusive=True) == pd.Timestamp("2024-07-05")
+    assert c.previous_session("2024-07-08") == pd.Timestamp("2024-07-05")
+    assert c.session_open("2024-07-05") == pd.Timestamp("2024-07-05 14:30", tz="UTC")
+    assert c.session_close("2024-07-06") is None
+    assert len(c.sessions_in_range("2024-07-01", "2024-07-07")) == 4
+    c.save(str(tmp_path / "TEST.npz"))
+    back = TradingCalendar.load(str(tmp_path / "TEST.npz"))
+    assert back.market == "TEST" and np.array_equal(back.sessions, c.sessions)
+    assert (back.start, back.end) == (c.start, c.end)
+
+
+def test_is_trading_day_uses_offline_bundle(tmp_path, monkeypatch):
+    _weekday_calendar("OFFLINE").save(str(tmp_path / "OFFLINE.npz"))
+    monkeypatch.setenv("TURTLE_CALENDAR_DIR", str(tmp_path))
+    monkeypatch.setattr(cal, "mcal", None)
+    monkeypatch.setattr(cal, "_calendars", {})
+    assert not cal.is_trading_day(pd.Timestamp("2024-07-04"), market="OFFLINE")
+    assert cal.is_trading_day(pd.Timestamp("2024-07-05"), market="OFFLINE")
+    # 超出范围或没有日历时放行
+    assert cal.is_trading_day(pd.Timestamp("2030-01-05"), market="OFFLINE")
+    assert cal.is_trading_day(pd.Timestamp("2024-07-04"), market="NOPE")
+    assert cal.market_for_source("efinance") == "SSE"
+
+
+class _Bars:
+    def __init__(self, df):
+        self.df = df
+
+    def recent_bars(self, symbol, n=300, interval="1d"):
+        return self.df
+
+
+def test_live_poll_checks_instrument_market_not_source_default(tmp_path, monkeypatch):
+    from turtletrader.journal import PaperJournal
+    from turtletrader.live_portfolio import _poll_once
+    from turtletrader.portfolio import Portfolio
+    from turtletrader.strategy import TurtleStrategy
+    hk = _weekday_calendar("HKEX")
+    hk.sessions = hk.sessions[hk.sessions != cal._day_ns("2024-07-05")]  # 港股假日，美股照常
+    monkeypatch.setattr(cal, "_calendars", {"HKEX": hk, "NYSE": _weekday_calendar("NYSE")})
+    days = pd.bdate_range("2024-05-01", "2024-07-05")
+    bars = pd.DataFrame({"date": days, "open": 10.0, "high": 10.5, "low": 9.5, "close": 10.0, "volume": 1e6})
+    ins = InstrumentConfig("0700.HK", source="yfinance", market="HKEX")
+    us = InstrumentConfig("AAPL", source="yfinance")
+    pcfg = PortfolioConfig(instruments=[ins, us])
+    inst = {i.symbol: i for i in pcfg.instruments}
+    rows = _poll_once(pcfg, inst, {s: _Bars(bars) for s in inst}, {s: TurtleStrategy(pcfg.turtle) for s in inst},
+                      {}, Portfolio(pcfg), PaperJournal(str(tmp_path)), 300, False)
+    assert list(rows) == ["AAPL"]
@@ -0,0 +1,23 @@
+import pytest
+from turtletrader.bench import _backtest_args, cli_startup
+
+# 这里只检查导入了哪些模块；启动耗时随机器波动，由基准用例 cli_help / cli_backtest 与基线比较
+HEAVY = ("pandas", "numpy", "yaml", "pydantic", "matplotlib", "yfinance", "efinance")
+
+
+def _loaded(modules, names):
+    return sorted(m for m in modules if m.split(".")[0] in names)
+
+
+@pytest.mark.parametrize("args", [["--help"], ["backtest", "--help"], ["portfolio-live", "--help"]])
+def test_help_loads_no_heavy_modules(args):
+    res = cli_startup(args)
+    assert _loaded(res["modules"], HEAVY) == []
+
+
+def test_backtest_imports_only_what_it_needs(tmp_path):
+    res = cli_startup(_backtest_args(str(tmp_path)))
+    assert (tmp_path / "out" / "metrics.json").exists()
+    assert not (tmp_path / "out" / "equity_curve.png").exists()
+    assert _loaded(res["modules"], ("matplotlib", "pydantic", "yfinance", "efinance")) == []
+    assert "turtletrader.portfolio_backtest" not in res["modules"]
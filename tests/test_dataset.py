@@ -0,0 +1,49 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from turtletrader.config import SystemConfig, TurtleConfig
+from turtletrader.dataset import share_dataset, write_dataset
+from turtletrader.strategy import TurtleStrategy
+from test_backtest import _random_walk
+
+COLS = ["open", "high", "low", "close", "volume"]
+
+
+def _data():
+    data = {f"S{i}": _random_walk(n=200 + 50 * i, seed=i) for i in range(3)}
+    data["TZ"] = _random_walk(n=120, seed=9).assign(date=lambda d: pd.to_datetime(d["date"]).dt.tz_localize("Asia/Shanghai"))
+    return data
+
+
+def _close_sum(ds, symbol):
+    return float(ds.array(symbol, "close").sum())
+
+
+def test_round_trip_and_zero_copy_views(tmp_path):
+    data = _data()
+    turtle = TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20))
+    ds = write_dataset(str(tmp_path / "u.ttds"), data, turtle)
+    assert ds.symbols == list(data) and ds.fields[:5] == COLS and ds.fields[-1] == "prev_close" and "N" in ds.fields
+    for sym, df in data.items():
+        got = ds.frame(sym)
+        assert (got["date"] == pd.to_datetime(df["date"])).all()
+        np.testing.assert_array_equal(got[COLS[:4]].to_numpy(), df[COLS[:4]].to_numpy())
+        assert got["volume"].isna().all()  # 缺失的 volume 补 NaN
+        np.testing.assert_allclose(got["N"], TurtleStrategy(turtle).prepare_indicators(df)["N"])
+        assert np.shares_memory(got["close"].to_numpy(), ds.values)
+    # 区间读取与 store 相同：[start, end)
+    d = pd.to_datetime(data["S1"]["date"])
+    part = ds.frame("S1", d.iloc[10], d.iloc[20])
+    assert len(part) == 10 and part["date"].iloc[0] == d.iloc[10]
+    assert ds.dates("TZ").tz is not None and ds.frame("TZ", d.iloc[0]).shape[1] == len(ds.fields) + 1
+    ds.close()
+
+
+def test_shared_memory_attaches_in_workers():
+    data = _data()
+    with share_dataset(data) as ds:
+        assert len(pickle.dumps(ds)) < 200  # 只序列化句柄
+        with ProcessPoolExecutor(2) as ex:
+            got = list(ex.map(_close_sum, [ds] * len(ds), ds.symbols))
+        assert got == [float(df["close"].sum()) for df in data.values()]
@@ -0,0 +1,31 @@
+import pandas as pd
+from turtletrader.config import TurtleConfig, SystemConfig
+from turtletrader.indicator_cache import IndicatorCache
+from turtletrader.strategy import TurtleStrategy
+from test_backtest import _random_walk
+
+CFG = TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20))
+
+
+def test_cache_hits_and_matches_uncached(tmp_path):
+    df = _random_walk(n=400)
+    cache = IndicatorCache(max_items=64)
+    first = TurtleStrategy(CFG, cache=cache).prepare_indicators(df)
+    # 7 个不同的 (种类, 长度, 字段) 键：(atr, atr_len, hlc)，(max, 20/10/55, high)，(min, 20/10/55, low)；
+    # 9 次查询中 s2 的 20 日退出通道与 s1 的 20 日进场通道同键，首轮即 2 次命中
+    assert cache.stats()["misses"] == 7
+    again = TurtleStrategy(CFG, cache=cache).prepare_indicators(df)
+    assert cache.stats()["misses"] == 7 and cache.stats()["hits"] == 2 + 9
+    plain = TurtleStrategy(CFG, cache=IndicatorCache(max_items=0)).prepare_indicators(df)
+    pd.testing.assert_frame_equal(first, plain)
+    pd.testing.assert_frame_equal(again, plain)
+
+
+def test_lru_eviction_and_disk_tier(tmp_path):
+    df = _random_walk(n=300, seed=1)
+    small = IndicatorCache(max_items=2, disk_dir=str(tmp_path))
+    TurtleStrategy(CFG, cache=small).prepare_indicators(df)
+    assert small.stats()["items"] == 2 and small.stats()["misses"] == 7 and small.stats()["evictions"] == 7
+    other = IndicatorCache(max_items=16, disk_dir=str(tmp_path))
+    TurtleStrategy(CFG, cache=other).prepare_indicators(df)
+    assert other.stats()["misses"] == 0 and other.stats()["disk_hits"] == 7
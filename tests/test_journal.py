@@ -0,0 +1,72 @@
+import json
+import pandas as pd
+from turtletrader.config import PortfolioConfig, InstrumentConfig, RuleConfig
+from turtletrader.journal import PaperJournal
+from turtletrader.portfolio import Portfolio
+from turtletrader.strategy import TurtleState, Unit
+
+
+def _port():
+    return Portfolio(PortfolioConfig(instruments=[InstrumentConfig("A"), InstrumentConfig("B")]))
+
+
+def _trade(port, day, sym, size, price):
+    ins = InstrumentConfig(sym, rules=RuleConfig(allow_short=True))
+    port.execute(pd.Timestamp(day), sym, "entry" if size > 0 else "exit", size, price, {}, ins)
+    st = port.states.setdefault(sym, TurtleState())
+    st.units = [Unit(price, 1, abs(size), price - 2, pd.Timestamp(day))] if size > 0 else []
+
+
+def test_journal_replays_deltas_and_compacts(tmp_path):
+    port = _port()
+    j = PaperJournal(str(tmp_path), snapshot_every=3)
+    for k in range(7):
+        _trade(port, f"2024-01-{k + 1:02d}", "AB"[k % 2], 10 if k % 3 else -5, 100.0 + k)
+        j.commit(port, ["A", "B"])
+    assert len(port.trades) <= 2  # 内存里只保留每个标的最后一笔买入
+    with open(tmp_path / "journal.jsonl") as f:
+        assert len(f.readlines()) == 1  # 第 6 轮压缩后只剩 1 条增量
+    with open(tmp_path / "journal.jsonl", "a") as f:
+        f.write('{"seq": 99, "cash": ')  # 崩溃时写了一半
+
+    back = _port()
+    assert PaperJournal(str(tmp_path)).restore(back)
+    assert back.cash == port.cash and back.total_units == port.total_units
+    assert {k: (v.size, v.avg_price) for k, v in back.positions.items()} == \
+           {k: (v.size, v.avg_price) for k, v in port.positions.items()}
+    assert back.trades == port.trades
+    assert [u.entry_price for u in back.states["A"].units] == [u.entry_price for u in port.states["A"].units]
+    assert len(pd.read_csv(tmp_path / "trades.csv")) == 7
+
+
+def test_restore_truncates_torn_tail_before_new_commits(tmp_path):
+    port = _port()
+    j = PaperJournal(str(tmp_path), snapshot_every=100)
+    port.cash = 1.0
+    j.commit(port, [])
+    with open(tmp_path / "journal.jsonl", "a") as f:
+        f.write('{"seq": 2, "cash": ')  # 崩溃时写了一半
+    back = _port()
+    j = PaperJournal(str(tmp_path), snapshot_every=100)
+    assert j.restore(back) and back.cash == 1.0
+    for k in range(3):
+        back.cash = 2.0 + k
+        j.commit(back, [])
+    again = _port()
+    assert PaperJournal(str(tmp_path)).restore(again)
+    assert again.cash == 4.0
+
+
+def test_journal_migrates_legacy_state_json(tmp_path):
+    legacy = {"cash": 5.0, "positions": {"A": {"size": 3, "avg_price": 2.0}}, "group_units": {"default": 1},
+              "total_units": 1, "states": {}, "trades": [
+                  {"date": "2024-01-01", "symbol": "A", "reason": "entry", "size": 3, "price": 2.0},
+                  {"date": "2024-01-02", "symbol": "A", "reason": "exit", "size": -3, "price": 2.5}]}
+    (tmp_path / "state.json").write_text(json.dumps(legacy))
+    port = _port()
+    assert PaperJournal(str(tmp_path)).restore(port)
+    assert port.cash == 5.0 and port.positions["A"].size == 3
+    # 账本按 int64 存日期，读回时为 str(pd.Timestamp)
+    assert port.trades == [dict(legacy["trades"][0], date="2024-01-01 00:00:00")]
+    assert (tmp_path / "snapshot.json").exists() and not (tmp_path / "state.json").exists()
+    assert len(pd.read_csv(tmp_path / "trades.csv")) == 2
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from turtletrader.config import InstrumentConfig, PortfolioConfig, RuleConfig
+from turtletrader.ledger import TradeLedger
+from turtletrader.portfolio import Portfolio
+
+
+def test_ledger_indexes_and_dict_compat():
+    led = TradeLedger(capacity=2)
+    led.record(pd.Timestamp("2024-01-02"), "A", "entry", 10, 5.0)
+    led.record(pd.Timestamp("2024-01-02 10:00", tz="Asia/Shanghai"), "B", "entry", 3, 9.5)
+    led.record(pd.Timestamp("2024-01-03"), "A", "add", 5, 5.5)
+    led.record(pd.Timestamp("2024-01-04"), "A", "exit", -15, 6.0)
+    led.append({"date": "2024-01-05", "symbol": "A", "reason": "entry", "size": 2, "price": 6.1})
+    assert len(led) == 5 and led[-1]["date"] == "2024-01-05 00:00:00"
+    assert led[1] == {"date": "2024-01-02 10:00:00+08:00", "symbol": "B", "reason": "entry", "size": 3, "price": 9.5}
+    assert [t["size"] for t in led[1:3]] == [3, 5]
+    assert led.bought_on("A", pd.Timestamp("2024-01-05 15:00")) and not led.bought_on("A", pd.Timestamp("2024-01-04"))
+    assert led.bought_on("B", pd.Timestamp("2024-01-02 14:00", tz="Asia/Shanghai"))
+    assert [t["size"] for t in led.open_lots("A")] == [2]
+    assert list(led.last_buys()) == ["B", "A"]
+
+    kept = led.keep_last_buys()
+    assert [t["symbol"] for t in kept] == ["B", "A"] and kept.bought_on("A", "2024-01-05")
+    df = TradeLedger([t for t in led if t["symbol"] == "A"]).to_frame()
+    assert df["date"].dtype == np.dtype("datetime64[ns]") and df["size"].tolist() == [10, 5, -15, 2]
+    assert df["reason"].tolist() == ["entry", "add", "exit", "entry"]
+    with pytest.raises(ValueError, match="int64"):
+        led.record(pd.Timestamp("2024-01-08"), "A", "entry", 2**63, 6.2)
+
+
+def test_portfolio_t_plus_one_uses_ledger():
+    ins = InstrumentConfig("600000", rules=RuleConfig(allow_short=False, t_plus_one=True))
+    port = Portfolio(PortfolioConfig(instruments=[ins]))
+    day = pd.Timestamp("2024-03-01")
+    port.execute(day, "600000", "entry", 100, 10.0, {}, ins)
+    port.execute(day, "600000", "stop", -100, 9.0, {}, ins)
+    assert port.positions["600000"].size == 100  # 当日买入不可卖
+    port.execute(day + pd.Timedelta(days=1), "600000", "stop", -100, 9.0, {}, ins)
+    assert port.positions["600000"].size == 0 and len(port.trades) == 2
+    port.trades = [dict(t) for t in port.trades]  # 旧代码赋值 list[dict] 仍可用
+    assert isinstance(port.trades, TradeLedger) and port.trades.bought_on("600000", day)
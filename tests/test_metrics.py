@@ -0,0 +1,87 @@
+import json
+import warnings
+import numpy as np
+import pandas as pd
+from turtletrader.bench import _portfolio_cfg
+from turtletrader.config import InstrumentConfig
+from turtletrader.metrics import attribution, equity_metrics, evaluate, rolling_metrics, trade_metrics
+from turtletrader.portfolio_backtest import PortfolioSimulation, run_portfolio_backtest
+from turtletrader.robustness import round_trips
+from turtletrader.synthetic import synthetic_universe
+from turtletrader.utils import annual_return, max_drawdown, sharpe
+
+
+def _curves(runs=50, T=600, seed=0):
+    rng = np.random.default_rng(seed)
+    eq = 1e5 * np.cumprod(1 + rng.normal(3e-4, 0.01, (runs, T)), axis=1)
+    return eq, pd.bdate_range("2018-01-01", periods=T)
+
+
+def test_equity_metrics_match_single_series_functions():
+    eq, idx = _curves()
+    m = equity_metrics(eq, idx, chunk_size=7)
+    for k in (0, 13, 49):
+        s = pd.Series(eq[k], index=idx)
+        rets = s.pct_change().dropna()
+        assert m["cagr"][k] == annual_return(s)
+        assert m["sharpe"][k] == sharpe(rets)
+        assert m["max_drawdown"][k] == max_drawdown(s)
+        downside = np.sqrt((np.minimum(rets, 0) ** 2).mean())
+        assert np.isclose(m["sortino"][k], rets.mean() / downside * np.sqrt(252))
+        assert np.isclose(m["calmar"][k], annual_return(s) / -max_drawdown(s))
+        under = (s < s.cummax()).astype(int)
+        longest = under.groupby((under == 0).cumsum()).sum().max()
+        assert m["max_drawdown_bars"][k] == longest
+    assert equity_metrics(pd.Series(eq[13], index=idx)).iloc[0].equals(m.iloc[13])
+
+
+def test_flat_run_metrics_are_strict_json(tmp_path):
+    dates = pd.bdate_range("2020-01-01", periods=120)
+    flat = pd.DataFrame({"date": dates, "open": 10.0, "high": 10.0, "low": 10.0, "close": 10.0})
+    res = run_portfolio_backtest({"FLAT": flat}, _portfolio_cfg([InstrumentConfig("FLAT")]), out_dir=str(tmp_path),
+                                 plot=False)
+    # 无成交：没有下行K线、没有回撤
+    assert res["metrics"]["sortino"] == 0.0 and res["metrics"]["calmar"] is None
+    text = (tmp_path / "metrics.json").read_text()
+    assert "NaN" not in text and "Infinity" not in text
+    json.loads(text)
+
+
+def test_rolling_metrics_match_pandas_rolling():
+    eq, _ = _curves(runs=3, T=300)
+    w = 20
+    r = rolling_metrics(eq, w)
+    for k in range(3):
+        s = pd.Series(eq[k])
+        rets = s.pct_change()
+        np.testing.assert_allclose(r["return"][k], s / s.shift(w) - 1, rtol=1e-10)
+        np.testing.assert_allclose(r["volatility"][k], rets.rolling(w).std() * np.sqrt(252), rtol=1e-6)
+        np.testing.assert_allclose(r["drawdown"][k], s / s.rolling(w + 1).max() - 1, rtol=1e-12)
+    assert np.isnan(r["sharpe"][:, :w]).all() and np.isfinite(r["sharpe"][:, w:]).all()
+
+
+def test_trade_metrics_and_attribution_reconcile_with_portfolio():
+    warnings.simplefilter("ignore", RuntimeWarning)
+    data, instruments = synthetic_universe(8, 700, seed=2)
+    cfg = _portfolio_cfg(instruments)
+    sim = PortfolioSimulation(data, cfg).advance()
+    ledger = sim.port.trades
+    rt = round_trips(ledger.to_frame().astype({"symbol": str}).to_dict("records"))
+    stats = trade_metrics(ledger)
+    assert stats["round_trips"] == len(rt) > 0
+    assert np.isclose(stats["expectancy"], rt["pnl"].mean())
+    assert np.isclose(stats["win_rate"], (rt["pnl"] > 0).mean())
+    # 账本 / DataFrame / list[dict] 三种输入结果相同
+    assert trade_metrics(ledger.to_frame()) == stats == trade_metrics(list(ledger))
+
+    groups = {ins.symbol: ins.group for ins in cfg.instruments}
+    attr = attribution(ledger, groups=groups, last_prices=sim.last_prices)
+    eq = sim.equity()
+    assert np.isclose(attr["symbols"]["pnl"].sum(), eq.iloc[-1] - cfg.account_init_equity)
+    realized = rt.groupby("symbol")["pnl"].sum()
+    assert np.allclose(attr["symbols"]["realized"].loc[realized.index], realized)
+    assert np.isclose(attr["groups"]["pnl"].sum(), attr["symbols"]["pnl"].sum())
+
+    res = evaluate(eq, trades=ledger, groups=groups, last_prices=sim.last_prices, window=60)
+    assert res["trades"] == stats and res["rolling"]["sharpe"].shape == (1, len(eq))
+    assert res["summary"]["max_drawdown"][0] == max_drawdown(eq)
@@ -0,0 +1,38 @@
+import pytest
+from turtletrader.config import PortfolioConfig, InstrumentConfig, TurtleConfig, SystemConfig
+from turtletrader import optimize as opt
+from turtletrader.portfolio_backtest import run_portfolio_backtest
+from test_backtest import _random_walk
+
+
+def _portfolio():
+    data_map = {f"S{i}": _random_walk(n=400, seed=i) for i in range(3)}
+    cfg = PortfolioConfig(instruments=[InstrumentConfig(s) for s in data_map],
+                          turtle=TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20)))
+    return cfg, data_map
+
+
+def test_apply_params_and_segmented_evaluation():
+    cfg, data_map = _portfolio()
+    new = opt.apply_params(cfg, {"turtle.s1.entry_lookback": 25, "risk_caps.max_units_total": 4})
+    assert new.turtle.s1.entry_lookback == 25 and new.risk_caps.max_units_total == 4
+    assert cfg.turtle.s1.entry_lookback == 20
+    with pytest.raises(ValueError):
+        opt.apply_params(cfg, {"turtle.nope": 1})
+    opt._init_worker(opt.portfolio_data(data_map))
+    steps = []
+    value = opt.evaluate_portfolio(new, "sharpe", segments=3, report=lambda k, v: steps.append(k))
+    assert steps == [0, 1]
+    assert value == run_portfolio_backtest(data_map, new)["metrics"]["sharpe"]
+
+
+def test_optimize_runs_parallel_study(tmp_path):
+    pytest.importorskip("optuna")
+    cfg, data_map = _portfolio()
+    space = {"turtle.atr_len": [10, 30], "turtle.s1.entry_lookback": [15, 30]}
+    study = opt.run_optimize(cfg, space, opt.portfolio_data(data_map), n_trials=6, workers=2,
+                             segments=2, out_dir=str(tmp_path), seed=1)
+    assert len(study.trials) == 6 and set(study.best_params) == set(space)
+    single = opt.run_optimize(cfg.turtle, {"atr_len": [10, 30]}, opt.single_data(data_map["S0"]), n_trials=3,
+                              out_dir=str(tmp_path), study_name="single", metric="cagr")
+    assert len(single.trials) == 3
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from turtletrader.portfolio_backtest import AlignedPanel
+
+
+def test_aligned_panel_matches_date_filtering():
+    d = pd.date_range("2021-01-01", periods=6, freq="D")
+    a = pd.DataFrame({"date": d, "open": 1.0, "high": 2.0, "low": 0.5, "close": np.arange(6.0)})
+    # b：缺两天、有一天重复（取第一根）、没有 volume 以外的同名列
+    b = pd.DataFrame({"date": [d[1], d[2], d[2], d[5]], "open": 3.0, "high": 4.0,
+                      "low": 2.0, "close": [10.0, 11.0, 12.0, 13.0], "volume": [1, 2, 3, 4]})
+    dfs = {"A": a, "B": b}
+    panel = AlignedPanel.build(dfs)
+    assert panel.dates == sorted(set(a["date"]) | set(b["date"]))
+    for t, dt in enumerate(panel.dates):
+        rows = panel.rows_at(t)
+        expected = {s: df[df["date"] == dt].iloc[0] for s, df in dfs.items() if not df[df["date"] == dt].empty}
+        assert list(rows) == list(expected)
+        for sym, row in rows.items():
+            exp = expected[sym]
+            assert set(row) == set(exp.index)
+            for k, v in row.items():
+                assert v == exp[k]
+
+
+def test_sparse_stepping_and_workers_match_full_rows():
+    import warnings
+    from turtletrader.bench import _portfolio_cfg
+    from turtletrader.portfolio_backtest import PortfolioSimulation, PortfolioStepper
+    from turtletrader.synthetic import synthetic_universe
+    warnings.simplefilter("ignore", RuntimeWarning)
+    data, instruments = synthetic_universe(12, 700, seed=4, cn_fraction=0.4)
+    cfg = _portfolio_cfg(instruments)
+    sim = PortfolioSimulation(data, cfg).advance()
+    # 参照：每个日期对所有有K线的标的调用 step
+    ref = PortfolioStepper(cfg, list(data))
+    for t, dt in enumerate(sim.panel.dates):
+        ref.step_rows(dt, sim.panel.rows_at(t))
+    assert sim.candidates.sum() < sim.panel.mask.sum()
+    assert sim.port.trades == ref.port.trades and len(ref.port.trades) > 0
+    assert sim.equity_series == ref.equity_series
+    par = PortfolioSimulation(data, cfg, workers=2).advance()
+    assert (par.candidates == sim.candidates).all()
+    assert par.port.trades == ref.port.trades and par.equity_series == ref.equity_series
@@ -0,0 +1,39 @@
+from turtletrader import profiling
+from turtletrader.bench import SIZES, _portfolio_cfg, time_case
+from turtletrader.portfolio_backtest import run_portfolio_backtest
+from turtletrader.synthetic import synthetic_universe
+
+
+def test_disabled_records_nothing():
+    prof = profiling.get_profiler()
+    assert not prof.enabled
+    with prof.phase("x", "A"):
+        pass
+    prof.count("n")
+    assert prof.report()["phases"] == {} and prof.report()["counters"] == {}
+
+
+def test_portfolio_and_live_phases(tmp_path):
+    data_map, instruments = synthetic_universe(4, 300, seed=2)
+    prof = profiling.enable()
+    try:
+        run_portfolio_backtest(data_map, _portfolio_cfg(instruments))
+        rep = prof.report()
+        assert {"prepare_indicators", "panel", "rows", "step"} <= set(rep["phases"])
+        assert rep["counters"]["bars"] == rep["phases"]["rows"]["count"]
+        # 空仓且无突破候选的K线不调用 step
+        steps = rep["phases"]["step"]["count"]
+        assert steps + rep["counters"]["skipped"] == sum(len(df) for df in data_map.values())
+        assert f"step/{instruments[0].symbol}" in rep["symbols"]
+
+        prof.reset()
+        time_case("live_iteration", SIZES["quick"], repeat=1)
+        assert {"fetch", "indicators", "is_trading_day", "step", "journal"} <= set(prof.phases)
+        path = tmp_path / "turtle.prom"
+        prof.write_prometheus(str(path))
+        text = path.read_text()
+        assert 'turtle_phase_seconds_bucket{phase="fetch",le="+Inf"}' in text
+        assert "turtle_symbol_phase_seconds_count{phase=\"indicators\"" in text
+        assert prof.format_table().splitlines()[0].startswith("phase")
+    finally:
+        profiling.disable()
@@ -0,0 +1,65 @@
+import json
+import warnings
+import numpy as np
+import pandas as pd
+from turtletrader.bench import _portfolio_cfg
+from turtletrader.portfolio_backtest import run_portfolio_backtest
+from turtletrader.report import downsample, drawdown, render_report, save_html_report, symbol_pnl
+from turtletrader.synthetic import synthetic_universe
+
+
+def test_downsample_keeps_ends_and_extremes():
+    rng = np.random.default_rng(0)
+    y = np.cumsum(rng.normal(size=100_000))
+    keep = downsample(y, 400)
+    assert len(keep) <= 400 and keep[0] == 0 and keep[-1] == len(y) - 1
+    assert (np.diff(keep) > 0).all()
+    assert y.argmin() in keep and y.argmax() in keep
+    dd = drawdown(y, pct=False)
+    assert dd.argmin() in downsample(dd, 400)
+    assert (downsample(y[:50], 400) == np.arange(50)).all()
+
+
+def test_symbol_pnl_marks_to_market():
+    trades = pd.DataFrame({"ns": pd.to_datetime(["2024-01-02", "2024-01-04", "2024-01-08"]).as_unit("ns").asi8,
+                           "size": [10, 10, -20], "price": [100.0, 102.0, 105.0]})
+    bars = pd.DataFrame({"date": pd.bdate_range("2024-01-01", periods=8), "close": np.arange(99.0, 107.0)})
+    s = symbol_pnl(trades, bars)
+    assert s["position"].tolist() == [0, 10, 10, 20, 20, 0, 0, 0]
+    # 平仓后盈亏 = 现金流之和
+    assert s["pnl"][-1] == -(10 * 100 + 10 * 102 - 20 * 105)
+    assert s["pnl"][2] == 10 * (101 - 100)
+    assert symbol_pnl(trades)["pnl"][-1] == s["pnl"][-1]
+
+
+def test_report_from_saved_results_serial_and_parallel(tmp_path):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    data, instruments = synthetic_universe(6, 800, seed=3, cn_fraction=0.3)
+    res = run_portfolio_backtest(data, _portfolio_cfg(instruments), out_dir=str(tmp_path / "run"), plot=False)
+    traded = set(res["trades"].to_frame()["symbol"].astype(str))
+    a = render_report(str(tmp_path / "run"), str(tmp_path / "a"), prices=data, max_points=200)
+    b = render_report(str(tmp_path / "run"), str(tmp_path / "b"), prices=data, max_points=200, workers=2)
+    assert a["symbols"] == b["symbols"] and {r["symbol"] for r in a["symbols"]} == traded
+    for r in a["symbols"]:
+        assert (tmp_path / "a" / r["chart"]).read_text() == (tmp_path / "b" / r["chart"]).read_text()
+        chart = json.loads((tmp_path / "a" / r["chart"].replace(".svg", ".json")).read_text())
+        assert len(chart["x"]) <= 200 and len(chart["trades"]) == r["trades"]
+    html = (tmp_path / "a" / "report.html").read_text()
+    assert "<svg" in html and all(r["chart"] in html for r in a["symbols"])
+    assert not (tmp_path / "run" / "equity_curve.png").exists()
+    summary = json.loads((tmp_path / "a" / "report.json").read_text())
+    assert summary["metrics"]["total_trades"] == res["metrics"]["total_trades"] == len(res["trades"])
+
+
+def test_html_report_renders_from_in_memory_result(tmp_path):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    data, instruments = synthetic_universe(4, 600, seed=5, cn_fraction=0.5)
+    res = run_portfolio_backtest(data, _portfolio_cfg(instruments), out_dir=str(tmp_path / "run"), plot=False)
+    saved = render_report(str(tmp_path / "run"), str(tmp_path / "saved"))
+    mem = save_html_report(res, str(tmp_path / "mem"))
+    assert [r["symbol"] for r in mem["symbols"]] == [r["symbol"] for r in saved["symbols"]] and mem["symbols"]
+    for a, b in zip(mem["symbols"], saved["symbols"]):
+        # trades.csv 里的价格是十进制文本，与内存中的浮点数只差末位
+        assert a["trades"] == b["trades"] and np.isclose(a["pnl"], b["pnl"]) and np.isclose(a["max_drawdown"], b["max_drawdown"])
+    assert json.loads((tmp_path / "mem" / "report.json").read_text())["metrics"]["total_trades"] == len(res["trades"])
+    assert "<svg" in (tmp_path / "mem" / "report.html").read_text()
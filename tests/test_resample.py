@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+from turtletrader.config import InstrumentConfig, RuleConfig
+from turtletrader.data_sources import DataSource
+from turtletrader.resample import BarAggregator, ResampledSource, instrument_market, interval_minutes, resample_bars
+
+COLS = ["open", "high", "low", "close", "volume"]
+
+
+def _minutes(days=3, seed=0):
+    """A 股 1m K线（起始时刻标记），含盘前、午休与盘后的K线。"""
+    idx = []
+    for d in pd.bdate_range("2024-03-04", periods=days):
+        idx += list(pd.date_range(d + pd.Timedelta("09:25:00"), d + pd.Timedelta("15:05:00"), freq="1min"))
+    rng = np.random.default_rng(seed)
+    c = 100 + np.cumsum(rng.normal(0, 0.1, len(idx)))
+    return pd.DataFrame({"date": pd.DatetimeIndex(idx), "open": c, "high": c + 0.05, "low": c - 0.05,
+                         "close": c + 0.01, "volume": rng.integers(1, 100, len(idx)).astype(float)})
+
+
+def _live(df, intervals, market):
+    agg = BarAggregator(intervals, market=market)
+    out = {iv: [] for iv in intervals}
+    for rec in df.to_dict("records"):
+        for iv, bar in agg.push(rec).items():
+            out[iv].append(bar)
+    return {iv: pd.DataFrame(bars + [agg.partial(iv)]) for iv, bars in out.items()}
+
+
+def test_interval_minutes():
+    assert interval_minutes("15m") == 15
+    assert interval_minutes("4h") == 240
+    assert interval_minutes("1d") is None
+    with pytest.raises(ValueError):
+        interval_minutes("1wk")
+
+
+def test_buckets_follow_trading_sessions():
+    df = _minutes()
+    h = resample_bars(df, "60m", market="SSE")
+    first_day = h["date"][h["date"].dt.date == pd.Timestamp("2024-03-04").date()]
+    # 上午 09:30/10:30，午后 13:00/14:00；盘前盘后的K线不计入，桶不跨午休
+    assert [t.strftime("%H:%M") for t in first_day] == ["09:30", "10:30", "13:00", "14:00"]
+    session = df[(df["date"].dt.strftime("%H:%M") >= "09:30") & (df["date"].dt.strftime("%H:%M") < "11:30")
+                 & (df["date"].dt.date == pd.Timestamp("2024-03-04").date())]
+    assert h["volume"].iloc[0] + h["volume"].iloc[1] == session["volume"].sum()
+    assert h["open"].iloc[0] == session["open"].iloc[0] and h["close"].iloc[1] == session["close"].iloc[-1]
+    d = resample_bars(df, "1d", market="SSE")
+    assert len(d) == 3 and (d["date"] == d["date"].dt.normalize()).all()
+    assert len(resample_bars(df, "15m", market="SSE")) == 3 * 16
+
+
+def test_market_from_instrument_or_bars():
+    df = _minutes(days=1)
+    csv_a = InstrumentConfig("600000", rules=RuleConfig(t_plus_one=True))
+    assert instrument_market(csv_a, df["date"]) == "SSE"
+    aware = df.assign(date=df["date"].dt.tz_localize("Asia/Shanghai"))
+    yf_a = InstrumentConfig("600000.SS", source="yfinance")
+    assert instrument_market(yf_a, aware["date"]) == "SSE"
+    h = resample_bars(aware, "60m", market=instrument_market(yf_a, aware["date"]))
+    assert [t.strftime("%H:%M") for t in h["date"]] == ["09:30", "10:30", "13:00", "14:00"]
+    # 推不出市场：整天（K线自身时区）都算，不丢K线
+    unknown = InstrumentConfig("X", source="yfinance")
+    assert instrument_market(unknown, df["date"]) is None
+    assert resample_bars(df, "1d", market=None)["volume"].sum() == df["volume"].sum()
+    assert instrument_market(InstrumentConfig("X", market="hkex")) == "HKEX"
+    with pytest.raises(ValueError):
+        resample_bars(aware, "60m", market="NYSE")  # 全部落在时段外
+
+
+def test_live_aggregator_matches_batch():
+    df = _minutes()
+    intervals = ["5m", "15m", "60m", "1d"]
+    live = _live(df, intervals, "SSE")
+    for iv in intervals:
+        batch = resample_bars(df, iv, market="SSE")
+        assert (live[iv]["date"].values == batch["date"].values).all()
+        np.testing.assert_array_equal(live[iv][COLS].to_numpy(), batch[COLS].to_numpy())
+
+
+def test_revised_bar_replaces_instead_of_accumulating():
+    df = _minutes(days=1)
+    agg = BarAggregator(["15m"], market="SSE")
+    recs = df.to_dict("records")
+    for rec in recs[:10]:
+        agg.push(rec)
+    before = agg.partial("15m")
+    # 同一时间戳的未收盘K线被刷新两次，最终值与一次给出最终值相同
+    stale = dict(recs[9], high=recs[9]["high"] + 5, volume=1e6)
+    agg.push(stale)
+    agg.push(recs[9])
+    assert agg.partial("15m") == before
+    assert agg.push(recs[3]) == {}  # 更早的K线被忽略
+
+
+class StepSource(DataSource):
+    """按 now 逐步"到达"的 1m 数据源，记录每次访问。"""
+
+    def __init__(self, df):
+        self.df = df
+        self.now = 0
+        self.calls = []
+
+    def _visible(self):
+        return self.df.iloc[:self.now]
+
+    def get_history(self, symbol, start, end, interval):
+        self.calls.append(("history", start))
+        d = self._visible()
+        if start is not None:
+            d = d[d["date"] >= pd.Timestamp(start)]
+        return d.reset_index(drop=True)
+
+    def recent_bars(self, symbol, n, interval):
+        self.calls.append(("recent", n))
+        return self._visible().tail(n).reset_index(drop=True)
+
+
+def test_resampled_source_shares_one_incremental_feed():
+    df = _minutes(days=2)
+    src = StepSource(df)
+    rs = ResampledSource(src, "1m", market="SSE", min_refetch=0)
+    src.now = 300
+    rs.recent_bars("600000", 10, "15m")
+    rs.recent_bars("600000", 5, "60m")  # 新周期：按两者需求重建一次
+    for now in (301, 302, 420, len(df)):
+        src.now = now
+        for iv, n in (("15m", 10), ("60m", 5)):
+            got = rs.recent_bars("600000", n, iv)
+            want = resample_bars(df.iloc[:now], iv, market="SSE").tail(n).reset_index(drop=True)
+            assert (got["date"].values == want["date"].values).all()
+            np.testing.assert_array_equal(got[COLS].to_numpy(), want[COLS].to_numpy())
+    # 初始回补之后都是增量拉取
+    assert [c[0] for c in src.calls[:2]] == ["recent", "recent"]
+    assert all(c[0] == "history" and c[1] is not None for c in src.calls[2:])
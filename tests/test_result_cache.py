@@ -0,0 +1,74 @@
+import json
+import os
+import warnings
+import pandas as pd
+from click.testing import CliRunner
+from turtletrader.bench import _portfolio_cfg
+from turtletrader.cli import main
+from turtletrader.result_cache import ResultCache, cached_portfolio_backtest, result_key
+from turtletrader.synthetic import synthetic_universe
+
+
+def _universe(n=4):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    data, instruments = synthetic_universe(n, 400, seed=5)
+    return data, _portfolio_cfg(instruments)
+
+
+def test_hit_serves_saved_result(tmp_path):
+    data, cfg = _universe()
+    cache = ResultCache(str(tmp_path / "cache"))
+    first = cached_portfolio_backtest(data, cfg, out_dir=str(tmp_path / "a"), cache=cache, plot=False)
+    again = cached_portfolio_backtest(data, cfg, out_dir=str(tmp_path / "b"), cache=cache, plot=False)
+    assert (first["cache"], again["cache"]) == ("miss", "hit")
+    assert json.dumps(again["metrics"]) == json.dumps(first["metrics"])
+    pd.testing.assert_series_equal(again["equity"], first["equity"])
+    for name in ("equity_curve.csv", "trades.csv", "metrics.json"):
+        assert (tmp_path / "b" / name).read_bytes() == (tmp_path / "a" / name).read_bytes()
+    st = cache.stats()
+    assert (st["entries"], st["hits"], st["misses"]) == (1, 1, 1)
+
+
+def test_key_tracks_config_data_and_order():
+    data, cfg = _universe()
+    key = result_key(cfg, data)
+    sym = next(iter(data))
+    changed = dict(data, **{sym: data[sym].assign(close=data[sym]["close"] * 1.001)})
+    assert result_key(cfg, changed) != key
+    assert result_key(cfg, dict(reversed(list(data.items())))) != key
+    cfg.turtle.risk_per_unit *= 2
+    assert result_key(cfg, data) != key
+    assert result_key(cfg, data, start="2012-01-01") != result_key(cfg, data)
+
+
+def test_size_based_eviction_drops_least_recently_used(tmp_path):
+    data, cfg = _universe(2)
+    cache = ResultCache(str(tmp_path / "cache"))
+    keys = []
+    for k in range(3):
+        cfg.account_init_equity = 100_000.0 + k
+        cached_portfolio_backtest(data, cfg, cache=cache)
+        keys.append(result_key(cfg, data))
+        os.utime(os.path.join(cache._path(keys[-1]), "result.pkl"), (k, k))
+    size = cache.stats()["bytes"]
+    os.utime(os.path.join(cache._path(keys[0]), "result.pkl"), (10, 10))  # 最近用过
+    assert cache.evict(size * 2 // 3) == 1
+    assert cache.get(keys[1]) is None and cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_cli_no_cache_and_stats(tmp_path):
+    data, cfg = _universe(2)
+    lines = ["instruments:"]
+    for sym, df in data.items():
+        df.to_csv(tmp_path / f"{sym}.csv", index=False)
+        lines.append(f"  - {{symbol: '{sym}', csv: '{tmp_path / f'{sym}.csv'}'}}")
+    (tmp_path / "p.yaml").write_text("\n".join(lines) + "\n")
+    cache_dir = str(tmp_path / "cache")
+    args = ["portfolio-backtest", "--config", str(tmp_path / "p.yaml"), "--out", str(tmp_path / "out"),
+            "--no_plot", "--cache_dir", cache_dir]
+    runner = CliRunner()
+    for extra in ([], [], ["--no-cache"]):
+        assert runner.invoke(main, args + extra).exit_code == 0
+    r = runner.invoke(main, ["cache", "stats", "--cache_dir", cache_dir])
+    st = json.loads(r.output)
+    assert (st["entries"], st["hits"], st["misses"]) == (1, 1, 1)
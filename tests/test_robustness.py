@@ -0,0 +1,40 @@
+import numpy as np
+from turtletrader.config import PortfolioConfig, InstrumentConfig, TurtleConfig, SystemConfig
+from turtletrader.portfolio_backtest import run_portfolio_backtest
+from turtletrader.robustness import round_trips, run_robustness, summarize, trade_returns
+from test_backtest import _random_walk
+
+
+def _result():
+    data_map = {f"S{i}": _random_walk(n=700, seed=i) for i in range(3)}
+    cfg = PortfolioConfig(instruments=[InstrumentConfig(s) for s in data_map],
+                          turtle=TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20)))
+    return run_portfolio_backtest(data_map, cfg)
+
+
+def test_round_trips_pnl():
+    trades = [{"date": "2020-01-01", "symbol": "A", "size": 10, "price": 1.0},
+              {"date": "2020-01-02", "symbol": "B", "size": -5, "price": 4.0},
+              {"date": "2020-01-03", "symbol": "A", "size": 5, "price": 2.0},
+              {"date": "2020-01-04", "symbol": "A", "size": -15, "price": 3.0},
+              {"date": "2020-01-05", "symbol": "B", "size": 5, "price": 3.0}]
+    rt = round_trips(trades)
+    assert rt["symbol"].tolist() == ["A", "B"] and rt["pnl"].tolist() == [25.0, 5.0]
+
+
+def test_scenarios_metrics_and_invariants():
+    res = _result()
+    eq = res["equity"]
+    m = run_robustness(eq, res["trades"], n=2500, chunk_size=1000, seed=3, skip_prob=0.0)
+    assert m.groupby("method").size().to_dict() == {"bootstrap": 2500, "reshuffle": 2500, "skip": 2500}
+    tr = trade_returns(eq, res["trades"])
+    closed = eq.iloc[0] * np.prod(1.0 + tr["ret"].to_numpy())
+    # 重排不改变复利终值；skip_prob=0 时每个情景都是原交易序列
+    np.testing.assert_allclose(m.loc[m.method == "reshuffle", "end_equity"], closed, rtol=1e-9)
+    skip = m[m.method == "skip"].iloc[0]
+    np.testing.assert_allclose(skip.end_equity, closed, rtol=1e-9)
+    # 块长覆盖全段时 bootstrap 只是把日收益循环平移，终值与原净值相同
+    full = run_robustness(eq, None, n=5, block=len(eq), seed=0)
+    np.testing.assert_allclose(full["end_equity"], eq.iloc[-1], rtol=1e-9)
+    s = summarize(m)
+    assert s.loc[("bootstrap", "max_drawdown"), "p5"] <= s.loc[("bootstrap", "max_drawdown"), "p95"] <= 0
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from turtletrader.data_sources import DataSource
+from turtletrader.store import MarketStore
+
+
+class FakeSource(DataSource):
+    def __init__(self, df):
+        self.df = df
+        self.calls = []
+
+    def get_history(self, symbol, start, end, interval):
+        self.calls.append((start, end))
+        d = self.df
+        if start:
+            d = d[d["date"] >= pd.Timestamp(start)]
+        if end:
+            d = d[d["date"] < pd.Timestamp(end)]
+        return d.reset_index(drop=True)
+
+
+def _bars(n):
+    x = np.arange(n, dtype=float)
+    return pd.DataFrame({"date": pd.date_range("2020-01-01", periods=n, freq="D"),
+                         "open": x, "high": x + 1, "low": x - 1, "close": x + 0.5, "volume": x * 10})
+
+
+def test_store_serves_repeat_reads_from_disk(tmp_path):
+    src = FakeSource(_bars(100))
+    store = MarketStore(str(tmp_path), src)
+    first = store.get_history("AAA", "2020-01-10", "2020-02-01", "1d")
+    again = store.get_history("AAA", "2020-01-15", "2020-01-20", "1d")
+    assert len(src.calls) == 1
+    assert len(first) == 22 and list(again["close"]) == list(first["close"][5:10])
+    # 离线库（无数据源）读同一份数据
+    offline = MarketStore(str(tmp_path)).get_history("AAA", "2020-01-10", "2020-02-01", "1d")
+    pd.testing.assert_frame_equal(offline, first)
+
+
+def test_store_appends_only_new_bars(tmp_path):
+    src = FakeSource(_bars(50))
+    store = MarketStore(str(tmp_path), src, ttl=0)
+    store.get_history("AAA", None, None, "1d")
+    src.df = _bars(60)
+    out = store.get_history("AAA", None, None, "1d")
+    # 第二次只从库中最后一根的日期开始拉
+    assert src.calls[-1] == ("2020-02-19", None)
+    assert len(out) == 60 and out["close"].iloc[-1] == 59.5
+    assert store.meta("AAA", "1d")["rows"] == 60
+
+
+def test_incremental_bars_fetches_only_delta():
+    from turtletrader.data_sources import IncrementalBars
+
+    class LiveFake(FakeSource):
+        def recent_bars(self, symbol, n, interval):
+            self.calls.append(("recent", n))
+            return self.df.tail(n).reset_index(drop=True)
+
+    src = LiveFake(_bars(100))
+    live = IncrementalBars(src, capacity=30)
+    first = live.recent_bars("AAA", 20, "1d")
+    assert list(first["close"]) == list(_bars(100)["close"][80:])
+    full = _bars(105)
+    full.loc[99, "close"] = 123.0  # 上一轮的最后一根被修正（未收盘K线）
+    src.df = full
+    out = live.recent_bars("AAA", 20, "1d")
+    assert src.calls[-1] == (pd.Timestamp("2020-04-09"), None)
+    assert list(out["close"]) == list(full["close"][85:])
+    assert len(live._bufs[("AAA", "1d")]) == 25
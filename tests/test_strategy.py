@@ -0,0 +1,40 @@
+import pandas as pd
+from turtletrader.journal import state_from_dict, state_to_dict
+from turtletrader.strategy import TurtleState, Unit, UnitBook
+
+
+def test_unit_book_stops_in_place_and_growth():
+    book = UnitBook(capacity=2)
+    day = pd.Timestamp("2021-03-01")
+    for k in range(5):  # 超出容量时扩容
+        book.push(100.0 + k, 1, 10 + k, 97.0 + k, day + pd.Timedelta(days=k))
+    data = book.data
+    fills = []
+    book.take_stops(99.5, 110.0, fills)
+    assert fills == [("stop", -13, 100.0), ("stop", -14, 101.0)]
+    assert book.data is data and len(book) == 3 and book.total_size() == 33 and book.tight == 99.0
+    assert [u.entry_date for u in book] == [day + pd.Timedelta(days=k) for k in range(3)]
+    book.take_stops(99.5, 110.0, fills)
+    assert len(fills) == 2  # 没有新的止损
+    assert book.pop() == Unit(102.0, 1, 12, 99.0, day + pd.Timedelta(days=2)) and len(book) == 2
+    assert book.tight == 98.0
+    short = UnitBook()
+    for stop in (105.0, 103.0, 104.0):
+        short.push(100.0, -1, 1, stop, day)
+    assert short.tight == 103.0
+    short.take_stops(90.0, 103.5, fills)
+    assert fills[-1] == ("stop", 1, 103.0) and short.tight == 104.0 and len(short) == 2
+
+
+def test_state_serialization_unchanged():
+    st = TurtleState(4)
+    ts = pd.Timestamp("2024-01-02 09:30", tz="America/New_York")
+    st.units = [Unit(10.5, -1, 3, 11.5, ts), Unit(10.0, -1, 2, 11.0, ts + pd.Timedelta(hours=1))]
+    st.last_breakout_price = 10.5
+    d = state_to_dict(st)
+    assert d["units"][0] == {"entry_price": 10.5, "direction": -1, "size": 3, "stop": 11.5,
+                             "entry_date": "2024-01-02 09:30:00-05:00"}
+    back = state_from_dict(d)
+    assert state_to_dict(back) == d and back.units == st.units
+    st.units = st.units[:-1]
+    assert len(st.units) == 1 and st.book.direction == -1
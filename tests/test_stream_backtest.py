@@ -0,0 +1,50 @@
+import warnings
+import pandas as pd
+from turtletrader.bench import _portfolio_cfg
+from turtletrader.portfolio_backtest import run_portfolio_backtest
+from turtletrader.store import MarketStore
+from turtletrader.stream_backtest import run_portfolio_backtest_streaming
+from turtletrader.synthetic import synthetic_universe
+
+
+def _store(tmp_path, n, bars, cn_fraction):
+    data, instruments = synthetic_universe(n, bars, seed=3, cn_fraction=cn_fraction)
+    store = MarketStore(str(tmp_path / "store"))
+    for sym, df in data.items():
+        store.write(sym, "1d", df)
+    return store, _portfolio_cfg(instruments)
+
+
+def test_streaming_matches_in_memory_outputs(tmp_path):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    store, cfg = _store(tmp_path, 12, 900, 0.0)
+    data_map = {ins.symbol: store.read(ins.symbol, "1d") for ins in cfg.instruments}
+    for start in (None, "2011-03-01"):
+        ref = run_portfolio_backtest(data_map, cfg, out_dir=str(tmp_path / "mem"), start=start)
+        assert len(ref["trades"]) > 0
+        for chunk in ("60D", "3000D"):
+            out = tmp_path / f"stream{chunk}"
+            res = run_portfolio_backtest_streaming(store, cfg, out_dir=str(out), start=start, chunk=chunk)
+            assert res["trades"] is None
+            pd.testing.assert_series_equal(res["equity"], ref["equity"])
+            for name in ("equity_curve.csv", "trades.csv", "metrics.json"):
+                assert (out / name).read_text() == (tmp_path / "mem" / name).read_text()
+
+
+def test_streaming_keeps_t_plus_one_state_across_chunks(tmp_path):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    store, cfg = _store(tmp_path, 8, 600, 0.5)
+    data_map = {ins.symbol: store.read(ins.symbol, "1d") for ins in cfg.instruments}
+    ref = run_portfolio_backtest(data_map, cfg)
+    # 每块只有二十来根K线：账本频繁裁剪，T+1 只能靠保留下来的最后一笔买入
+    res = run_portfolio_backtest_streaming(store, cfg, out_dir=str(tmp_path / "out"), chunk="30D")
+    written = pd.read_csv(tmp_path / "out" / "trades.csv")
+    assert res["metrics"]["total_trades"] == len(ref["trades"]) == len(written)
+    assert written.to_dict("records") == pd.read_csv(_csv(ref, tmp_path)).to_dict("records")
+    assert {k: v.size for k, v in res["positions"].items()} == {k: v.size for k, v in ref["positions"].items()}
+
+
+def _csv(res, tmp_path):
+    path = tmp_path / "ref_trades.csv"
+    res["trades"].to_csv(str(path))
+    return path
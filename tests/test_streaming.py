@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from turtletrader.config import TurtleConfig, SystemConfig
+from turtletrader.strategy import TurtleStrategy
+from turtletrader.streaming import IndicatorStream
+from test_backtest import _random_walk
+
+CFG = TurtleConfig(atr_len=14, s1=SystemConfig(20, 10), s2=SystemConfig(55, 20))
+COLS = ["N", "s1_high", "s1_low", "s1_exit_high", "s1_exit_low",
+        "s2_high", "s2_low", "s2_exit_high", "s2_exit_low", "prev_close"]
+
+
+def _batch(df):
+    out = TurtleStrategy(CFG).prepare_indicators(df)
+    out["prev_close"] = out["close"].shift(1)
+    return out
+
+
+def test_stream_matches_batch_bit_for_bit():
+    df = _random_walk(n=600, seed=2)
+    df.loc[300, "high"] = np.nan
+    df.loc[299, "close"] = np.nan
+    batch = _batch(df)
+    stream = IndicatorStream(CFG)
+    rows = [stream.push(r) for r in df.to_dict("records")]
+    got = pd.DataFrame(rows)[COLS]
+    np.testing.assert_array_equal(got.to_numpy(), batch[COLS].to_numpy())
+
+
+def test_peek_does_not_advance_state():
+    df = _random_walk(n=200, seed=5)
+    records = df.to_dict("records")
+    stream = IndicatorStream(CFG)
+    for r in records[:-1]:
+        stream.push(r)
+    peeked = stream.peek(records[-1])
+    assert stream.count == len(records) - 1
+    last = _batch(df).iloc[-1]
+    for c in COLS:
+        assert peeked[c] == last[c]
+    assert stream.push(records[-1]) == peeked
+
+
+def test_live_stream_row_sliding_windows():
+    from turtletrader.live_portfolio import _stream_row
+    df = _random_walk(n=400, seed=7)
+    batch = _batch(df)
+    streams = {}
+    for end in range(150, 400, 3):
+        window = df.iloc[max(0, end - 100):end].reset_index(drop=True)
+        row = _stream_row(streams, "X", CFG, window, use_closed=True)
+        assert row["date"] == df["date"].iloc[end - 2]
+        # 通道是定长窗口的极值，与从头批量计算的结果一致（N 依赖预热起点，见下）
+        exp = batch.iloc[end - 2]
+        for c in COLS[1:]:
+            assert row[c] == exp[c]
+    # 第一窗口预热后逐根增量，结果与从第一窗口起点批量计算一致
+    ref = _batch(df.iloc[50:end].reset_index(drop=True)).iloc[-2]
+    for c in COLS:
+        assert row[c] == ref[c] or (np.isnan(row[c]) and np.isnan(ref[c]))
+
+
+def test_block_indicators_match_batch_for_any_split():
+    from turtletrader.streaming import BlockIndicators
+    df = _random_walk(n=600, seed=11)
+    df.loc[200, "low"] = np.nan
+    df.loc[420, "close"] = np.nan
+    batch = _batch(df)
+    block = BlockIndicators(CFG)
+    rng = np.random.default_rng(0)
+    cuts = np.sort(rng.choice(np.arange(1, 600), 30, replace=False))
+    parts = []
+    for piece in np.split(np.arange(600), cuts):
+        d = df.iloc[piece]
+        parts.append(pd.DataFrame(block.push(d["high"], d["low"], d["close"])))
+    got = pd.concat(parts, ignore_index=True)[COLS]
+    np.testing.assert_array_equal(got.to_numpy(), batch[COLS].to_numpy())
@@ -0,0 +1,30 @@
+import numpy as np
+from turtletrader.backtest import run_backtest
+from turtletrader.config import TurtleConfig, SystemConfig
+from turtletrader.sweep import expand_grid, run_sweep
+from test_backtest import _random_walk
+
+
+def test_expand_grid_overrides_nested_leaves():
+    base = {"atr_len": 20, "systems": {"s1": {"entry_lookback": 20, "exit_lookback": 10}}}
+    grid = {"atr_len": [14, 20], "systems": {"s1": {"entry_lookback": [15, 20, 25]}}}
+    out = expand_grid(base, grid)
+    assert len(out) == 6
+    assert {(y["atr_len"], y["systems"]["s1"]["entry_lookback"]) for y in out} == {(a, e) for a in (14, 20) for e in (15, 20, 25)}
+    assert all(y["systems"]["s1"]["exit_lookback"] == 10 for y in out)
+    assert base["atr_len"] == 20
+
+
+def test_sweep_matches_run_backtest():
+    df = _random_walk(seed=4)
+    configs = [TurtleConfig(atr_len=a, s1=SystemConfig(e, 10), s2=SystemConfig(55, 20))
+               for a in (14, 20) for e in (15, 20)]
+    res = run_sweep(df, configs, chunk_size=3)
+    assert list(res["atr_len"]) == [14, 14, 20, 20]
+    for k, cfg in enumerate(configs):
+        m = run_backtest(df, cfg, engine="fast")["metrics"]
+        row = res.iloc[k]
+        for key in ("start", "end", "total_trades", "final_position", "start_equity", "end_equity"):
+            assert row[key] == m[key]
+        for key in ("cagr", "sharpe", "max_drawdown"):
+            assert np.isclose(row[key], m[key], rtol=1e-9, equal_nan=True)
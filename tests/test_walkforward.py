@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from turtletrader.config import PortfolioConfig, InstrumentConfig, TurtleConfig, SystemConfig
+from turtletrader.portfolio_backtest import run_portfolio_backtest
+from turtletrader.walkforward import make_folds, run_walk_forward, union_dates
+from test_backtest import _random_walk
+
+
+def _portfolio():
+    data_map = {f"S{i}": _random_walk(n=600, seed=i) for i in range(3)}
+    cfg = PortfolioConfig(instruments=[InstrumentConfig(s) for s in data_map],
+                          turtle=TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20)))
+    return cfg, data_map
+
+
+def test_make_folds_rolling_and_anchored():
+    dates = pd.date_range("2020-01-01", periods=100)
+    rolling = make_folds(dates, 4, train=40, test=15)
+    assert [f.test_start for f in rolling] == [dates[40], dates[55], dates[70], dates[85]]
+    assert rolling[1].train_start == dates[15] and rolling[-1].test_end is None
+    anchored = make_folds(dates, 4, train=40, test=15, anchored=True)
+    assert all(f.train_start == dates[0] for f in anchored)
+    with pytest.raises(ValueError):
+        make_folds(dates, 5, train=60, test=15)
+
+
+def test_walk_forward_without_search_matches_windowed_backtests(tmp_path):
+    cfg, data_map = _portfolio()
+    res = run_walk_forward(data_map, cfg, folds=3, train=200, workers=2, out_dir=str(tmp_path))
+    folds = make_folds(union_dates(data_map), 3, train=200)
+    for row, f in zip(res["folds"].itertuples(), folds):
+        ref = run_portfolio_backtest(data_map, cfg, start=f.test_start, end=f.test_end)["metrics"]
+        assert row.sharpe == ref["sharpe"] or (pd.isna(row.sharpe) and pd.isna(ref["sharpe"]))
+    assert res["equity"].index.is_monotonic_increasing and res["equity"].iloc[0] == cfg.account_init_equity
+    assert (tmp_path / "oos_equity.csv").exists()
+
+
+def test_walk_forward_optimizes_each_fold(tmp_path):
+    pytest.importorskip("optuna")
+    cfg, data_map = _portfolio()
+    res = run_walk_forward(data_map, cfg, {"turtle.atr_len": [10, 30]}, folds=2, train=250, workers=2,
+                           out_dir=str(tmp_path), n_trials=3, segments=2, seed=0)
+    assert res["folds"]["params"].str.contains("atr_len").all()
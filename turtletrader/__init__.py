@@ -1,2 +1,10 @@
-from .backtest import run_backtest
 __version__ = "0.6.1"
+__all__ = ["run_backtest"]
+
+
+def __getattr__(name):
+    # 延迟导入：import turtletrader（CLI 启动、只用 config 等轻量模块）不加载 pandas
+    if name == "run_backtest":
+        from .backtest import run_backtest
+        return run_backtest
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
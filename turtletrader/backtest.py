@@ -1,19 +1,37 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 import pandas as pd
 from .config import TurtleConfig
 from .strategy import TurtleStrategy, TurtleState
+from .metrics import equity_metrics, finite
 from .utils import max_drawdown, sharpe, annual_return
 
-def run_backtest(df: pd.DataFrame, cfg: TurtleConfig, out_dir: str=None) -> Dict[str, Any]:
+ENGINES = ("reference", "fast")
+
+def run_backtest(df: pd.DataFrame, cfg: TurtleConfig, out_dir: str=None, engine: str="reference",
+                 plot: bool = True) -> Dict[str, Any]:
+    """单标的回测。
+
+    engine="reference" 逐行调用 ``TurtleStrategy.step``（参考实现）；
+    engine="fast" 使用 :mod:`turtletrader.engine` 的数组状态机，成交与指标与参考实现一致。
+    plot=False 时 out_dir 下只写 csv/json，不画图。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
     df = df.copy()
     df["date"] = pd.to_datetime(df["date"])
     df = df.sort_values("date").reset_index(drop=True)
     df.set_index("date", inplace=True)
 
-    strat = TurtleStrategy(cfg)
-    df = strat.prepare_indicators(df)
+    if engine == "fast":
+        equity_series, trades, pos = _run_fast(df, cfg)
+    else:
+        strat = TurtleStrategy(cfg)
+        df = strat.prepare_indicators(df)
+        equity_series, trades, pos = _run_reference(df, strat, cfg)
+    return _summarize(equity_series, trades, pos, out_dir, plot)
 
-    state = TurtleState()
+def _run_reference(df: pd.DataFrame, strat: TurtleStrategy, cfg: TurtleConfig):
+    state = TurtleState(cfg.pyramiding.max_units)
     equity = 100_000.0
     pos = 0
     cash = equity
@@ -31,7 +49,27 @@ def run_backtest(df: pd.DataFrame, cfg: TurtleConfig, out_dir: str=None) -> Dict
         eq.append((dt, equity))
 
     equity_series = pd.Series({dt: e for dt, e in eq}).sort_index()
+    return equity_series, trades, pos
+
+def _run_fast(df: pd.DataFrame, cfg: TurtleConfig):
+    from .engine import BarArrays, simulate
+    from .indicator_cache import get_default_cache
+    bars = BarArrays.build(df["open"], df["high"], df["low"], df["close"], cfg, cache=get_default_cache())
+    eq, fills, pos = simulate(bars, cfg, init_equity=100_000.0)
+    index = df.index
+    dates = index[[f[0] for f in fills]].tolist()
+    trades: List[tuple] = [(dt, reason, size, price) for dt, (_, reason, size, price) in zip(dates, fills)]
+    if index.is_unique:
+        equity_series = pd.Series(eq, index=index.rename(None))
+    else:
+        # 与参考路径相同：重复日期以最后一根为准
+        equity_series = pd.Series({dt: e for dt, e in zip(index, eq.tolist())}).sort_index()
+    return equity_series, trades, pos
+
+def _summarize(equity_series: pd.Series, trades: list, pos: int, out_dir: str=None,
+               plot: bool = True) -> Dict[str, Any]:
     rets = equity_series.pct_change().dropna()
+    extra = equity_metrics(equity_series).iloc[0]
     metrics = {
         "start": str(equity_series.index[0].date()) if not equity_series.empty else None,
         "end": str(equity_series.index[-1].date()) if not equity_series.empty else None,
@@ -40,16 +78,21 @@ def run_backtest(df: pd.DataFrame, cfg: TurtleConfig, out_dir: str=None) -> Dict
         "cagr": float(annual_return(equity_series)),
         "sharpe": float(sharpe(rets)),
         "max_drawdown": float(max_drawdown(equity_series)),
+        "sortino": finite(extra["sortino"]),
+        "calmar": finite(extra["calmar"]),
         "total_trades": len(trades),
         "final_position": int(pos),
     }
 
     if out_dir:
-        import os, json, matplotlib.pyplot as plt
+        import os, json
         os.makedirs(out_dir, exist_ok=True)
         pd.DataFrame({"equity": equity_series}).to_csv(os.path.join(out_dir, "equity_curve.csv"))
         with open(os.path.join(out_dir, "metrics.json"), "w") as f:
             json.dump(metrics, f, indent=2)
+    if out_dir and plot:
+        # matplotlib 导入很重，只在真要画图时导入
+        import matplotlib.pyplot as plt
         plt.figure()
         equity_series.plot(title="Equity Curve")
         plt.tight_layout()
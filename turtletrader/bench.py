@@ -0,0 +1,350 @@
+"""基准测试：在合成行情上给热点路径计时，结果存 JSON，并与保存的基线比较以发现性能回退。
+
+全部离线（行情来自 :mod:`turtletrader.synthetic`，给定 seed 可复现），计时用例：
+
+- ``prepare_indicators``：单标指标计算（关闭指标缓存）；
+- ``strategy_step``：``TurtleStrategy.step`` 逐根吞吐；
+- ``backtest_reference`` / ``backtest_fast``：``run_backtest`` 两种引擎；
+- ``portfolio_10`` / ``portfolio_100`` / ``portfolio_1000``：``run_portfolio_backtest``；
+- ``live_iteration``：模拟 portfolio-live 的一轮轮询（增量K线、指标流、成交、日志，日志不 fsync）；
+- ``unit_states``：大组合的持仓状态（加满单位再止损一半），配合 ``memory=True`` 看内存与分配；
+- ``equity_metrics``：``metrics.equity_metrics`` 一次给大量权益曲线（runs × time）打分；
+- ``cli_help`` / ``cli_backtest``：新解释器里 ``turtle-backtest --help`` 与一次小回测的启动耗时（:func:`cli_startup`）。
+
+每个用例先预热一次，再计时 repeat 次取中位数。与基线比较时只比参数（规模）相同的用例，
+中位数超过 基线 × (1 + threshold) 记为回退。
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from .config import PortfolioConfig, PortfolioRiskCaps, SystemConfig, TurtleConfig
+from .synthetic import synthetic_ohlcv, synthetic_universe
+
+# 各用例规模：完整 / quick
+SIZES = {
+    "full": {"bars": 5000, "step_bars": 5000, "portfolio_bars": 1000, "live_symbols": 50, "live_polls": 20,
+             "state_symbols": 3000, "metric_runs": 10000, "metric_bars": 252},
+    "quick": {"bars": 1000, "step_bars": 1000, "portfolio_bars": 250, "live_symbols": 10, "live_polls": 5,
+              "state_symbols": 500, "metric_runs": 2000, "metric_bars": 252},
+}
+PORTFOLIO_SIZES = (10, 100, 1000)
+
+
+def _turtle() -> TurtleConfig:
+    return TurtleConfig(s1=SystemConfig(20, 10), s2=SystemConfig(55, 20))
+
+
+def _portfolio_cfg(instruments) -> PortfolioConfig:
+    return PortfolioConfig(turtle=_turtle(), instruments=instruments,
+                           risk_caps=PortfolioRiskCaps(max_units_total=max(10, len(instruments) // 4)))
+
+
+@contextlib.contextmanager
+def _no_indicator_cache():
+    """计时期间换成不记忆的指标缓存，避免重复运行命中缓存。"""
+    from .indicator_cache import IndicatorCache, get_default_cache, set_default_cache
+    prev = get_default_cache()
+    set_default_cache(IndicatorCache(max_items=0))
+    try:
+        yield
+    finally:
+        set_default_cache(prev)
+
+
+# ---- 用例：setup(params) 返回 (待计时的无参函数, 处理的条目数) ----
+def _case_prepare(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+    from .strategy import TurtleStrategy
+    df = synthetic_ohlcv(p["bars"], seed=1)
+    strat = TurtleStrategy(_turtle())
+    return (lambda: strat.prepare_indicators(df)), len(df)
+
+
+def _case_step(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+    from .strategy import TurtleState, TurtleStrategy
+    cfg = _turtle()
+    strat = TurtleStrategy(cfg)
+    rows = strat.prepare_indicators(synthetic_ohlcv(p["step_bars"], seed=2)).to_dict("records")
+
+    def run():
+        state = TurtleState()
+        for row in rows:
+            strat.step(row=row, state=state, equity=100_000.0, dollar_per_point=1.0, today=row["date"])
+
+    return run, len(rows)
+
+
+def _case_backtest(engine: str):
+    def setup(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+        from .backtest import run_backtest
+        df = synthetic_ohlcv(p["bars"], seed=3)
+        cfg = _turtle()
+        return (lambda: run_backtest(df, cfg, engine=engine)), len(df)
+    return setup
+
+
+def _case_portfolio(n_symbols: int):
+    def setup(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+        from .portfolio_backtest import run_portfolio_backtest
+        data_map, instruments = synthetic_universe(n_symbols, p["portfolio_bars"], seed=4)
+        cfg = _portfolio_cfg(instruments)
+        return (lambda: run_portfolio_backtest(data_map, cfg)), sum(len(df) for df in data_map.values())
+    return setup
+
+
+def _case_states(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+    """大组合的持仓状态：每个标的加满 max_units 个单位，再有一半单位触发止损。"""
+    from .strategy import TurtleState
+    n, max_units = p["state_symbols"], _turtle().pyramiding.max_units
+    day = pd.Timestamp("2020-01-02")
+
+    def run():
+        states = {}
+        fills: List[tuple] = []
+        for k in range(n):
+            st = states[k] = TurtleState(max_units)
+            for u in range(max_units):
+                st.book.push(100.0 + u, 1, 100, 98.0 + u, day)
+            st.book.take_stops(99.5, 104.0, fills)
+        return states
+
+    return run, n
+
+
+class SyntheticSource:
+    """离线数据源：每个标的只暴露前 cursor 根K线，advance() 推进一根，模拟新K线到来。"""
+
+    def __init__(self, data_map: Dict[str, pd.DataFrame], cursor: int):
+        self.data_map = data_map
+        self.cursor = cursor
+
+    def advance(self, k: int = 1):
+        self.cursor += k
+
+    def _visible(self, symbol: str) -> pd.DataFrame:
+        return self.data_map[symbol].iloc[:self.cursor]
+
+    def get_history(self, symbol: str, start=None, end=None, interval: str = "1d") -> pd.DataFrame:
+        df = self._visible(symbol)
+        if start is not None:
+            df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["date"] < pd.Timestamp(end)]
+        return df.reset_index(drop=True)
+
+    def recent_bars(self, symbol: str, n: int = 300, interval: str = "1d") -> pd.DataFrame:
+        return self._visible(symbol).tail(n).reset_index(drop=True)
+
+
+def _case_live(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+    from .data_sources import IncrementalBars
+    from .journal import PaperJournal
+    from .live_portfolio import _poll_once
+    from .portfolio import Portfolio
+    from .strategy import TurtleStrategy
+    nbars, polls = 300, p["live_polls"]
+    data_map, instruments = synthetic_universe(p["live_symbols"], 2 * nbars + polls, seed=5)
+    for ins in instruments:
+        ins.source = "efinance" if ins.rules.t_plus_one else "yfinance"
+    cfg = _portfolio_cfg(instruments)
+    inst = {ins.symbol: ins for ins in instruments}
+    tmp = tempfile.TemporaryDirectory(prefix="turtle-bench-")
+
+    def run():
+        # 每次计时都从同一状态开始：首轮（全量预热）不计入，只计后续 polls 轮增量
+        src = SyntheticSource(data_map, nbars)
+        sources = {sym: IncrementalBars(src, capacity=2 * nbars) for sym in inst}
+        strategys = {sym: TurtleStrategy(cfg.turtle) for sym in inst}
+        streams: Dict[str, Any] = {}
+        port = Portfolio(cfg)
+        journal = PaperJournal(tempfile.mkdtemp(dir=tmp.name), fsync=False)
+        args = (cfg, inst, sources, strategys, streams, port, journal, nbars, False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _poll_once(*args)
+            t0 = time.perf_counter()
+            for _ in range(polls):
+                src.advance()
+                _poll_once(*args)
+        return time.perf_counter() - t0
+
+    run.cleanup = tmp.cleanup
+    return run, polls
+
+
+def _case_metrics(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+    from .metrics import equity_metrics
+    rng = np.random.default_rng(6)
+    eq = 1e5 * np.cumprod(1 + rng.normal(3e-4, 0.01, (p["metric_runs"], p["metric_bars"])), axis=1)
+    index = pd.bdate_range("2020-01-01", periods=p["metric_bars"])
+    return (lambda: equity_metrics(eq, index)), p["metric_runs"]
+
+
+def cli_startup(args: Sequence[str]) -> Dict[str, Any]:
+    """新解释器里跑一次 ``turtle-backtest <args>``（``-X importtime``）。
+
+    返回墙钟秒数 seconds、顶层 import 的累计耗时之和 import_seconds、导入过的全部模块名 modules。
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    cmd = [sys.executable, "-X", "importtime", "-c", "from turtletrader.cli import main; main()", *args]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - t0
+    if proc.returncode:
+        raise RuntimeError(f"turtle-backtest {' '.join(args)} failed: {proc.stderr[-2000:]}")
+    modules, total = set(), 0
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        modules.add(parts[2].strip())
+        if not parts[2].startswith("  "):  # 顶层 import（嵌套的按层级缩进）
+            total += int(parts[1])
+    return {"seconds": wall, "import_seconds": total / 1e6, "modules": modules}
+
+
+def _case_cli(make_args: Callable[[str], List[str]]):
+    def setup(p: Dict[str, Any]) -> Tuple[Callable[[], Any], int]:
+        tmp = tempfile.TemporaryDirectory(prefix="turtle-bench-")
+        args = make_args(tmp.name)
+
+        def run():
+            return cli_startup(args)["seconds"]
+
+        run.cleanup = tmp.cleanup
+        return run, 1
+    return setup
+
+
+def _backtest_args(tmp: str) -> List[str]:
+    csv, cfg = os.path.join(tmp, "bars.csv"), os.path.join(tmp, "config.yaml")
+    synthetic_ohlcv(250, seed=3).to_csv(csv, index=False)
+    with open(cfg, "w") as f:  # JSON 也是合法的 YAML
+        json.dump({"systems": {"s1": {"entry_lookback": 20, "exit_lookback": 10},
+                               "s2": {"entry_lookback": 55, "exit_lookback": 20}}}, f)
+    return ["backtest", "--csv", csv, "--config", cfg, "--out", os.path.join(tmp, "out"), "--no_plot"]
+
+
+CASES: Dict[str, Callable[[Dict[str, Any]], Tuple[Callable[[], Any], int]]] = {
+    "prepare_indicators": _case_prepare,
+    "strategy_step": _case_step,
+    "backtest_reference": _case_backtest("reference"),
+    "backtest_fast": _case_backtest("fast"),
+    **{f"portfolio_{n}": _case_portfolio(n) for n in PORTFOLIO_SIZES},
+    "live_iteration": _case_live,
+    "unit_states": _case_states,
+    "equity_metrics": _case_metrics,
+    "cli_help": _case_cli(lambda tmp: ["--help"]),
+    "cli_backtest": _case_cli(_backtest_args),
+}
+# 用例实际用到的规模参数（写入结果，比较时必须一致）
+_CASE_PARAMS = {
+    "prepare_indicators": ("bars",), "strategy_step": ("step_bars",),
+    "backtest_reference": ("bars",), "backtest_fast": ("bars",),
+    **{f"portfolio_{n}": ("portfolio_bars",) for n in PORTFOLIO_SIZES},
+    "live_iteration": ("live_symbols", "live_polls"),
+    "unit_states": ("state_symbols",),
+    "equity_metrics": ("metric_runs", "metric_bars"),
+    "cli_help": (), "cli_backtest": (),
+}
+
+
+def time_case(name: str, sizes: Dict[str, Any], repeat: int = 3, memory: bool = False) -> Dict[str, Any]:
+    """预热一次后计时 repeat 次。run() 返回数值时视为它自己量出的耗时（用于排除内部准备步骤）。
+
+    memory=True 时再在 tracemalloc 下跑一次（不计时），记录峰值内存与分配的内存块数。
+    """
+    run, items = CASES[name](sizes)
+    runs: List[float] = []
+    mem: Dict[str, Any] = {}
+    try:
+        # 合成组合可能亏穿，CAGR 的无效幂运算警告与计时无关
+        with _no_indicator_cache(), np.errstate(invalid="ignore"):
+            run()
+            for _ in range(max(int(repeat), 1)):
+                t0 = time.perf_counter()
+                out = run()
+                runs.append(out if isinstance(out, float) else time.perf_counter() - t0)
+            if memory:
+                mem = _trace_memory(run)
+    finally:
+        getattr(run, "cleanup", lambda: None)()
+    med = statistics.median(runs)
+    return {"seconds": med, "min": min(runs), "runs": runs, "items": items,
+            "per_sec": items / med if med > 0 else float("inf"), **mem,
+            "params": {k: sizes[k] for k in _CASE_PARAMS[name]}}
+
+
+def _trace_memory(run: Callable[[], Any]) -> Dict[str, Any]:
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        out = run()
+        _, peak = tracemalloc.get_traced_memory()
+        # 返回值仍持有的对象：块数近似本用例留存的分配次数
+        blocks = sum(st.count for st in tracemalloc.take_snapshot().statistics("filename"))
+        del out
+    finally:
+        tracemalloc.stop()
+    return {"peak_kb": peak / 1024, "blocks": blocks}
+
+
+def environment() -> Dict[str, Any]:
+    from . import __version__
+    return {"version": __version__, "python": platform.python_version(), "numpy": np.__version__,
+            "pandas": pd.__version__, "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "time": pd.Timestamp.now().isoformat(timespec="seconds")}
+
+
+def run_bench(cases: Optional[Sequence[str]] = None, quick: bool = False, repeat: int = 3, memory: bool = False,
+              on_case: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """跑选定用例（默认全部），返回 {"env": 运行环境, "cases": {用例: 计时}}。"""
+    sizes = SIZES["quick" if quick else "full"]
+    names = list(cases) if cases else list(CASES)
+    unknown = [c for c in names if c not in CASES]
+    if unknown:
+        raise ValueError(f"unknown cases {unknown}; choose from {list(CASES)}")
+    out: Dict[str, Any] = {"env": environment(), "cases": {}}
+    for name in names:
+        out["cases"][name] = res = time_case(name, sizes, repeat, memory)
+        if on_case is not None:
+            on_case(name, res)
+    return out
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.25) -> pd.DataFrame:
+    """逐用例对比中位耗时：ratio = 当前 / 基线，ratio > 1 + threshold 为回退；规模不同的用例跳过。"""
+    rows = []
+    for name, cur in results.get("cases", {}).items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None or base.get("params") != cur.get("params"):
+            rows.append({"case": name, "baseline": None, "current": cur["seconds"], "ratio": None,
+                         "status": "skipped"})
+            continue
+        ratio = cur["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+        status = "regressed" if ratio > 1 + threshold else ("improved" if ratio < 1 - threshold else "ok")
+        rows.append({"case": name, "baseline": base["seconds"], "current": cur["seconds"], "ratio": ratio,
+                     "status": status})
+    return pd.DataFrame(rows, columns=["case", "baseline", "current", "ratio", "status"])
+
+
+def save_results(results: Dict[str, Any], path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
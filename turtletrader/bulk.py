@@ -0,0 +1,153 @@
+"""批量下载：有界线程池并发拉取多标的历史，按数据源限速、失败指数退避重试。
+
+落到 :class:`~turtletrader.store.MarketStore` 时可断点续传：已在库中的区间不再请求，
+中断后重跑只补缺失的标的与新K线。2000 个标的的准备时间由数据源限速决定，而不是串行往返延迟。
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Union
+import random
+import threading
+import time
+import pandas as pd
+from .data_sources import DataSource, get_source
+
+# 每秒请求数的默认上限（可由 rates 覆盖）
+DEFAULT_RATES = {"yfinance": 2.0, "efinance": 5.0}
+_SOURCE_NAMES = {"yf": "yfinance", "yahoo": "yfinance", "ef": "efinance", "china": "efinance", "cn": "efinance"}
+
+
+def _canonical(name: str) -> str:
+    """数据源别名 -> 规范名（限速与数据源实例按规范名共享）。"""
+    return _SOURCE_NAMES.get(name.lower(), name.lower())
+
+
+class RateLimiter:
+    """令牌桶：平均每秒 rate 次，允许 burst 次突发；rate<=0 不限速。线程安全。"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ThrottledSource(DataSource):
+    """包装数据源：每次请求先取令牌，异常时按 backoff * 2**k（加随机抖动）重试。"""
+
+    def __init__(self, source: DataSource, limiter: RateLimiter, retries: int = 4, backoff: float = 1.0):
+        self.source = source
+        self.limiter = limiter
+        self.retries = retries
+        self.backoff = backoff
+
+    def _call(self, fn: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        for k in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                return fn()
+            except Exception:
+                if k == self.retries:
+                    raise
+                time.sleep(self.backoff * (2 ** k) * (1.0 + random.random()))
+
+    def get_history(self, symbol: str, start: Optional[str], end: Optional[str], interval: str) -> pd.DataFrame:
+        return self._call(lambda: self.source.get_history(symbol, start, end, interval))
+
+    def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
+        return self._call(lambda: self.source.recent_bars(symbol, n, interval))
+
+
+@dataclass
+class DownloadJob:
+    symbol: str
+    source: str
+    interval: str = "1d"
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+
+@dataclass
+class JobResult:
+    job: DownloadJob
+    rows: int = 0
+    error: Optional[str] = None
+    data: Optional[pd.DataFrame] = None
+
+
+def jobs_from_portfolio(pcfg) -> List[DownloadJob]:
+    """组合配置中带 source 的标的。"""
+    return [DownloadJob(ins.symbol, ins.source, ins.interval, ins.start, ins.end)
+            for ins in pcfg.instruments if ins.source]
+
+
+def parse_symbols(text: str) -> List[str]:
+    """逗号/空白分隔的代码列表；``@path`` 从文件读取（每行一个，# 开头为注释）。"""
+    if text.startswith("@"):
+        with open(text[1:], "r") as f:
+            text = "\n".join(line.split("#", 1)[0] for line in f)
+    return [s for s in text.replace(",", " ").split() if s]
+
+
+def bulk_download(jobs: Iterable[DownloadJob], store_dir: Optional[str] = None, workers: int = 8,
+                  rates: Optional[Dict[str, float]] = None, retries: int = 4, backoff: float = 1.0,
+                  keep: bool = False, ttl: float = 12 * 3600,
+                  sources: Optional[Dict[str, DataSource]] = None,
+                  on_done: Optional[Callable[[JobResult], None]] = None) -> List[JobResult]:
+    """并发执行下载任务，返回与 jobs 同序的结果（失败的任务记录错误，不中断其它任务）。
+
+    store_dir：写入本地行情库并据此续传；为空时只在内存中拉取（需 keep=True 才保留数据）。
+    rates：数据源名 -> 每秒请求数，缺省用 DEFAULT_RATES。sources 可直接给出数据源实例。
+    名称均可用别名（yf / ef ...）：同一数据源的各个别名共用一个限速器。
+    """
+    jobs = list(jobs)
+    rates = {**DEFAULT_RATES, **{_canonical(k): v for k, v in (rates or {}).items()}}
+    given = {_canonical(k): v for k, v in (sources or {}).items()}
+    fetchers: Dict[str, DataSource] = {}
+    broken: Dict[str, str] = {}  # 建不起来的数据源（如未安装可选依赖）-> 错误，其任务逐个记为失败
+    for key in {_canonical(j.source) for j in jobs}:
+        try:
+            src = given.get(key) or get_source(key)
+        except Exception as e:
+            broken[key] = f"{type(e).__name__}: {e}"
+            continue
+        src = ThrottledSource(src, RateLimiter(rates.get(key, 0.0)), retries, backoff)
+        if store_dir:
+            from .store import MarketStore
+            src = MarketStore(store_dir, src, ttl=ttl)
+        fetchers[key] = src
+
+    def run(job: DownloadJob) -> JobResult:
+        key = _canonical(job.source)
+        if key in broken:
+            return JobResult(job, error=broken[key])
+        try:
+            df = fetchers[key].get_history(job.symbol, job.start, job.end, job.interval)
+            return JobResult(job, rows=len(df), data=df if keep else None)
+        except Exception as e:
+            return JobResult(job, error=f"{type(e).__name__}: {e}")
+
+    results: List[Union[JobResult, None]] = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(run, j): i for i, j in enumerate(jobs)}
+        for fut in as_completed(futs):
+            res = results[futs[fut]] = fut.result()
+            if on_done is not None:
+                on_done(res)
+    return results  # type: ignore[return-value]
@@ -1,12 +1,185 @@
+"""交易日历服务：每个交易所的交易日一次性载入成有序数组，之后的查询都是二分查找。
+
+- :class:`TradingCalendar`：交易日（本地日期）与开/收盘时间（UTC），
+  支持 ``is_session`` / ``next_session`` / ``previous_session`` / ``session_open`` / ``session_close``；
+- 可存成 ``<dir>/<market>.npz`` 离线使用：``TURTLE_CALENDAR_DIR`` 指定目录，
+  用 ``turtle-backtest calendar-bundle`` 预先生成；
+- :func:`get_calendar` 进程内缓存：先内存、再离线包、最后用 pandas_market_calendars 生成（并写回离线包）。
+  两者都没有时返回 None，``is_trading_day`` 与以前一样一律放行。
+"""
+from typing import Dict, Optional
+import os
+import threading
+import numpy as np
 import pandas as pd
 try:
     import pandas_market_calendars as mcal
 except Exception:
     mcal = None
 
+# 数据源 -> 默认交易所
+SOURCE_MARKETS = {
+    "yfinance": "NYSE", "yf": "NYSE", "yahoo": "NYSE",
+    "efinance": "SSE", "ef": "SSE", "china": "SSE", "cn": "SSE",
+}
+# 覆盖多个交易所的数据源：代码本身定不了市场（聚合时段不按它推断）
+GLOBAL_SOURCES = ("yfinance", "yf", "yahoo")
+# 未指定范围时生成的日历覆盖 [今年-YEARS_BACK, 今年+YEARS_AHEAD]
+YEARS_BACK = 30
+YEARS_AHEAD = 2
+
+
+def market_for_source(source: Optional[str], default: str = "NYSE") -> str:
+    return SOURCE_MARKETS.get((source or "").lower(), default)
+
+
+def _day_ns(ts) -> int:
+    """时间点所在的本地日期（午夜，纳秒）。"""
+    ts = pd.Timestamp(ts)
+    if ts.tz is not None:
+        ts = ts.tz_localize(None)
+    return int(ts.normalize().as_unit("ns").value)
+
+
+class TradingCalendar:
+    def __init__(self, market: str, sessions: np.ndarray, opens: np.ndarray, closes: np.ndarray,
+                 start: int, end: int):
+        self.market = market
+        self.sessions = np.asarray(sessions, dtype=np.int64)  # 交易日（本地午夜，ns），升序
+        self.opens = np.asarray(opens, dtype=np.int64)        # 开盘时间（UTC ns）
+        self.closes = np.asarray(closes, dtype=np.int64)      # 收盘时间（UTC ns）
+        self.start = int(start)  # 覆盖范围 [start, end]（本地日期 ns）
+        self.end = int(end)
+
+    @classmethod
+    def from_mcal(cls, market: str, start, end) -> "TradingCalendar":
+        if mcal is None:
+            raise RuntimeError("需要安装 pandas_market_calendars，请执行：pip install pandas_market_calendars")
+        sched = mcal.get_calendar(market).schedule(start_date=pd.Timestamp(start), end_date=pd.Timestamp(end))
+        days = pd.DatetimeIndex(sched.index).tz_localize(None).normalize()
+
+        def utc_ns(col: str) -> np.ndarray:
+            t = pd.DatetimeIndex(sched[col])
+            t = t.tz_convert("UTC").tz_localize(None) if t.tz is not None else t
+            return t.as_unit("ns").asi8
+
+        return cls(market, days.as_unit("ns").asi8, utc_ns("market_open"), utc_ns("market_close"),
+                   _day_ns(start), _day_ns(end))
+
+    # ---- 持久化 ----
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, sessions=self.sessions, opens=self.opens, closes=self.closes,
+                 span=np.array([self.start, self.end], dtype=np.int64), market=np.array(self.market))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TradingCalendar":
+        with np.load(path) as z:
+            return cls(str(z["market"]), z["sessions"], z["opens"], z["closes"], *z["span"].tolist())
+
+    # ---- 查询 ----
+    def covers(self, ts) -> bool:
+        return self.start <= _day_ns(ts) <= self.end
+
+    def _pos(self, ts) -> int:
+        return int(np.searchsorted(self.sessions, _day_ns(ts), "left"))
+
+    def is_session(self, ts) -> bool:
+        i, d = self._pos(ts), _day_ns(ts)
+        return i < len(self.sessions) and self.sessions[i] == d
+
+    def next_session(self, ts, inclusive: bool = False) -> Optional[pd.Timestamp]:
+        """ts 之后（inclusive 时含当天）的第一个交易日；超出范围返回 None。"""
+        d = _day_ns(ts)
+        i = int(np.searchsorted(self.sessions, d, "left" if inclusive else "right"))
+        return pd.Timestamp(self.sessions[i]) if i < len(self.sessions) else None
+
+    def previous_session(self, ts, inclusive: bool = False) -> Optional[pd.Timestamp]:
+        d = _day_ns(ts)
+        i = int(np.searchsorted(self.sessions, d, "right" if inclusive else "left")) - 1
+        return pd.Timestamp(self.sessions[i]) if i >= 0 else None
+
+    def _session_time(self, ts, arr: np.ndarray) -> Optional[pd.Timestamp]:
+        if not self.is_session(ts):
+            return None
+        return pd.Timestamp(arr[self._pos(ts)], tz="UTC")
+
+    def session_open(self, ts) -> Optional[pd.Timestamp]:
+        """ts 所在交易日的开盘时间（UTC）；非交易日返回 None。"""
+        return self._session_time(ts, self.opens)
+
+    def session_close(self, ts) -> Optional[pd.Timestamp]:
+        return self._session_time(ts, self.closes)
+
+    def sessions_in_range(self, start, end) -> pd.DatetimeIndex:
+        lo = int(np.searchsorted(self.sessions, _day_ns(start), "left"))
+        hi = int(np.searchsorted(self.sessions, _day_ns(end), "right"))
+        return pd.DatetimeIndex(self.sessions[lo:hi].astype("datetime64[ns]"))
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+
+_calendars: Dict[str, TradingCalendar] = {}
+_lock = threading.Lock()
+
+
+def bundle_dir() -> Optional[str]:
+    return os.getenv("TURTLE_CALENDAR_DIR") or None
+
+
+def _bundle_path(d: str, market: str) -> str:
+    return os.path.join(d, f"{market}.npz")
+
+
+def build_calendar(market: str, start=None, end=None, out_dir: Optional[str] = None) -> TradingCalendar:
+    """用 pandas_market_calendars 生成日历，给定 out_dir 时写入离线包。"""
+    year = pd.Timestamp.now().year
+    start = start or f"{year - YEARS_BACK}-01-01"
+    end = end or f"{year + YEARS_AHEAD}-12-31"
+    cal = TradingCalendar.from_mcal(market, start, end)
+    if out_dir:
+        cal.save(_bundle_path(out_dir, market))
+    return cal
+
+
+def get_calendar(market: str, ts=None) -> Optional[TradingCalendar]:
+    """取交易所日历（进程内缓存）；给定 ts 时保证覆盖它。无法获得时返回 None。"""
+    with _lock:
+        cal = _calendars.get(market)
+        if cal is not None and (ts is None or cal.covers(ts)):
+            return cal
+        d = bundle_dir()
+        if cal is None and d and os.path.exists(_bundle_path(d, market)):
+            try:
+                cal = TradingCalendar.load(_bundle_path(d, market))
+            except (OSError, ValueError, KeyError):
+                cal = None
+        if mcal is not None and (cal is None or (ts is not None and not cal.covers(ts))):
+            start = end = None
+            if ts is not None:
+                day = pd.Timestamp(_day_ns(ts))
+                year = pd.Timestamp.now().year
+                start = min(day, pd.Timestamp(f"{year - YEARS_BACK}-01-01")).strftime("%Y-%m-%d")
+                end = max(day, pd.Timestamp(f"{year + YEARS_AHEAD}-12-31")).strftime("%Y-%m-%d")
+            try:
+                cal = build_calendar(market, start, end, out_dir=d)
+            except OSError:
+                cal = build_calendar(market, start, end)
+        if cal is not None:
+            _calendars[market] = cal
+        return cal
+
+
+def set_calendar(cal: TradingCalendar):
+    with _lock:
+        _calendars[cal.market] = cal
+
+
 def is_trading_day(ts: pd.Timestamp, market: str = "NYSE") -> bool:
-    if mcal is None:
+    cal = get_calendar(market, ts)
+    if cal is None or not cal.covers(ts):
         return True
-    cal = mcal.get_calendar(market)
-    schedule = cal.schedule(start_date=ts.normalize(), end_date=ts.normalize())
-    return not schedule.empty
+    return cal.is_session(ts)
@@ -1,12 +1,11 @@
+"""命令行入口。
+
+启动只导入 click 与 config（纯 dataclass）：pandas、yaml、pydantic、回测引擎、数据源等
+都在用到它们的子命令里导入，``--help`` 与调度器的频繁调用不为用不到的模块付导入时间。
+"""
 import click, os, sys, json
-import pandas as pd
-import yaml
 from .config import (TurtleConfig, SystemConfig, PyramidingConfig, MarketConfig,
                      RuleConfig, InstrumentConfig, PortfolioConfig, PortfolioRiskCaps)
-from .backtest import run_backtest
-from .data_sources import YFinanceSource, EFinanceSource
-from .portfolio_backtest import run_portfolio_backtest
-from .schema import PortfolioSchema
 
 def load_turtle_config(y: dict) -> TurtleConfig:
     s1 = y.get("systems", {}).get("s1")
@@ -21,6 +20,8 @@ def load_turtle_config(y: dict) -> TurtleConfig:
     )
 
 def load_portfolio_config(path: str) -> PortfolioConfig:
+    import yaml
+    from .schema import PortfolioSchema
     with open(path, "r") as f:
         y = yaml.safe_load(f)
         validated = PortfolioSchema(**y)   # 若不合法会抛错
@@ -43,6 +44,8 @@ def load_portfolio_config(path: str) -> PortfolioConfig:
             start=item.get("start"),
             end=item.get("end"),
             interval=item.get("interval","1d"),
+            base_interval=item.get("base_interval"),
+            market=item.get("market"),
             dollar_per_point=item.get("dollar_per_point", 1.0),
             rules=rules
         ))
@@ -53,6 +56,27 @@ def load_portfolio_config(path: str) -> PortfolioConfig:
         risk_caps = prc
     )
 
+def _use_indicator_cache(cache_dir):
+    """--indicator_cache：给进程级指标缓存挂上磁盘层。"""
+    from .indicator_cache import IndicatorCache, set_default_cache
+    if cache_dir:
+        set_default_cache(IndicatorCache(disk_dir=cache_dir))
+
+def _echo_cache_stats(cache_dir):
+    if cache_dir:
+        from .indicator_cache import get_default_cache
+        click.echo(f"indicator cache: {json.dumps(get_default_cache().stats())}", err=True)
+
+def _start_profile(profile_path):
+    from .profiling import enable, get_profiler
+    return enable() if profile_path else get_profiler()
+
+def _finish_profile(prof, profile_path):
+    if profile_path:
+        prof.write_report(profile_path)
+        click.echo(prof.format_table(), err=True)
+        click.echo(f"Profile saved to {profile_path}", err=True)
+
 @click.group()
 def main():
     """Turtle Trading CLI (single + portfolio)"""
@@ -61,50 +85,393 @@ def main():
 @click.option("--csv", "csv_path", required=True)
 @click.option("--config", "config_path", required=True)
 @click.option("--out", "out_dir", default="./report")
-def backtest(csv_path, config_path, out_dir):
+@click.option("--engine", type=click.Choice(["reference", "fast"]), default="reference", help="fast: 数组化状态机，结果与 reference 一致")
+@click.option("--indicator_cache", default=None, help="指标缓存磁盘目录（跨运行/进程复用 N 与通道）")
+@click.option("--no_plot", is_flag=True, help="不画 equity_curve.png（省去导入 matplotlib）")
+def backtest(csv_path, config_path, out_dir, engine, indicator_cache, no_plot):
+    import pandas as pd
+    import yaml
+    from .backtest import run_backtest
+    _use_indicator_cache(indicator_cache)
     df = pd.read_csv(csv_path)
     cfg = load_turtle_config(yaml.safe_load(open(config_path)))
-    res = run_backtest(df, cfg, out_dir=out_dir)
+    res = run_backtest(df, cfg, out_dir=out_dir, engine=engine, plot=not no_plot)
+    _echo_cache_stats(indicator_cache)
+    click.echo(json.dumps(res["metrics"], indent=2))
+
+@main.command()
+@click.option("--csv", "csv_path", required=True)
+@click.option("--config", "config_path", required=True, help="基础参数（同 backtest 的 YAML）")
+@click.option("--grid", "grid_path", required=True, help="参数网格 YAML：与基础配置同结构，叶子为候选值列表")
+@click.option("--out", "out_csv", default="./sweep.csv")
+@click.option("--workers", default=0, help="进程数，0/1 为单进程")
+@click.option("--sort_by", default="cagr")
+@click.option("--top", default=10, help="终端打印前 N 组")
+@click.option("--indicator_cache", default=None, help="指标缓存磁盘目录（跨运行/进程复用 N 与通道）")
+def sweep(csv_path, config_path, grid_path, out_csv, workers, sort_by, top, indicator_cache):
+    import pandas as pd
+    import yaml
+    from .sweep import expand_grid, run_sweep
+    _use_indicator_cache(indicator_cache)
+    df = pd.read_csv(csv_path)
+    base = yaml.safe_load(open(config_path)) or {}
+    grid = yaml.safe_load(open(grid_path)) or {}
+    configs = [load_turtle_config(y) for y in expand_grid(base, grid)]
+    res = run_sweep(df, configs, workers=workers)
+    res = res.sort_values(sort_by, ascending=False, na_position="last")
+    res.to_csv(out_csv, index=False)
+    click.echo(f"Wrote {out_csv} ({len(res)} configs)")
+    click.echo(res.head(top).to_string(index=False))
+    _echo_cache_stats(indicator_cache)
+
+@main.command()
+@click.option("--config", "config_path", required=True, help="组合 YAML；配合 --csv 时为单标配置")
+@click.option("--csv", "csv_path", default=None, help="单标模式：行情 CSV")
+@click.option("--space", "space_path", required=True, help="搜索空间 YAML（params / metric / direction）")
+@click.option("--trials", default=100, help="trial 总数")
+@click.option("--workers", default=0, help="并行进程数（0 = CPU 核数）")
+@click.option("--metric", type=click.Choice(["cagr", "sharpe", "max_drawdown", "end_equity"]), default=None)
+@click.option("--direction", type=click.Choice(["maximize", "minimize"]), default=None)
+@click.option("--pruner", type=click.Choice(["median", "halving", "none"]), default="median")
+@click.option("--segments", default=4, help="组合回测分几段汇报中间结果（剪枝用）")
+@click.option("--out", "out_dir", default="./optimize")
+@click.option("--storage", default=None, help="optuna 存储：sqlite:///... 或 Journal 日志文件路径（默认 OUT/study.log）")
+@click.option("--study", "study_name", default="turtle")
+@click.option("--seed", default=None, type=int)
+@click.option("--auto_download", is_flag=True)
+@click.option("--store", "store_dir", default=None, help="本地行情库目录")
+def optimize(config_path, csv_path, space_path, trials, workers, metric, direction, pruner, segments, out_dir,
+             storage, study_name, seed, auto_download, store_dir):
+    """参数寻优：行情只加载一次，多进程并行 trial，组合按时间分段剪枝。"""
+    import pandas as pd
+    import yaml
+    from .optimize import portfolio_data, run_optimize, single_data
+    space = yaml.safe_load(open(space_path)) or {}
+    metric = metric or space.get("metric", "sharpe")
+    direction = direction or space.get("direction", "maximize")
+    if csv_path:
+        base = load_turtle_config(yaml.safe_load(open(config_path)))
+        data = single_data(pd.read_csv(csv_path))
+    else:
+        base = load_portfolio_config(config_path)
+        data = portfolio_data(_load_portfolio_data(base, auto_download, store_dir))
+    study = run_optimize(base, space.get("params", {}), data, n_trials=trials, workers=workers or os.cpu_count(),
+                         metric=metric, direction=direction, pruner=pruner, segments=segments, out_dir=out_dir,
+                         storage=storage, study_name=study_name, seed=seed)
+    study.trials_dataframe().to_csv(os.path.join(out_dir, "trials.csv"), index=False)
+    with open(os.path.join(out_dir, "best_params.json"), "w") as f:
+        json.dump({"metric": metric, "value": study.best_value, "params": study.best_params}, f, indent=2)
+    states = pd.Series([t.state.name for t in study.trials]).value_counts().to_dict()
+    click.echo(f"trials: {json.dumps(states)}")
+    click.echo(f"best {metric}={study.best_value:.6g} {json.dumps(study.best_params)}")
+
+@main.command("walk-forward")
+@click.option("--config", "config_path", required=True, help="组合 YAML")
+@click.option("--space", "space_path", default=None, help="搜索空间 YAML；省略则每折直接用原配置")
+@click.option("--folds", default=5)
+@click.option("--train", default=None, type=int, help="训练窗K线数（默认按 folds 推算）")
+@click.option("--test", default=None, type=int, help="测试窗K线数（默认等分训练窗之后的部分）")
+@click.option("--anchored", is_flag=True, help="锚定窗口：训练窗始终从第一根开始")
+@click.option("--trials", default=100, help="每折 trial 数")
+@click.option("--workers", default=0, help="并行折数（0 = CPU 核数）")
+@click.option("--metric", type=click.Choice(["cagr", "sharpe", "max_drawdown", "end_equity"]), default=None)
+@click.option("--direction", type=click.Choice(["maximize", "minimize"]), default=None)
+@click.option("--pruner", type=click.Choice(["median", "halving", "none"]), default="median")
+@click.option("--segments", default=4)
+@click.option("--seed", default=None, type=int)
+@click.option("--out", "out_dir", default="./walkforward")
+@click.option("--auto_download", is_flag=True)
+@click.option("--store", "store_dir", default=None, help="本地行情库目录")
+@click.option("--indicator_cache", default=None, help="指标缓存磁盘目录（各折进程共享全历史指标）")
+def walk_forward(config_path, space_path, folds, train, test, anchored, trials, workers, metric, direction,
+                 pruner, segments, seed, out_dir, auto_download, store_dir, indicator_cache):
+    """Walk-forward：每折训练窗寻优、测试窗样本外评估，各折并行；输出拼接的样本外净值。"""
+    import yaml
+    from .walkforward import run_walk_forward
+    space = (yaml.safe_load(open(space_path)) or {}) if space_path else {}
+    pcfg = load_portfolio_config(config_path)
+    data_map = _load_portfolio_data(pcfg, auto_download, store_dir)
+    res = run_walk_forward(data_map, pcfg, space.get("params", {}), folds=folds, train=train, test=test,
+                           anchored=anchored, workers=workers or os.cpu_count(), out_dir=out_dir,
+                           indicator_cache=indicator_cache, n_trials=trials,
+                           metric=metric or space.get("metric", "sharpe"),
+                           direction=direction or space.get("direction", "maximize"),
+                           pruner=pruner, segments=segments, seed=seed)
+    cols = ["index", "test_start", "test_end", "is_value", "cagr", "sharpe", "max_drawdown", "params"]
+    click.echo(res["folds"][cols].to_string(index=False))
     click.echo(json.dumps(res["metrics"], indent=2))
 
+@main.command()
+@click.option("--results", "results_dir", required=True, help="回测输出目录（equity_curve.csv，可选 trades.csv）")
+@click.option("--n", "n_scenarios", default=10000, help="每种方法的情景数")
+@click.option("--method", "methods", multiple=True, type=click.Choice(["bootstrap", "reshuffle", "skip"]),
+              default=["bootstrap", "reshuffle", "skip"])
+@click.option("--block", default=20, help="bootstrap 块长（天）")
+@click.option("--skip", "skip_prob", default=0.1, help="skip：每笔交易被跳过的概率")
+@click.option("--chunk", "chunk_size", default=1000, help="每块生成的情景数（控制内存）")
+@click.option("--seed", default=None, type=int)
+@click.option("--out", "out_dir", default=None, help="输出目录（默认写回 --results）")
+def robustness(results_dir, n_scenarios, methods, block, skip_prob, chunk_size, seed, out_dir):
+    """蒙特卡洛 / 自助抽样稳健性检验：CAGR、Sharpe、最大回撤的分布。"""
+    import pandas as pd
+    from .robustness import run_robustness, summarize
+    eq = pd.read_csv(os.path.join(results_dir, "equity_curve.csv"), index_col=0, parse_dates=True)["equity"]
+    trades_csv = os.path.join(results_dir, "trades.csv")
+    trades = pd.read_csv(trades_csv).to_dict("records") if os.path.exists(trades_csv) else None
+    m = run_robustness(eq, trades, n=n_scenarios, methods=methods, block=block, skip_prob=skip_prob,
+                       chunk_size=chunk_size, seed=seed)
+    out_dir = out_dir or results_dir
+    os.makedirs(out_dir, exist_ok=True)
+    summary = summarize(m)
+    m.to_csv(os.path.join(out_dir, "robustness_scenarios.csv"), index=False)
+    summary.to_csv(os.path.join(out_dir, "robustness_summary.csv"))
+    click.echo(summary.to_string(float_format=lambda x: f"{x:.4f}"))
+
 @main.command()
 @click.option("--source", type=click.Choice(["yfinance","efinance"]), required=True)
 @click.option("--symbol", required=True)
 @click.option("--interval", default="1d")
 @click.option("--start", default=None)
 @click.option("--end", default=None)
-@click.option("--out", "out_csv", required=True)
-def download(source, symbol, interval, start, end, out_csv):
-    src = YFinanceSource() if source=="yfinance" else EFinanceSource()
+@click.option("--out", "out_csv", default=None)
+@click.option("--store", "store_dir", default=None, help="本地行情库目录：只拉取库中最后一根之后的新K线")
+def download(source, symbol, interval, start, end, out_csv, store_dir):
+    if not out_csv and not store_dir:
+        raise click.UsageError("Provide --out and/or --store.")
+    from .data_sources import get_source
+    src = get_source(source)
+    if store_dir:
+        from .store import MarketStore
+        src = MarketStore(store_dir, src)
     df = src.get_history(symbol, start, end, interval)
-    df.to_csv(out_csv, index=False)
-    click.echo(f"Wrote {out_csv} ({len(df)} rows)")
+    if out_csv:
+        df.to_csv(out_csv, index=False)
+        click.echo(f"Wrote {out_csv} ({len(df)} rows)")
+    else:
+        click.echo(f"Stored {symbol} {interval} in {store_dir} ({len(df)} rows)")
 
-@main.command("portfolio-backtest")
-@click.option("--config", "config_path", required=True)
-@click.option("--out", "out_dir", default="./report_port")
-@click.option("--auto_download", is_flag=True)
-@click.option("--html_report", is_flag=True)
-def portfolio_backtest_cmd(config_path, out_dir, auto_download,html_report):
-    pcfg = load_portfolio_config(config_path)
+@main.command("bulk-download")
+@click.option("--config", "config_path", default=None, help="组合 YAML：下载其中带 source 的标的")
+@click.option("--symbols", default=None, help="逗号分隔的代码，或 @文件（每行一个）")
+@click.option("--source", default="yfinance", help="--symbols 使用的数据源")
+@click.option("--interval", default="1d")
+@click.option("--start", default=None)
+@click.option("--end", default=None)
+@click.option("--store", "store_dir", required=True, help="本地行情库目录（已下载的区间跳过，可断点续传）")
+@click.option("--workers", default=8, help="并发线程数")
+@click.option("--rate", default=None, type=float, help="每个数据源每秒请求上限（默认按数据源）")
+@click.option("--retries", default=4, help="失败重试次数（指数退避）")
+def bulk_download_cmd(config_path, symbols, source, interval, start, end, store_dir, workers, rate, retries):
+    from .bulk import DownloadJob, bulk_download, jobs_from_portfolio, parse_symbols
+    if not config_path and not symbols:
+        raise click.UsageError("Provide --config and/or --symbols.")
+    jobs = jobs_from_portfolio(load_portfolio_config(config_path)) if config_path else []
+    if symbols:
+        jobs += [DownloadJob(s, source, interval, start, end) for s in parse_symbols(symbols)]
+    rates = {j.source: rate for j in jobs} if rate is not None else None
+    done = [0]
+
+    def progress(res):
+        done[0] += 1
+        status = f"ERROR {res.error}" if res.error else f"{res.rows} rows"
+        click.echo(f"[{done[0]}/{len(jobs)}] {res.job.symbol} {res.job.interval}: {status}", err=True)
+
+    results = bulk_download(jobs, store_dir, workers=workers, rates=rates, retries=retries, on_done=progress)
+    failed = [r for r in results if r.error]
+    click.echo(f"Stored {len(results) - len(failed)}/{len(results)} symbols in {store_dir}")
+    if failed:
+        raise click.ClickException("failed: " + ", ".join(r.job.symbol for r in failed))
+
+@main.command("calendar-bundle")
+@click.option("--market", "markets", multiple=True, default=["NYSE", "SSE"], help="交易所代号（可重复）")
+@click.option("--start", default=None)
+@click.option("--end", default=None)
+@click.option("--out", "out_dir", default=None, help="离线日历目录（默认 TURTLE_CALENDAR_DIR）")
+def calendar_bundle(markets, start, end, out_dir):
+    """生成离线交易日历（每个交易所一个 .npz），设置 TURTLE_CALENDAR_DIR 后无需联网与 mcal。"""
+    from .cal import build_calendar, bundle_dir
+    out_dir = out_dir or bundle_dir()
+    if not out_dir:
+        raise click.UsageError("Provide --out or set TURTLE_CALENDAR_DIR.")
+    for m in markets:
+        cal = build_calendar(m, start, end, out_dir=out_dir)
+        click.echo(f"Wrote {m}: {len(cal)} sessions -> {out_dir}")
+
+@main.command()
+@click.option("--case", "cases", multiple=True, help="只跑指定用例（可重复）；默认全部")
+@click.option("--quick", is_flag=True, help="缩小规模（CI / 冒烟）")
+@click.option("--repeat", default=3, help="每个用例计时次数（取中位数）")
+@click.option("--out", "out_json", default="./bench.json", help="结果 JSON")
+@click.option("--baseline", default=None, help="基线 JSON：超过阈值的回退会使命令失败")
+@click.option("--threshold", default=0.25, help="允许的变慢比例（0.25 = 25%）")
+@click.option("--memory", is_flag=True, help="另跑一次 tracemalloc，记录峰值内存与内存块数")
+def bench(cases, quick, repeat, out_json, baseline, threshold, memory):
+    """离线基准测试（合成行情）：热点路径计时、存 JSON、与基线比较。"""
+    from .bench import CASES, compare, load_results, run_bench, save_results
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        raise click.UsageError(f"unknown case(s) {unknown}; choose from {list(CASES)}")
+
+    def progress(name, res):
+        mem = f"  peak {res['peak_kb']:,.0f} KiB, {res['blocks']:,} blocks" if "peak_kb" in res else ""
+        click.echo(f"{name:<20} {res['seconds'] * 1000:10.1f} ms  {res['per_sec']:14,.0f} items/s{mem}", err=True)
+
+    results = run_bench(cases or None, quick=quick, repeat=repeat, memory=memory, on_case=progress)
+    save_results(results, out_json)
+    click.echo(f"Saved to {out_json}")
+    if baseline:
+        table = compare(results, load_results(baseline), threshold)
+        click.echo(table.to_string(index=False))
+        bad = table[table["status"] == "regressed"]
+        if len(bad):
+            raise click.ClickException("regressed: " + ", ".join(bad["case"]))
+
+def _download_to_store(pcfg, store_dir):
+    """把配置中有数据源的标的增量下载进本地行情库（不在内存中保留）。"""
+    from .bulk import DownloadJob, bulk_download
+    jobs = [DownloadJob(ins.symbol, ins.source, _fetch_interval(ins), ins.start, ins.end) for ins in pcfg.instruments
+            if ins.source]
+    for r in bulk_download(jobs, store_dir):
+        if r.error:
+            raise click.ClickException(f"download {r.job.symbol} failed: {r.error}")
+
+def _fetch_interval(ins):
+    """实际下载/读取的周期：配置了 base_interval 时只取细K线，再本地聚合。"""
+    return ins.base_interval or ins.interval
+
+def _load_portfolio_data(pcfg, auto_download=False, store_dir=None):
+    """按组合配置取各标的行情：csv > 本地行情库 > 自动下载（并发）。"""
+    import pandas as pd
     data_map = {}
+    offline = None
+    if store_dir:
+        from .store import MarketStore
+        offline = MarketStore(store_dir)
+    fetched = {}
+    if auto_download:
+        # 需要下载的标的并发拉取（按数据源限速）
+        from .bulk import DownloadJob, bulk_download
+        jobs = [DownloadJob(ins.symbol, ins.source, _fetch_interval(ins), ins.start, ins.end) for ins in pcfg.instruments
+                if ins.source and not (ins.csv and os.path.exists(ins.csv))]
+        for r in bulk_download(jobs, store_dir, keep=not store_dir):
+            if r.error:
+                raise click.ClickException(f"download {r.job.symbol} failed: {r.error}")
+            fetched[r.job.symbol] = r.data
     for ins in pcfg.instruments:
         if ins.csv and os.path.exists(ins.csv):
             df = pd.read_csv(ins.csv)
-        elif auto_download and ins.source:
-            src = YFinanceSource() if ins.source=="yfinance" else EFinanceSource()
-            df = src.get_history(ins.symbol, ins.start, ins.end, ins.interval)
+        elif offline is not None and (ins.symbol in fetched or offline.meta(ins.symbol, _fetch_interval(ins))):
+            df = offline.get_history(ins.symbol, ins.start, ins.end, _fetch_interval(ins))
+        elif fetched.get(ins.symbol) is not None:
+            df = fetched[ins.symbol]
         else:
             raise click.ClickException(f"No data for {ins.symbol}. Provide csv or enable --auto_download with source.")
+        if ins.base_interval and ins.base_interval != ins.interval:
+            from .resample import instrument_market, resample_bars
+            from .utils import unify_ohlcv
+            df = unify_ohlcv(df)
+            df = resample_bars(df, ins.interval, market=instrument_market(ins, df["date"]))
         data_map[ins.symbol] = df
     from .utils import unify_ohlcv
     for k in list(data_map.keys()):
         data_map[k] = unify_ohlcv(data_map[k])
-    res = run_portfolio_backtest(data_map, pcfg, out_dir=out_dir)
+    return data_map
+
+@main.command("portfolio-backtest")
+@click.option("--config", "config_path", required=True)
+@click.option("--out", "out_dir", default="./report_port")
+@click.option("--auto_download", is_flag=True)
+@click.option("--html_report", is_flag=True)
+@click.option("--indicator_cache", default=None, help="指标缓存磁盘目录（跨运行/进程复用 N 与通道）")
+@click.option("--store", "store_dir", default=None, help="本地行情库目录：优先读本地，配合 --auto_download 增量补齐")
+@click.option("--profile", "profile_path", default=None, help="分阶段计时报告（JSON）输出路径")
+@click.option("--stream", is_flag=True, help="流式回测：从 --store 按日期分块读取，权益与成交边跑边写，内存与历史长度无关")
+@click.option("--chunk", default="180D", help="--stream 时每块覆盖的时间跨度（如 90D）")
+@click.option("--workers", default=0, help="逐标的指标与进场候选分片并行的进程数（0/1 为单进程）")
+@click.option("--no_plot", is_flag=True, help="不画 equity_curve.png（省去导入 matplotlib）")
+@click.option("--no_cache", "--no-cache", "no_cache", is_flag=True, help="不读写结果缓存，强制重跑")
+@click.option("--cache_dir", default=None, help="结果缓存目录（默认 TURTLE_RESULT_CACHE_DIR 或 ~/.cache/turtletrader/results）")
+def portfolio_backtest_cmd(config_path, out_dir, auto_download,html_report, indicator_cache, store_dir, profile_path,
+                           stream, chunk, workers, no_plot, no_cache, cache_dir):
+    _use_indicator_cache(indicator_cache)
+    pcfg = load_portfolio_config(config_path)
+    prof = _start_profile(profile_path)
+    if stream:
+        if not store_dir:
+            raise click.UsageError("--stream requires --store.")
+        from .store import MarketStore
+        from .stream_backtest import run_portfolio_backtest_streaming
+        if auto_download:
+            _download_to_store(pcfg, store_dir)
+        res = run_portfolio_backtest_streaming(MarketStore(store_dir), pcfg, out_dir=out_dir, chunk=chunk,
+                                               plot=not no_plot)
+    else:
+        from .result_cache import ResultCache, cached_portfolio_backtest
+        with prof.phase("load_data"):
+            data_map = _load_portfolio_data(pcfg, auto_download, store_dir)
+        # 配置、各标的行情与库版本都没变时直接取上次结果（--no_cache 强制重跑）
+        cache = None if no_cache else ResultCache(cache_dir)
+        res = cached_portfolio_backtest(data_map, pcfg, out_dir=out_dir, cache=cache, workers=workers,
+                                        plot=not no_plot)
+        if res["cache"] == "hit":
+            click.echo("result cache: hit", err=True)
+    _finish_profile(prof, profile_path)
     if html_report:
         from .report import save_html_report
-        save_html_report(res, out_dir)
+        save_html_report(res, out_dir, workers=workers)
     click.echo(json.dumps(res["metrics"], indent=2))
+    _echo_cache_stats(indicator_cache)
+
+@main.command()
+@click.option("--results", "results_dir", required=True, help="回测输出目录（equity_curve.csv / trades.csv / metrics.json）")
+@click.option("--out", "out_dir", default=None, help="报告目录（默认写回 --results）")
+@click.option("--config", "config_path", default=None, help="组合 YAML：给定时按各标的K线逐日标记盈亏，否则只用成交价")
+@click.option("--store", "store_dir", default=None, help="配合 --config 的本地行情库目录")
+@click.option("--symbol", "symbols", multiple=True, help="只画这些标的（可重复）；默认有成交的全部标的")
+@click.option("--workers", default=0, help="逐标的图表并行渲染的进程数（0/1 为单进程）")
+@click.option("--max_points", default=2000, help="每条曲线最多保留的点数（长序列降采样）")
+def report(results_dir, out_dir, config_path, store_dir, symbols, workers, max_points):
+    """事后生成报告：SVG / JSON 图表（组合 + 逐标的）与 report.html，不重跑回测。"""
+    from .report import render_report
+    prices = _load_portfolio_data(load_portfolio_config(config_path), store_dir=store_dir) if config_path else None
+    res = render_report(results_dir, out_dir, prices=prices, symbols=symbols or None, workers=workers,
+                        max_points=max_points)
+    click.echo(f"Wrote {os.path.join(out_dir or results_dir, 'report.html')} ({len(res['symbols'])} symbols)")
+
+@main.group()
+def cache():
+    """组合回测结果缓存（portfolio-backtest 按配置 + 行情内容 + 库版本寻址）。"""
+
+@cache.command("stats")
+@click.option("--cache_dir", default=None, help="结果缓存目录（默认 TURTLE_RESULT_CACHE_DIR 或 ~/.cache/turtletrader/results）")
+def cache_stats(cache_dir):
+    """条目数、占用字节、累计命中 / 未命中 / 淘汰次数。"""
+    from .result_cache import ResultCache
+    click.echo(json.dumps(ResultCache(cache_dir).stats(), indent=2))
+
+@cache.command("clear")
+@click.option("--cache_dir", default=None)
+def cache_clear(cache_dir):
+    """清空结果缓存。"""
+    from .result_cache import ResultCache
+    rc = ResultCache(cache_dir)
+    rc.clear()
+    click.echo(f"Cleared {rc.root}")
+
+@main.command()
+@click.option("--config", "config_path", required=True, help="组合 YAML")
+@click.option("--out", "out_path", required=True, help="数据集文件路径（如 universe.ttds）")
+@click.option("--store", "store_dir", default=None, help="本地行情库目录")
+@click.option("--auto_download", is_flag=True)
+@click.option("--indicators", is_flag=True, help="同时写入按配置 turtle 参数预计算的 N 与 prev_close")
+def dataset(config_path, out_path, store_dir, auto_download, indicators):
+    """把组合行情写成内存映射数据集文件，多个进程可零拷贝共享（见 turtletrader.dataset）。"""
+    from .dataset import write_dataset
+    pcfg = load_portfolio_config(config_path)
+    data_map = _load_portfolio_data(pcfg, auto_download, store_dir)
+    ds = write_dataset(out_path, data_map, pcfg.turtle if indicators else None)
+    click.echo(f"Wrote {out_path}: {len(ds)} symbols, {ds.header['rows']} bars, fields {','.join(ds.fields)}")
+    ds.close()
 
 @main.command("portfolio-live")
 @click.option("--config", "config_path", required=True, help="YAML portfolio config")
@@ -113,11 +480,21 @@ def portfolio_backtest_cmd(config_path, out_dir, auto_download,html_report):
 @click.option("--nbars", default=300, help="每次拉取的历史K线数量（>= ATR窗口×4）")
 @click.option("--use_closed", is_flag=True, help="只使用已收盘K线（倒数第二根）")
 @click.option("--max_loops", default=0, help="最大迭代次数，0为无限循环")
+@click.option("--store", "store_dir", default=None, help="本地行情库目录：K线落盘，每次只补新K线")
+@click.option("--snapshot_every", default=1000, help="每多少轮把增量日志压缩成一次快照")
+@click.option("--metrics_file", default=None, help="每轮写 Prometheus 文本指标（如 node exporter textfile 目录下的 turtle.prom）")
+@click.option("--profile", "profile_path", default=None, help="退出时写分阶段计时报告（JSON）")
 # @click.option("--html_report", is_flag=True)
-def portfolio_live_cmd(config_path, paper_store, poll, nbars, use_closed,max_loops):
+def portfolio_live_cmd(config_path, paper_store, poll, nbars, use_closed,max_loops, store_dir, snapshot_every,
+                       metrics_file, profile_path):
     pcfg = load_portfolio_config(config_path)
     from .live_portfolio import run_portfolio_live
-    run_portfolio_live(pcfg, paper_store, poll=poll, nbars=nbars, use_closed=use_closed, max_loops=max_loops)
+    run_portfolio_live(pcfg, paper_store, poll=poll, nbars=nbars, use_closed=use_closed, max_loops=max_loops,
+                       market_store=store_dir, snapshot_every=snapshot_every, metrics_file=metrics_file,
+                       profile=profile_path)
+    if profile_path:
+        from .profiling import get_profiler
+        click.echo(get_profiler().format_table(), err=True)
 
 if __name__ == "__main__":
     main()
@@ -43,6 +43,8 @@ class InstrumentConfig:
     start: Optional[str] = None
     end: Optional[str] = None
     interval: str = "1d"
+    base_interval: Optional[str] = None  # 只取这一档细K线（下载/本地库/csv，如 1m），再按交易时段聚合成 interval
+    market: Optional[str] = None         # 交易所（SSE/SZSE/HKEX/NYSE...），决定聚合时段；不填时按K线时区 / 规则推断
     dollar_per_point: float = 1.0
     rules: RuleConfig = field(default_factory=RuleConfig)
 
@@ -1,7 +1,8 @@
 from __future__ import annotations
 import pandas as pd
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import time
+from .utils import unify_ohlcv
 
 
 class DataSource:
@@ -14,43 +15,42 @@ class DataSource:
         raise NotImplementedError
 
 
+# yfinance 各周期单次请求允许的最大回看（分钟级数据只保留最近一段）
+_YF_MAX_PERIOD = {
+    "1m": "7d",
+    "2m": "60d",
+    "5m": "60d",
+    "15m": "60d",
+    "30m": "60d",
+    "60m": "730d",
+    "90m": "60d",
+    "1h": "730d",
+}
+# 日线及以上：每根K线约占多少自然日（含周末/节假日余量）
+_DAYS_PER_BAR = {"1d": 1.6, "5d": 8, "1wk": 8, "1mo": 32, "3mo": 95}
+
+
 class YFinanceSource(DataSource):
-    def __init__(self):
+    def __init__(self, retries: int = 3):
         try:
             import yfinance as yf  # type: ignore
         except Exception as e:
             raise RuntimeError("需要安装 yfinance，请执行：pip install yfinance") from e
         self.yf = yf
+        self.retries = retries
 
-    def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
-        period_map = {...}
-        period = period_map.get(interval, "max")
-        last_err = None
-        for _ in range(3):
+    def _history(self, symbol: str, interval: str, **kw) -> pd.DataFrame:
+        ticker = self.yf.Ticker(symbol)
+        df, last_err = None, None
+        for i in range(self.retries):
             try:
-                df = self.yf.download(
-                    symbol,
-                    period=period,
-                    interval=interval,
-                    auto_adjust=False,
-                    progress=False,
-                    threads=False,
-                )
-                if not df.empty:
-                    break
+                df = ticker.history(interval=interval, auto_adjust=False, **kw)
+                break
             except Exception as e:
                 last_err = e
-            time.sleep(1.0)
-        if (df is None) or df.empty:
-            raise RuntimeError(
-                f"yfinance no data for {symbol} interval={interval}: {last_err}"
-            )
-
-    def get_history(
-        self, symbol: str, start: Optional[str], end: Optional[str], interval: str
-    ) -> pd.DataFrame:
-        ticker = self.yf.Ticker(symbol)
-        df = ticker.history(start=start, end=end, interval=interval, auto_adjust=False)
+                time.sleep(1.0 * (i + 1))
+        if df is None:
+            raise RuntimeError(f"yfinance error for {symbol} interval={interval}: {last_err}")
         df = df.rename(
             columns={
                 "Open": "open",
@@ -60,38 +60,32 @@ class YFinanceSource(DataSource):
                 "Volume": "volume",
             }
         )
-        df = df.reset_index().rename(columns={"Date": "date"})
+        df = df.reset_index()
+        df = df.rename(columns={df.columns[0]: "date"})
         return df[["date", "open", "high", "low", "close", "volume"]]
 
+    def get_history(
+        self, symbol: str, start: Optional[str], end: Optional[str], interval: str
+    ) -> pd.DataFrame:
+        if start is None and end is None:
+            return self._history(symbol, interval, period=_YF_MAX_PERIOD.get(interval, "max"))
+        return self._history(symbol, interval, start=start, end=end)
+
     def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
-        # yfinance用period+interval拉最近数据
-        period_map = {
-            "1m": "2d",
-            "2m": "5d",
-            "5m": "30d",
-            "15m": "60d",
-            "30m": "60d",
-            "60m": "730d",
-            "1h": "730d",
-            "1d": "max",
-            "1wk": "max",
-            "1mo": "max",
-        }
-        period = period_map.get(interval, "max")
-        df = self.yf.download(
-            symbol, period=period, interval=interval, auto_adjust=False, progress=False
-        )
-        df = df.rename(
-            columns={
-                "Open": "open",
-                "High": "high",
-                "Low": "low",
-                "Close": "close",
-                "Volume": "volume",
-            }
-        )
-        df = df.reset_index().rename(columns={df.columns[0]: "date"})
-        return df.tail(n)
+        # 只拉覆盖最近 n 根所需的时间段，而不是 period="max" 的全部历史
+        if interval in _DAYS_PER_BAR:
+            days = int(n * _DAYS_PER_BAR[interval]) + 10
+            start = (pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=days)).strftime("%Y-%m-%d")
+            df = self._history(symbol, interval, start=start)
+        else:
+            df = self._history(symbol, interval, period=_YF_MAX_PERIOD.get(interval, "60d"))
+        if df.empty:
+            raise RuntimeError(f"yfinance no data for {symbol} interval={interval}")
+        return df.tail(n).reset_index(drop=True)
+
+
+# efinance 的 klt：分钟数，101/102 为日/周线
+_EF_KLT = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "1h": 60, "1d": 101, "1wk": 102}
 
 
 class EFinanceSource(DataSource):
@@ -105,7 +99,15 @@ class EFinanceSource(DataSource):
     def get_history(
         self, symbol: str, start: Optional[str], end: Optional[str], interval: str
     ) -> pd.DataFrame:
-        df = self.ef.stock.get_quote_history(symbol)
+        # efinance 的 beg/end 为闭区间 YYYYMMDD；这里按 [start, end) 换算
+        kw = {}
+        if start is not None:
+            kw["beg"] = pd.Timestamp(start).strftime("%Y%m%d")
+        if end is not None:
+            kw["end"] = (pd.Timestamp(end) - pd.Timedelta(days=1)).strftime("%Y%m%d")
+        if interval not in _EF_KLT:
+            raise ValueError(f"unsupported efinance interval {interval!r}; use one of {sorted(_EF_KLT)}")
+        df = self.ef.stock.get_quote_history(symbol, klt=_EF_KLT[interval], **kw)
         rename_map = {
             "日期": "date",
             "开盘": "open",
@@ -116,12 +118,74 @@ class EFinanceSource(DataSource):
         }
         df = df.rename(columns=rename_map)
         df["date"] = pd.to_datetime(df["date"])
+        if _EF_KLT[interval] < 101:
+            # 分钟K线 efinance 以收盘时刻标记，这里改为起始时刻（与 yfinance 一致）
+            df["date"] = df["date"] - pd.Timedelta(minutes=_EF_KLT[interval])
         cols = ["date", "open", "high", "low", "close"] + (
             ["volume"] if "volume" in df.columns else []
         )
         return df[cols]
 
     def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
-        # efinance 统一返回日线，若用更细粒度需改造
-        df = self.get_history(symbol, start=None, end=None, interval=interval)
-        return df.tail(n)
+        # 只拉最近 n 根所需的日期段（A 股每天 240 个交易分钟）
+        klt = _EF_KLT.get(interval, 101)
+        per_day = 240 / klt if klt < 101 else (0.2 if klt == 102 else 1.0)
+        start = pd.Timestamp.now().normalize() - pd.Timedelta(days=int(n / per_day * 1.6) + 10)
+        df = self.get_history(symbol, start=start, end=None, interval=interval)
+        return df.tail(n).reset_index(drop=True)
+
+
+def _bars(df: pd.DataFrame) -> pd.DataFrame:
+    df = unify_ohlcv(df).copy()
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+class IncrementalBars(DataSource):
+    """live 增量拉取：每个 (symbol, interval) 记住最后一根K线的时间，之后每轮只拉这之后的增量，
+    合并进有界的内存缓冲（最多保留 capacity 根）。
+
+    最后一根可能是未收盘的半截K线，因此增量从它的时间戳开始拉，重叠部分以新数据为准。
+    每轮的流量与耗时只与新增K线数成正比。
+    """
+
+    def __init__(self, source: DataSource, capacity: int = 2000):
+        self.source = source
+        self.capacity = capacity
+        self._bufs: Dict[Tuple[str, str], pd.DataFrame] = {}
+
+    def get_history(
+        self, symbol: str, start: Optional[str], end: Optional[str], interval: str
+    ) -> pd.DataFrame:
+        return self.source.get_history(symbol, start, end, interval)
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[pd.Timestamp]:
+        buf = self._bufs.get((symbol, interval))
+        return None if buf is None or buf.empty else buf["date"].iloc[-1]
+
+    def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
+        key = (symbol, interval)
+        buf = self._bufs.get(key)
+        cap = max(self.capacity, n)
+        if buf is None or len(buf) < n:
+            buf = _bars(self.source.recent_bars(symbol, n, interval))
+        else:
+            last = buf["date"].iloc[-1]
+            delta = _bars(self.source.get_history(symbol, last, None, interval))
+            if len(delta):
+                keep = buf[buf["date"] < delta["date"].iloc[0]]
+                buf = pd.concat([keep, delta], ignore_index=True)
+        if len(buf) > cap:
+            buf = buf.iloc[-cap:].reset_index(drop=True)
+        self._bufs[key] = buf
+        return buf.tail(n).reset_index(drop=True)
+
+
+def get_source(name: Optional[str]) -> DataSource:
+    """按名称构造数据源（yfinance / efinance 及常用别名）。"""
+    name = (name or "").lower()
+    if name in ["yf", "yahoo", "yfinance"]:
+        return YFinanceSource()
+    if name in ["ef", "efinance", "china", "cn"]:
+        return EFinanceSource()
+    raise ValueError(f"unknown source {name}")
@@ -0,0 +1,239 @@
+"""共享行情数据集：多个标的的K线（及可选的预计算指标列）排成一整块连续内存，多进程零拷贝共享。
+
+布局（文件与共享内存相同）::
+
+    b"TTDS0001" | 头部长度 (uint64 LE) | 头部 JSON | 填充到 64 字节对齐
+    date   int64   [rows]            UTC 纳秒，各标的依次首尾相接、各自按时间升序
+    values float64 [fields, rows]    每个字段一行（列内连续），标的 k 占 [starts[k], starts[k+1])
+
+头部即"标的 / 日期索引"：标的名、起始行、时区、字段名。读取一个标的只是切片，
+``frame()`` 得到的 DataFrame 的数值块直接是这块内存的视图（只读），不复制。
+
+- :func:`write_dataset` / :meth:`Dataset.open`：落盘成文件并内存映射打开，各进程共享页缓存；
+- :func:`share_dataset`：放进 ``multiprocessing.shared_memory``，进程结束前由创建者 ``unlink``。
+
+:class:`Dataset` 按句柄（文件路径或共享内存名）序列化：作为进程池参数 / initializer 参数传给工作进程时
+只传几十字节，工作进程自行打开同一块内存，所有进程合计只占一份数据。
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import struct
+import numpy as np
+import pandas as pd
+from .config import TurtleConfig
+from .store import _bound_ns, _from_ns, _to_ns
+from .utils import unify_ohlcv
+
+MAGIC = b"TTDS0001"
+ALIGN = 64
+BASE_FIELDS = ("open", "high", "low", "close", "volume")
+_LINGER: list = []  # close 时仍有外部视图的共享内存对象，留到进程退出
+
+
+def _header_bytes(header: Dict[str, Any]) -> bytes:
+    raw = json.dumps(header, separators=(",", ":")).encode()
+    head = MAGIC + struct.pack("<Q", len(raw)) + raw
+    return head + b"\0" * (-len(head) % ALIGN)
+
+
+def _prepare(data_map: Dict[str, pd.DataFrame], turtle: Optional[TurtleConfig]) -> Tuple[Dict[str, Any], List[tuple]]:
+    """各标的整理成 (date ns, {字段: float64}) 并生成头部。turtle 给定时追加指标列与 prev_close。"""
+    strat = None
+    if turtle is not None:
+        from .strategy import TurtleStrategy
+        strat = TurtleStrategy(turtle)
+    parts, fields = [], None
+    for sym, df in data_map.items():
+        if strat is None:
+            parts.append((sym, *_ohlcv_arrays(df)))
+            fields = list(BASE_FIELDS)
+            continue
+        df = unify_ohlcv(df)
+        if "volume" not in df.columns:
+            df = df.assign(volume=np.nan)
+        if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+            df = df.assign(date=pd.to_datetime(df["date"]))
+        if not df["date"].is_monotonic_increasing:
+            df = df.sort_values("date", kind="stable").reset_index(drop=True)
+        if strat is not None:
+            df = strat.prepare_indicators(df)
+        ns, tz = _to_ns(df["date"])
+        cols = {c: df[c].to_numpy(dtype=np.float64) for c in df.columns if c != "date"}
+        if strat is not None:
+            cols["prev_close"] = np.r_[np.nan, cols["close"][:-1]]
+        if fields is None:
+            fields = list(cols)
+        elif list(cols) != fields:
+            raise ValueError(f"columns of {sym} {list(cols)} differ from {fields}")
+        parts.append((sym, ns, tz, cols))
+    fields = fields or list(BASE_FIELDS)
+    starts = np.cumsum([0] + [len(p[1]) for p in parts]).tolist()
+    header = {"symbols": [p[0] for p in parts], "starts": starts, "tz": [p[2] for p in parts],
+              "fields": fields, "rows": starts[-1]}
+    return header, parts
+
+
+def _ohlcv_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, Optional[str], Dict[str, np.ndarray]]:
+    """不带指标时直接按列取数组（列名不分大小写，同 unify_ohlcv），不为每个标的另建 DataFrame。"""
+    names = {c.lower(): c for c in df.columns}
+    ns, tz = _to_ns(df[names.get("date", "date")])
+    cols = {f: df[names.get(f, f)].to_numpy(dtype=np.float64) for f in BASE_FIELDS if f != "volume"}
+    cols["volume"] = df[names["volume"]].to_numpy(dtype=np.float64) if "volume" in names else np.full(len(df), np.nan)
+    if len(ns) > 1 and (np.diff(ns) < 0).any():
+        order = np.argsort(ns, kind="stable")
+        ns, cols = ns[order], {f: a[order] for f, a in cols.items()}
+    return ns, tz, cols
+
+
+def _fill(buf, header: Dict[str, Any], parts: List[tuple]) -> None:
+    head = _header_bytes(header)
+    buf[:len(head)] = np.frombuffer(head, dtype=np.uint8)
+    date, values = _views(buf, header, len(head), writable=True)
+    for k, (_, ns, _, cols) in enumerate(parts):
+        lo, hi = header["starts"][k], header["starts"][k + 1]
+        date[lo:hi] = ns
+        for f, name in enumerate(header["fields"]):
+            values[f, lo:hi] = cols[name]
+
+
+def _nbytes(header: Dict[str, Any]) -> int:
+    return len(_header_bytes(header)) + 8 * header["rows"] * (1 + len(header["fields"]))
+
+
+def _views(buf, header: Dict[str, Any], offset: int, writable: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    rows, nf = header["rows"], len(header["fields"])
+    date = np.frombuffer(buf, dtype=np.int64, count=rows, offset=offset)
+    values = np.frombuffer(buf, dtype=np.float64, count=rows * nf, offset=offset + 8 * rows).reshape(nf, rows)
+    if not writable:
+        date.flags.writeable = False
+        values.flags.writeable = False
+    return date, values
+
+
+def _parse(buf) -> Tuple[Dict[str, Any], int]:
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a turtletrader dataset (bad magic)")
+    (n,) = struct.unpack("<Q", bytes(buf[8:16]))
+    header = json.loads(bytes(buf[16:16 + n]))
+    return header, len(_header_bytes(header))
+
+
+class Dataset:
+    """只读的共享数据集。用 :meth:`open` / :func:`write_dataset` / :func:`share_dataset` 得到。"""
+
+    def __init__(self, buf, handle: Tuple[str, str], shm=None):
+        self._buf = buf
+        self._shm = shm
+        self.handle = handle  # ("file", 路径) 或 ("shm", 共享内存名)
+        self.header, offset = _parse(buf)
+        self.symbols: List[str] = list(self.header["symbols"])
+        self.fields: List[str] = list(self.header["fields"])
+        self._index = {s: k for k, s in enumerate(self.symbols)}
+        self._field = {f: k for k, f in enumerate(self.fields)}
+        self.date, self.values = _views(buf, self.header, offset)
+
+    # ---- 打开 / 序列化 ----
+    @classmethod
+    def open(cls, path: str) -> "Dataset":
+        return cls(np.memmap(path, dtype=np.uint8, mode="r"), ("file", os.path.abspath(path)))
+
+    @classmethod
+    def attach(cls, name: str) -> "Dataset":
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm.buf, ("shm", name), shm)
+
+    @classmethod
+    def _from_handle(cls, kind: str, where: str) -> "Dataset":
+        return cls.open(where) if kind == "file" else cls.attach(where)
+
+    def __reduce__(self):
+        # 只传句柄：工作进程里重新映射同一块内存
+        return (Dataset._from_handle, self.handle)
+
+    def close(self):
+        """释放本进程的映射；仍被引用的视图（frame 等）之后不可再用。"""
+        self.date = self.values = None
+        shm, self._shm, buf, self._buf = self._shm, None, self._buf, None
+        try:
+            if shm is not None:
+                shm.close()
+            elif getattr(buf, "_mmap", None) is not None:
+                buf._mmap.close()
+        except BufferError:
+            # 外部仍持有视图：保留映射，避免 SharedMemory.__del__ 再次报错
+            _LINGER.append(shm)
+
+    def unlink(self):
+        """删除共享内存块（创建者在所有进程用完后调用）；文件数据集不删除文件。"""
+        if self._shm is not None:
+            self._shm.unlink()
+        self.close()
+
+    def __enter__(self) -> "Dataset":
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle[0] == "shm":
+            self.unlink()
+        else:
+            self.close()
+
+    # ---- 读取（均为视图，不复制） ----
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
+
+    def bounds(self, symbol: str, start=None, end=None) -> Tuple[int, int]:
+        """标的在 [start, end) 内的行号区间（全局行号）。"""
+        k = self._index[symbol]
+        lo, hi = self.header["starts"][k], self.header["starts"][k + 1]
+        tz = self.header["tz"][k]
+        dates = self.date[lo:hi]
+        a = lo if start is None else lo + int(np.searchsorted(dates, _bound_ns(start, tz), "left"))
+        b = hi if end is None else lo + int(np.searchsorted(dates, _bound_ns(end, tz), "left"))
+        return a, b
+
+    def array(self, symbol: str, field: str, start=None, end=None) -> np.ndarray:
+        lo, hi = self.bounds(symbol, start, end)
+        return self.values[self._field[field], lo:hi]
+
+    def dates(self, symbol: str, start=None, end=None) -> pd.DatetimeIndex:
+        lo, hi = self.bounds(symbol, start, end)
+        return _from_ns(self.date[lo:hi], self.header["tz"][self._index[symbol]])
+
+    def frame(self, symbol: str, start=None, end=None) -> pd.DataFrame:
+        """date + 全部字段的 DataFrame；数值列是共享内存的只读视图（带时区时只有 date 列另建）。"""
+        lo, hi = self.bounds(symbol, start, end)
+        df = pd.DataFrame(self.values[:, lo:hi].T, columns=self.fields, copy=False)
+        df.insert(0, "date", self.dates(symbol, start, end))
+        return df
+
+    def frames(self, symbols: Optional[Iterable[str]] = None, start=None, end=None) -> Dict[str, pd.DataFrame]:
+        return {s: self.frame(s, start, end) for s in (self.symbols if symbols is None else symbols)}
+
+
+def write_dataset(path: str, data_map: Dict[str, pd.DataFrame], turtle: Optional[TurtleConfig] = None) -> Dataset:
+    """把 {标的: K线} 写成数据集文件（先写临时文件再原子替换），返回内存映射打开的 Dataset。"""
+    header, parts = _prepare(data_map, turtle)
+    tmp = f"{path}.tmp{os.getpid()}"
+    mm = np.memmap(tmp, dtype=np.uint8, mode="w+", shape=(_nbytes(header),))
+    _fill(mm, header, parts)
+    mm.flush()
+    del mm
+    os.replace(tmp, path)
+    return Dataset.open(path)
+
+
+def share_dataset(data_map: Dict[str, pd.DataFrame], turtle: Optional[TurtleConfig] = None,
+                  name: Optional[str] = None) -> Dataset:
+    """把 {标的: K线} 放进共享内存。用 ``with`` 或用完调用 ``unlink()`` 释放。"""
+    from multiprocessing import shared_memory
+    header, parts = _prepare(data_map, turtle)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(_nbytes(header), 1))
+    _fill(shm.buf, header, parts)
+    return Dataset(shm.buf, ("shm", shm.name), shm)
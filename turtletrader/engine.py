@@ -0,0 +1,197 @@
+"""数组化的单标的 Turtle 状态机（``run_backtest(engine="fast")`` 使用）。
+
+逻辑与 :meth:`TurtleStrategy.step` 逐条对应：止损 -> 通道退出 -> 空仓进场 -> 金字塔加仓，
+但 OHLC、N 与唐奇安通道列一次性取成连续的 NumPy 数组，逐根K线只做 Python 标量运算，
+不再构造 ``pd.Series`` 或按列名查找。``TurtleStrategy.step`` 仍是参考实现，两者成交与净值一致。
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .config import TurtleConfig
+from .indicator_cache import IndicatorCache
+from .strategy import indicator_columns
+
+CHANNEL_COLUMNS = (
+    "s1_high", "s1_low", "s1_exit_high", "s1_exit_low",
+    "s2_high", "s2_low", "s2_exit_high", "s2_exit_low",
+)
+
+
+@dataclass
+class BarArrays:
+    """一个标的的行情与指标列（缺失的通道列为 None，等价于 row 中没有该列）。"""
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    N: np.ndarray
+    s1_high: Optional[np.ndarray] = None
+    s1_low: Optional[np.ndarray] = None
+    s1_exit_high: Optional[np.ndarray] = None
+    s1_exit_low: Optional[np.ndarray] = None
+    s2_high: Optional[np.ndarray] = None
+    s2_low: Optional[np.ndarray] = None
+    s2_exit_high: Optional[np.ndarray] = None
+    s2_exit_low: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "BarArrays":
+        """从 ``prepare_indicators`` 的输出取列。"""
+        def col(name: str) -> Optional[np.ndarray]:
+            if name not in df.columns:
+                return None
+            return np.ascontiguousarray(df[name].to_numpy(dtype=np.float64))
+
+        base = {c: col(c) for c in ("open", "high", "low", "close", "N")}
+        missing = [c for c, v in base.items() if v is None]
+        if missing:
+            raise KeyError(f"missing columns: {missing}")
+        return cls(**base, **{c: col(c) for c in CHANNEL_COLUMNS})
+
+    @classmethod
+    def build(cls, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+              cfg: TurtleConfig, cache: Optional[IndicatorCache] = None) -> "BarArrays":
+        """直接在数组上计算 N 与通道，结果与 ``prepare_indicators`` 相同但不经过 DataFrame。"""
+        def arr(a):
+            return np.ascontiguousarray(a, dtype=np.float64)
+
+        cols = indicator_columns(high, low, close, cfg, cache=cache)
+        return cls(open=arr(open_), high=arr(high), low=arr(low), close=arr(close), **cols)
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+
+Fill = Tuple[int, str, int, float]  # (bar index, reason, size, price)
+
+
+def _as_list(a: Optional[np.ndarray], n: int) -> list:
+    return a.tolist() if a is not None else [None] * n
+
+
+def simulate(bars: BarArrays, cfg: TurtleConfig, init_equity: float = 100_000.0,
+             dollar_per_point: Optional[float] = None) -> Tuple[np.ndarray, List[Fill], int]:
+    """在数组上跑完整段 Turtle 状态机。
+
+    返回 (逐根收盘净值, 成交列表, 期末持仓)。成交列表元素为 ``(i, reason, size, price)``，
+    ``i`` 为K线下标；现金与持仓的更新顺序与 ``run_backtest`` 参考路径一致。
+    """
+    n = len(bars)
+    dpp = cfg.market.dollar_per_point if dollar_per_point is None else dollar_per_point
+    risk = cfg.risk_per_unit
+    step_N = cfg.pyramiding.step_N
+    stop_N = cfg.pyramiding.stop_N
+    max_units = cfg.pyramiding.max_units
+
+    o_ = bars.open.tolist()
+    h_ = bars.high.tolist()
+    l_ = bars.low.tolist()
+    c_ = bars.close.tolist()
+    n_ = bars.N.tolist()
+    has_s1 = bars.s1_high is not None and bars.s1_low is not None
+    has_s1_high = bars.s1_high is not None
+    has_s1_exit = bars.s1_exit_high is not None and bars.s1_exit_low is not None
+    has_s2 = bars.s2_high is not None and bars.s2_low is not None
+    has_s2_exit = bars.s2_exit_high is not None and bars.s2_exit_low is not None
+    s1h, s1l = _as_list(bars.s1_high, n), _as_list(bars.s1_low, n)
+    s1xh, s1xl = _as_list(bars.s1_exit_high, n), _as_list(bars.s1_exit_low, n)
+    s2h, s2l = _as_list(bars.s2_high, n), _as_list(bars.s2_low, n)
+    s2xh, s2xl = _as_list(bars.s2_exit_high, n), _as_list(bars.s2_exit_low, n)
+
+    # 单位簿：同一时刻所有单位同向，方向单独存放
+    u_entry: List[float] = []
+    u_size: List[int] = []
+    u_stop: List[float] = []
+    direction = 0
+    last_s1_win = False
+    last_breakout_price: Optional[float] = None
+
+    cash = init_equity
+    pos = 0
+    fills: List[Fill] = []
+    eq: List[float] = []
+
+    for i in range(n):
+        o, h, lo, c, N = o_[i], h_[i], l_[i], c_[i], n_[i]
+        equity = cash + pos * c
+
+        # 1) 止损
+        if u_entry and ((direction == 1 and lo <= max(u_stop)) or (direction == -1 and h >= min(u_stop))):
+            k = 0
+            for j in range(len(u_entry)):
+                st = u_stop[j]
+                if (direction == 1 and lo <= st) or (direction == -1 and h >= st):
+                    size = -direction * u_size[j]
+                    fills.append((i, "stop", size, st))
+                    cash -= st * size
+                    pos += size
+                else:
+                    u_entry[k], u_size[k], u_stop[k] = u_entry[j], u_size[j], st
+                    k += 1
+            del u_entry[k:], u_size[k:], u_stop[k:]
+
+        # 2) 系统退出
+        if u_entry:
+            exit_hit = False
+            if has_s1_exit:
+                if direction == 1 and c < s1xl[i]: exit_hit = True
+                if direction == -1 and c > s1xh[i]: exit_hit = True
+            if has_s2_exit:
+                if direction == 1 and c < s2xl[i]: exit_hit = True
+                if direction == -1 and c > s2xh[i]: exit_hit = True
+            if exit_hit:
+                total = sum(u_size) * direction
+                if total != 0:
+                    size = -direction * total
+                    fills.append((i, "exit", size, o))
+                    cash -= o * size
+                    pos += size
+                if last_breakout_price is not None and has_s1_high:
+                    last_s1_win = (o - last_breakout_price) * direction > 0
+                u_entry.clear()
+                u_size.clear()
+                u_stop.clear()
+
+        # 3) 进场（若空仓）
+        if not u_entry and N > 0:
+            choose_dir = 0
+            if has_s1 and not last_s1_win:
+                if c > s1h[i]:
+                    choose_dir = 1
+                elif c < s1l[i]:
+                    choose_dir = -1
+            if choose_dir == 0 and has_s2:
+                if c > s2h[i]:
+                    choose_dir = 1
+                elif c < s2l[i]:
+                    choose_dir = -1
+            if choose_dir != 0:
+                size = max(int((equity * risk) // max(N * dpp, 1e-12)), 0)
+                if size > 0:
+                    direction = choose_dir
+                    u_entry.append(o)
+                    u_size.append(size)
+                    u_stop.append(o - choose_dir * stop_N * N)
+                    last_breakout_price = o
+                    last_s1_win = False
+                    fills.append((i, "entry", choose_dir * size, o))
+                    cash -= o * (choose_dir * size)
+                    pos += choose_dir * size
+
+        # 4) 金字塔加仓
+        if u_entry and len(u_entry) < max_units:
+            trigger = u_entry[0] + direction * len(u_entry) * step_N * N
+            if (direction == 1 and h >= trigger) or (direction == -1 and lo <= trigger):
+                size = max(int((equity * risk) // max(N * dpp, 1e-12)), 0)
+                if size > 0:
+                    u_entry.append(trigger)
+                    u_size.append(size)
+                    u_stop.append(trigger - direction * stop_N * N)
+                    fills.append((i, "add", direction * size, trigger))
+                    cash -= trigger * (direction * size)
+                    pos += direction * size
+
+        eq.append(cash + pos * c)
+
+    return np.array(eq, dtype=np.float64), fills, pos
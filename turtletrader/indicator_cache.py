@@ -0,0 +1,126 @@
+"""指标缓存：按行情内容指纹 + (种类, 长度, 字段) 记忆化 N 与唐奇安通道。
+
+内存层为有界 LRU；可选磁盘层（每个序列一个 ``.npy``，原子写入），
+同一份 N/通道可在多次运行、多组参数与多个进程之间复用。
+
+进程级默认缓存由环境变量配置：
+``TURTLE_INDICATOR_CACHE_ITEMS``（内存条目上限，默认 1024，0 关闭内存层）、
+``TURTLE_INDICATOR_CACHE_DIR``（磁盘层目录，默认不启用）。
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import hashlib
+import os
+import threading
+import numpy as np
+
+Key = Tuple[str, str, int, str]  # (fingerprint, kind, length, field)
+
+
+def fingerprint(*arrays: np.ndarray) -> str:
+    """行情数组的内容指纹（blake2b，含长度与 dtype）。"""
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(a, dtype=np.float64)
+        h.update(str(a.shape).encode())
+        h.update(a.view(np.uint8))
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    def __init__(self, max_items: int = 1024, disk_dir: Optional[str] = None):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self._mem: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: Key) -> str:
+        fp, kind, length, field = key
+        return os.path.join(self.disk_dir, fp[:2], f"{fp}-{kind}-{field}-{length}.npy")
+
+    def _remember(self, key: Key, value: np.ndarray):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._mem[key] = value
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: Key, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """命中返回缓存（只读数组）；否则调用 compute 计算并写入各层。"""
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    value = np.load(path)
+                except (OSError, ValueError):
+                    value = None
+                if value is not None:
+                    value.flags.writeable = False
+                    with self._lock:
+                        self.disk_hits += 1
+                    self._remember(key, value)
+                    return value
+        value = np.asarray(compute(), dtype=np.float64)
+        value.flags.writeable = False
+        with self._lock:
+            self.misses += 1
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, value)
+            os.replace(tmp, path)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self._mem),
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+
+_default: Optional[IndicatorCache] = None
+
+
+def get_default_cache() -> IndicatorCache:
+    """进程级默认缓存（首次调用时按环境变量创建）。"""
+    global _default
+    if _default is None:
+        _default = IndicatorCache(
+            max_items=int(os.getenv("TURTLE_INDICATOR_CACHE_ITEMS", "1024")),
+            disk_dir=os.getenv("TURTLE_INDICATOR_CACHE_DIR") or None,
+        )
+    return _default
+
+
+def set_default_cache(cache: IndicatorCache) -> IndicatorCache:
+    global _default
+    _default = cache
+    return cache
@@ -0,0 +1,233 @@
+"""Paper 交易的预写日志（WAL）：每轮只追加本轮的成交与变动标的的状态，定期压缩成快照。
+
+目录结构::
+
+    <store>/snapshot.json   # 全量状态（原子替换），含 seq
+    <store>/journal.jsonl   # 快照之后的增量，每行一条，带递增 seq
+    <store>/trades.csv      # 全部成交（只追加）
+
+恢复 = 读快照 + 重放 seq 更大的增量；末尾写了一半的行（崩溃）直接忽略。
+快照里不存成交历史，只存每个标的最后一笔买入（T+1 判断只需要它），
+因此每轮写入量与恢复时间都与历史长度无关。旧版 ``state.json`` 仍可读取并自动迁移。
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List
+import csv
+import json
+import os
+import pandas as pd
+from .ledger import TradeLedger
+from .portfolio import Portfolio, Position
+from .strategy import TurtleState, Unit
+
+TRADE_FIELDS = ["date", "symbol", "reason", "size", "price"]
+
+
+def _default(o: Any):
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+def state_to_dict(ts: TurtleState) -> dict:
+    return {
+        "last_s1_win": ts.last_s1_win,
+        "last_breakout_price": ts.last_breakout_price,
+        "units": [
+            {
+                "entry_price": u.entry_price,
+                "direction": u.direction,
+                "size": u.size,
+                "stop": u.stop,
+                "entry_date": str(u.entry_date),
+            }
+            for u in ts.units
+        ],
+    }
+
+
+def state_from_dict(sd: dict) -> TurtleState:
+    ts = TurtleState()
+    ts.last_s1_win = bool(sd.get("last_s1_win", False))
+    ts.last_breakout_price = sd.get("last_breakout_price", None)
+    ts.units = [
+        Unit(
+            entry_price=float(u["entry_price"]),
+            direction=int(u["direction"]),
+            size=int(u["size"]),
+            stop=float(u["stop"]),
+            entry_date=pd.to_datetime(u["entry_date"]),
+        )
+        for u in sd.get("units", [])
+    ]
+    return ts
+
+
+def last_buys(trades: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """每个标的最后一笔买入（T+1 判断所需的全部成交信息）。"""
+    if isinstance(trades, TradeLedger):
+        return trades.last_buys()
+    out: Dict[str, Dict[str, Any]] = {}
+    for t in trades:
+        if t["size"] > 0:
+            out[t["symbol"]] = t
+    return out
+
+
+def atomic_write_json(path: str, data: dict):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, default=_default)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class PaperJournal:
+    """组合 paper 状态的持久化。
+
+    ``commit(port, symbols)`` 每轮调用一次：追加 port.trades 中的新成交和 symbols 的最新状态，
+    之后把 port.trades 裁成每个标的最后一笔买入。每 snapshot_every 条增量压缩一次。
+    """
+
+    def __init__(self, store_dir: str, snapshot_every: int = 1000, fsync: bool = True):
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.snapshot_path = os.path.join(store_dir, "snapshot.json")
+        self.journal_path = os.path.join(store_dir, "journal.jsonl")
+        self.trades_path = os.path.join(store_dir, "trades.csv")
+        self.legacy_path = os.path.join(store_dir, "state.json")
+        self.seq = 0
+        self._since_snapshot = 0
+        self._n_trades = 0  # port.trades 中已落盘的条数
+
+    # ---- 恢复 ----
+    def restore(self, port: Portfolio) -> bool:
+        """从快照 + 增量（或旧版 state.json）恢复；没有任何已存状态时返回 False。"""
+        restored = False
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                snap = json.load(f)
+            self._apply_snapshot(port, snap)
+            self.seq = int(snap.get("seq", 0))
+            restored = True
+        elif os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "r") as f:
+                data = json.load(f)
+            self._apply_snapshot(port, data)
+            # 旧版把全部成交存在 state.json 里：转存到 trades.csv 后只保留最后买入
+            self._append_trades(data.get("trades", []))
+            port.trades = TradeLedger(data.get("trades", [])).keep_last_buys()
+            self.snapshot(port)
+            os.replace(self.legacy_path, self.legacy_path + ".migrated")
+            return True
+        for delta in self._read_journal():
+            if delta["seq"] <= self.seq:
+                continue
+            self._apply_delta(port, delta)
+            self.seq = delta["seq"]
+            self._since_snapshot += 1
+            restored = True
+        self._n_trades = len(port.trades)
+        return restored
+
+    def _read_journal(self) -> List[dict]:
+        """读出完整的增量；崩溃时写了一半的尾行截掉，之后的 commit 不会接在残片后面。"""
+        if not os.path.exists(self.journal_path):
+            return []
+        out, good = [], 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    out.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                good += len(line)
+        if good < os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+        return out
+
+    def _apply_snapshot(self, port: Portfolio, data: dict):
+        port.cash = float(data.get("cash", port.cash))
+        port.positions = {
+            k: Position(size=int(v.get("size", 0)), avg_price=float(v.get("avg_price", 0)))
+            for k, v in data.get("positions", {}).items()
+        }
+        port.group_units = {k: int(v) for k, v in data.get("group_units", {}).items()}
+        port.total_units = int(data.get("total_units", 0))
+        states = {sym: state_from_dict(sd) for sym, sd in data.get("states", {}).items()}
+        if states:
+            port.states = states
+        port.trades = list(data.get("last_buys", {}).values()) if "last_buys" in data else data.get("trades", [])
+
+    def _apply_delta(self, port: Portfolio, d: dict):
+        port.cash = float(d["cash"])
+        port.total_units = int(d["total_units"])
+        port.group_units = {k: int(v) for k, v in d["group_units"].items()}
+        for k, v in d.get("positions", {}).items():
+            port.positions[k] = Position(size=int(v["size"]), avg_price=float(v["avg_price"]))
+        for sym, sd in d.get("states", {}).items():
+            port.states[sym] = state_from_dict(sd)
+        if d.get("trades"):
+            port.trades.extend(d["trades"])
+            port.trades = port.trades.keep_last_buys()
+
+    # ---- 写入 ----
+    def _append_trades(self, trades: List[Dict[str, Any]]):
+        if not trades:
+            return
+        new = not os.path.exists(self.trades_path)
+        with open(self.trades_path, "a", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=TRADE_FIELDS, extrasaction="ignore")
+            if new:
+                w.writeheader()
+            w.writerows(trades)
+
+    def commit(self, port: Portfolio, symbols: Iterable[str]):
+        trades = port.trades[self._n_trades:]
+        symbols = set(symbols) | {t["symbol"] for t in trades}
+        self.seq += 1
+        delta = {
+            "seq": self.seq,
+            "cash": port.cash,
+            "total_units": port.total_units,
+            "group_units": port.group_units,
+            "positions": {s: {"size": port.positions[s].size, "avg_price": port.positions[s].avg_price}
+                          for s in symbols if s in port.positions},
+            "states": {s: state_to_dict(port.states[s]) for s in symbols if s in port.states},
+            "trades": trades,
+        }
+        # 日志是状态的唯一依据，先落盘；trades.csv 只是成交明细
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(delta, default=_default) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._append_trades(trades)
+        if trades:
+            port.trades = port.trades.keep_last_buys()
+        self._n_trades = len(port.trades)
+        self._since_snapshot += 1
+        if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+            self.snapshot(port)
+
+    def snapshot(self, port: Portfolio):
+        """写全量快照（原子替换）并清空增量日志。"""
+        atomic_write_json(self.snapshot_path, {
+            "seq": self.seq,
+            "cash": port.cash,
+            "positions": {k: {"size": v.size, "avg_price": v.avg_price} for k, v in port.positions.items()},
+            "group_units": port.group_units,
+            "total_units": port.total_units,
+            "states": {k: state_to_dict(v) for k, v in port.states.items()},
+            "last_buys": last_buys(port.trades),
+        })
+        # 快照落盘后再截断；若中途崩溃，重放时会跳过 seq 不大于快照的行
+        with open(self.journal_path, "w"):
+            pass
+        self._since_snapshot = 0
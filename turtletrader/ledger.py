@@ -0,0 +1,221 @@
+"""列式成交账本：成交按列存放在可增长的类型化数组里，并为每个标的维护索引。
+
+- 列：date（int64 纳秒）、symbol（int32 编号）、reason（int8 编码）、size（int64）、price（float64）；
+- 每个标的的最后一笔买入（所在日期）与当前持仓的开仓批次（lot）列表随写入更新，
+  T+1 等规则判断是 O(1)，不随成交数增长；
+- ``to_frame()`` / ``to_arrow()`` 直接用数组构造（数值列不复制）；
+- 兼容旧的 ``List[dict]``：``len`` / 下标 / 切片 / 迭代得到与以前相同结构的 dict
+  （date 为 ``str(pd.Timestamp)``），``append(dict)`` / ``extend`` 照常可用。
+"""
+from __future__ import annotations
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+
+REASONS = ("entry", "add", "exit", "stop")
+FIELDS = ("date", "symbol", "reason", "size", "price")
+DAY_NS = 86_400 * 10**9
+
+
+def _ts(dt) -> pd.Timestamp:
+    return dt if type(dt) is pd.Timestamp else pd.Timestamp(dt)
+
+
+def _local_day(ts: pd.Timestamp) -> int:
+    """本地日历日（自 1970-01-01 起的天数）；tz-aware 按其本地时间。"""
+    if ts.tz is not None:
+        ts = ts.tz_localize(None)
+    return ts.value // DAY_NS
+
+
+class TradeLedger(Sequence):
+    def __init__(self, records: Optional[Iterable[Dict[str, Any]]] = None, capacity: int = 256):
+        capacity = max(int(capacity), 1)
+        self.date = np.empty(capacity, dtype=np.int64)
+        self.symbol = np.empty(capacity, dtype=np.int32)
+        self.reason = np.empty(capacity, dtype=np.int8)
+        self.size = np.empty(capacity, dtype=np.int64)
+        self.price = np.empty(capacity, dtype=np.float64)
+        self.n = 0
+        self.symbols: List[str] = []
+        self._symbol_id: Dict[str, int] = {}
+        self.reasons: List[str] = list(REASONS)
+        self._reason_id: Dict[str, int] = {r: k for k, r in enumerate(REASONS)}
+        self._tz: Dict[int, Any] = {}          # 标的 -> 时区（tz-aware 日期还原用）
+        self._last_buy: Dict[int, int] = {}    # 标的 -> 最后一笔买入的行号
+        self._last_buy_day: Dict[int, int] = {}
+        self._position: Dict[int, int] = {}    # 标的 -> 按账本累计的净持仓
+        self._lots: Dict[int, List[int]] = {}  # 标的 -> 当前持仓的开仓/加仓行号
+        if records is not None:
+            self.extend(records)
+
+    # ---- 写入 ----
+    def _grow(self):
+        cap = 2 * len(self.date)
+        for name in ("date", "symbol", "reason", "size", "price"):
+            old = getattr(self, name)
+            new = np.empty(cap, dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+
+    def symbol_id(self, symbol: str) -> int:
+        sid = self._symbol_id.get(symbol)
+        if sid is None:
+            sid = self._symbol_id[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return sid
+
+    def record(self, dt, symbol: str, reason: str, size: int, price: float) -> int:
+        """追加一笔成交，返回行号。"""
+        i = self.n
+        if i == len(self.date):
+            self._grow()
+        ts = _ts(dt)
+        sid = self.symbol_id(symbol)
+        code = self._reason_id.get(reason)
+        if code is None:
+            code = self._reason_id[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        self.date[i] = ts.value
+        self.symbol[i] = sid
+        self.reason[i] = code
+        try:
+            self.size[i] = size
+        except OverflowError:
+            raise ValueError(f"trade size {size} for {symbol} does not fit in int64") from None
+        self.price[i] = price
+        if ts.tz is not None:
+            self._tz[sid] = ts.tz
+        if size > 0:
+            self._last_buy[sid] = i
+            self._last_buy_day[sid] = _local_day(ts)
+        pos = self._position.get(sid, 0)
+        new = pos + size
+        if new == 0:
+            self._lots.pop(sid, None)
+        elif pos == 0 or (new > 0) != (pos > 0):
+            self._lots[sid] = [i]  # 开仓或反手
+        elif abs(new) > abs(pos):
+            self._lots.setdefault(sid, []).append(i)
+        self._position[sid] = new
+        self.n = i + 1
+        return i
+
+    def append(self, trade: Dict[str, Any]):
+        self.record(trade["date"], trade["symbol"], trade.get("reason", ""), int(trade["size"]),
+                    float(trade["price"]))
+
+    def extend(self, trades: Iterable[Dict[str, Any]]):
+        for t in trades:
+            self.append(t)
+
+    # ---- 按标的的索引 ----
+    def last_buy(self, symbol: str) -> Optional[Dict[str, Any]]:
+        i = self._last_buy.get(self._symbol_id.get(symbol, -1))
+        return None if i is None else self[i]
+
+    def bought_on(self, symbol: str, day) -> bool:
+        """该标的最后一笔买入是否在 day 当天（T+1 判断）。"""
+        sid = self._symbol_id.get(symbol)
+        if sid is None or sid not in self._last_buy_day:
+            return False
+        return self._last_buy_day[sid] == _local_day(_ts(day))
+
+    def open_lots(self, symbol: str) -> List[Dict[str, Any]]:
+        """当前持仓（按账本累计）的开仓与同向加仓成交。"""
+        return [self[i] for i in self._lots.get(self._symbol_id.get(symbol, -1), [])]
+
+    def last_buys(self) -> Dict[str, Dict[str, Any]]:
+        """每个标的最后一笔买入，按行号排序。"""
+        return {self.symbols[self.symbol[i]]: self[i] for i in sorted(self._last_buy.values())}
+
+    def keep_last_buys(self) -> "TradeLedger":
+        """只保留每个标的最后一笔买入（paper 模式落盘后裁剪内存）。"""
+        rows = sorted(self._last_buy.values())
+        kept = TradeLedger(capacity=max(len(rows), 16))
+        kept.symbols, kept._symbol_id = self.symbols, self._symbol_id
+        kept.reasons, kept._reason_id, kept._tz = self.reasons, self._reason_id, self._tz
+        idx = np.asarray(rows, dtype=np.intp)
+        m = len(idx)
+        for name in ("date", "symbol", "reason", "size", "price"):
+            getattr(kept, name)[:m] = getattr(self, name)[idx]
+        kept.n = m
+        remap = {i: k for k, i in enumerate(rows)}
+        kept._last_buy = {int(self.symbol[i]): k for k, i in enumerate(rows)}
+        kept._last_buy_day = dict(self._last_buy_day)
+        # 持仓照旧累计；开仓批次只剩仍保留的行
+        kept._position = dict(self._position)
+        kept._lots = {sid: [remap[i] for i in lots if i in remap] for sid, lots in self._lots.items()}
+        return kept
+
+    # ---- 兼容 List[dict] ----
+    def _date_str(self, i: int) -> str:
+        ts = pd.Timestamp(int(self.date[i]))
+        tz = self._tz.get(int(self.symbol[i]))
+        return str(ts.tz_localize("UTC").tz_convert(tz) if tz is not None else ts)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(self.n))]
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("TradeLedger index out of range")
+        return {"date": self._date_str(i), "symbol": self.symbols[self.symbol[i]],
+                "reason": self.reasons[self.reason[i]], "size": int(self.size[i]), "price": float(self.price[i])}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self[i] for i in range(self.n))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TradeLedger, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TradeLedger({self.n} trades, {len(self.symbols)} symbols)"
+
+    # ---- 导出 ----
+    def to_frame(self, start: int = 0) -> pd.DataFrame:
+        """第 start 行起的成交。date 为 datetime64（有时区的标的时为本地时间字符串），symbol / reason 为分类列。"""
+        lo, n = min(start, self.n), self.n
+        if self._tz:
+            dates = pd.Series([self._date_str(i) for i in range(lo, n)], dtype=object)
+        else:
+            dates = pd.Series(self.date[lo:n].view("datetime64[ns]"), copy=False)
+        return pd.DataFrame({
+            "date": dates,
+            "symbol": pd.Categorical.from_codes(self.symbol[lo:n], categories=self.symbols),
+            "reason": pd.Categorical.from_codes(self.reason[lo:n], categories=self.reasons),
+            "size": self.size[lo:n],
+            "price": self.price[lo:n],
+        }, copy=False)
+
+    def to_csv(self, path: str, start: int = 0, append: bool = False):
+        """与 ``pd.DataFrame(list_of_dicts).to_csv`` 的格式一致（日期形如 2024-01-02 00:00:00）。
+
+        append=True 时把第 start 行起的成交追加到已有文件末尾（不写表头），用于分块落盘。
+        """
+        self.to_frame(start).to_csv(path, index=False, date_format="%Y-%m-%d %H:%M:%S",
+                                    mode="a" if append else "w", header=not append)
+
+    def to_arrow(self):
+        try:
+            import pyarrow as pa  # type: ignore
+        except Exception as e:
+            raise RuntimeError("需要安装 pyarrow，请执行：pip install pyarrow") from e
+        n = self.n
+        dates = pa.array(self.date[:n].view("datetime64[ns]"))
+        if self._tz:
+            dates = pa.array([self._date_str(i) for i in range(n)])
+        return pa.table({
+            "date": dates,
+            "symbol": pa.DictionaryArray.from_arrays(pa.array(self.symbol[:n]), pa.array(self.symbols, pa.string())),
+            "reason": pa.DictionaryArray.from_arrays(pa.array(self.reason[:n]), pa.array(self.reasons, pa.string())),
+            "size": pa.array(self.size[:n]),
+            "price": pa.array(self.price[:n]),
+        })
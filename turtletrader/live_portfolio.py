@@ -1,13 +1,17 @@
-import os, json, time
+import time
 import pandas as pd
 from typing import Dict, Any
 from .config import PortfolioConfig, InstrumentConfig
-from .portfolio import Portfolio, Position
-from .strategy import TurtleStrategy, TurtleState, Unit
-from .data_sources import YFinanceSource, EFinanceSource
+from .portfolio import Portfolio
+from .strategy import TurtleStrategy, TurtleState
+from .journal import PaperJournal
+from .streaming import IndicatorStream
+from .data_sources import IncrementalBars, get_source
 from .utils import unify_ohlcv
-from .cal import is_trading_day
+from .cal import is_trading_day, market_for_source
+from .resample import instrument_market
 from .logging import get_logger
+from .profiling import enable as enable_profiling, get_profiler
 
 log = get_logger("live")
 
@@ -17,82 +21,114 @@ log = get_logger("live")
 # print("Error:", e) -> log.exception("live loop error")
 
 
-def _pick_source(name: str):
-    name = (name or "").lower()
-    if name in ["yf", "yahoo", "yfinance"]:
-        return YFinanceSource()
-    if name in ["ef", "efinance", "china", "cn"]:
-        return EFinanceSource()
-    raise ValueError(f"unknown source {name}")
-
-
-def _store_paths(store_dir: str):
-    os.makedirs(store_dir, exist_ok=True)
-    return (
-        os.path.join(store_dir, "state.json"),
-        os.path.join(store_dir, "trades.csv"),
-    )
-
-
-def _serialize_state(port: Portfolio) -> dict:
-    def ser_state(ts: TurtleState):
-        return {
-            "last_s1_win": ts.last_s1_win,
-            "last_breakout_price": ts.last_breakout_price,
-            "units": [
-                {
-                    "entry_price": u.entry_price,
-                    "direction": u.direction,
-                    "size": u.size,
-                    "stop": u.stop,
-                    "entry_date": str(u.entry_date),
-                }
-                for u in ts.units
-            ],
-        }
-
-    return {
-        "cash": port.cash,
-        "positions": {
-            k: {"size": v.size, "avg_price": v.avg_price}
-            for k, v in port.positions.items()
-        },
-        "group_units": port.group_units,
-        "total_units": port.total_units,
-        "states": {k: ser_state(v) for k, v in port.states.items()},
-        "trades": port.trades,
-    }
-
-
-def _deserialize_state(port: Portfolio, data: dict):
-    port.cash = float(data.get("cash", port.cash))
-    port.positions = {
-        k: Position(size=int(v.get("size", 0)), avg_price=float(v.get("avg_price", 0)))
-        for k, v in data.get("positions", {}).items()
-    }
-    port.group_units = {k: int(v) for k, v in data.get("group_units", {}).items()}
-    port.total_units = int(data.get("total_units", 0))
-    new_states = {}
-    for sym, sd in data.get("states", {}).items():
-        ts = TurtleState()
-        ts.last_s1_win = bool(sd.get("last_s1_win", False))
-        ts.last_breakout_price = sd.get("last_breakout_price", None)
-        units = []
-        for u in sd.get("units", []):
-            units.append(
-                Unit(
-                    entry_price=float(u["entry_price"]),
-                    direction=int(u["direction"]),
-                    size=int(u["size"]),
-                    stop=float(u["stop"]),
-                    entry_date=pd.to_datetime(u["entry_date"]),
-                )
+def _pick_source(name: str, market_store: str = None, capacity: int = 2000, base_interval: str = None,
+                 market: str = None):
+    if base_interval:
+        from .resample import ResampledSource
+        # 只拉细K线，各周期本地增量聚合（每根细K线每个周期 O(1)）
+        return ResampledSource(_pick_source(name, market_store, capacity), base_interval,
+                               market=market, capacity=capacity)
+    src = get_source(name)
+    if market_store:
+        from .store import MarketStore
+        # live 下尾部每次都补最新K线
+        return MarketStore(market_store, src, ttl=0)
+    # 每轮只拉上次最后一根之后的增量
+    return IncrementalBars(src, capacity=capacity)
+
+
+def _stream_row(streams: Dict[str, IndicatorStream], sym: str, cfg, bars: pd.DataFrame,
+                use_closed: bool) -> dict:
+    """把新收盘的K线增量喂给该标的的指标流，返回本轮用于信号的 row。
+
+    最后一根视为未收盘：use_closed 时取最后一根已收盘K线的 row，否则对最后一根做 peek。
+    首次或本批K线与已处理的接不上（中间有缺口）时，用本批已收盘K线重新预热。
+    """
+    stream = streams.get(sym)
+    closed = bars.iloc[:-1]
+    start = 0
+    if stream is not None and stream.last_date is not None:
+        dates = pd.DatetimeIndex(pd.to_datetime(closed["date"]))
+        last = pd.Timestamp(stream.last_date)
+        start = int(dates.searchsorted(last, side="right"))
+        if start == 0 or dates[start - 1] != last:
+            stream = None
+            start = 0
+    if stream is None:
+        stream = streams[sym] = IndicatorStream(cfg)
+    for rec in closed.iloc[start:].to_dict("records"):
+        stream.push(rec)
+    if use_closed:
+        return stream.last_row
+    return stream.peek(bars.iloc[-1].to_dict())
+
+
+def _poll_once(pcfg: PortfolioConfig, instruments: Dict[str, InstrumentConfig], sources: Dict[str, Any],
+               strategys: Dict[str, TurtleStrategy], streams: Dict[str, IndicatorStream], port: Portfolio,
+               journal: PaperJournal, nbars: int, use_closed: bool) -> Dict[str, dict]:
+    """一轮轮询：取K线 -> 增量指标 -> 信号与成交 -> 写日志。返回本轮参与计算的 row。"""
+    prof = get_profiler()
+    rows = {}
+    last_prices = {}
+    for sym, ins in instruments.items():
+        if ins.source is None:
+            continue
+        src = sources[sym]
+        with prof.phase("fetch", sym):
+            bars = unify_ohlcv(src.recent_bars(ins.symbol, n=nbars, interval=ins.interval))
+        if len(bars) < 2:
+            continue
+        # 关键：仅用已收盘K线时取倒数第二根
+        with prof.phase("indicators", sym):
+            row = _stream_row(streams, sym, pcfg.turtle, bars, use_closed)
+        with prof.phase("is_trading_day"):
+            # 交易所按标的定（配置的 market / K线时区 / T+1），推不出时才用数据源的默认交易所
+            market = instrument_market(ins, bars["date"]) or market_for_source(ins.source)
+            trading = is_trading_day(pd.to_datetime(row["date"]), market=market)
+        if not trading:
+            continue
+        rows[sym] = row
+        last_prices[sym] = row["close"]
+
+    equity = port.equity(last_prices)
+
+    for sym, row in rows.items():
+        strat = strategys[sym]
+        state = port.states.get(sym) or TurtleState(pcfg.turtle.pyramiding.max_units)
+        port.states[sym] = state
+        ins = instruments[sym]
+        with prof.phase("step", sym):
+            step = strat.step(
+                row=row,
+                state=state,
+                equity=equity,
+                dollar_per_point=ins.dollar_per_point,
+                today=row["date"] if "date" in row else pd.Timestamp.utcnow(),
             )
-        ts.units = units
-        new_states[sym] = ts
-    if new_states:
-        port.states = new_states
-    port.trades = data.get("trades", [])
+        for reason, size, price in step["fills"]:
+            allow = True
+            if reason in ("entry", "add"):
+                if not port.can_open_new_unit(instruments, sym):
+                    allow = False
+                else:
+                    port._bump_units(instruments, sym, +1)
+            if allow:
+                with prof.phase("execute", sym):
+                    port.execute(
+                        pd.to_datetime(row["date"]),
+                        sym,
+                        reason,
+                        size,
+                        price,
+                        row,
+                        ins,
+                    )
+                prof.count("fills")
+                print(f"FILLED {sym}: {reason} {size} @ {price}")
+
+    with prof.phase("journal"):
+        journal.commit(port, rows.keys())
+    return rows
 
 
 def run_portfolio_live(
@@ -102,83 +138,45 @@ def run_portfolio_live(
     nbars: int = 300,
     use_closed: bool = False,
     max_loops: int = 0,
+    market_store: str = None,
+    snapshot_every: int = 1000,
+    metrics_file: str = None,
+    profile: str = None,
 ):
+    """模拟盘轮询。metrics_file：每轮写 Prometheus 文本指标（node exporter textfile collector）；
+    profile：退出时写分阶段计时报告（JSON）。两者任一给定即开启计时。
+    """
     instruments = {ins.symbol: ins for ins in pcfg.instruments}
     strategys = {sym: TurtleStrategy(pcfg.turtle) for sym in instruments}
-    sources = {sym: _pick_source(ins.source) for sym, ins in instruments.items()}
+    sources = {sym: _pick_source(ins.source, market_store, capacity=max(2 * nbars, 500), base_interval=ins.base_interval,
+                                 market=instrument_market(ins))
+               for sym, ins in instruments.items() if ins.source}
+    streams: Dict[str, IndicatorStream] = {}
 
     port = Portfolio(pcfg)
-    state_path, trades_path = _store_paths(store_dir)
-    if os.path.exists(state_path):
-        try:
-            _deserialize_state(port, json.load(open(state_path, "r")))
-            print(f"[restore] loaded state from {state_path}")
-        except Exception as e:
-            print("restore error:", e)
+    journal = PaperJournal(store_dir, snapshot_every=snapshot_every)
+    try:
+        if journal.restore(port):
+            print(f"[restore] loaded state from {store_dir} (seq={journal.seq})")
+    except Exception as e:
+        print("restore error:", e)
 
     print(
         f"[LIVE] portfolio {len(instruments)} symbols, poll={poll}s, nbars={nbars}, use_closed={use_closed}"
     )
+    prof = enable_profiling() if (metrics_file or profile) else get_profiler()
     loops = 0
     while True:
         try:
-            rows = {}
-            last_prices = {}
-            for sym, ins in instruments.items():
-                if ins.source is None:
-                    continue
-                src = sources[sym]
-                bars = src.recent_bars(ins.symbol, n=nbars, interval=ins.interval)
-                df = strategys[sym].prepare_indicators(unify_ohlcv(bars))
-                if len(df) < 2:
-                    continue
-                df["prev_close"] = df["close"].shift(1)
-                # 关键：仅用已收盘K线时取倒数第二根
-                row = df.iloc[-2] if (use_closed and len(df) >= 2) else df.iloc[-1]
-                if not is_trading_day(
-                    pd.to_datetime(row["date"]),
-                    market="SSE" if ins.source == "efinance" else "NYSE",
-                ):
-                    continue
-                # 注：日历代号：SSE/SZSE 需要你自定义 map（pandas-market-calendars 中常见是 XSHG / XSES / XNYS 等，实际以库支持为准）。
-                rows[sym] = row
-                last_prices[sym] = row["close"]
-
-            equity = port.equity(last_prices)
-
-            for sym, row in rows.items():
-                strat = strategys[sym]
-                state = port.states.get(sym) or TurtleState()
-                port.states[sym] = state
-                ins = instruments[sym]
-                step = strat.step(
-                    row=row,
-                    state=state,
-                    equity=equity,
-                    dollar_per_point=ins.dollar_per_point,
-                    today=row["date"] if "date" in row else pd.Timestamp.utcnow(),
-                )
-                for reason, size, price in step["fills"]:
-                    allow = True
-                    if reason in ("entry", "add"):
-                        if not port.can_open_new_unit(instruments, sym):
-                            allow = False
-                        else:
-                            port._bump_units(instruments, sym, +1)
-                    if allow:
-                        port.execute(
-                            pd.to_datetime(row["date"]),
-                            sym,
-                            reason,
-                            size,
-                            price,
-                            row,
-                            ins,
-                        )
-                        print(f"FILLED {sym}: {reason} {size} @ {price}")
-
-            with open(state_path, "w") as f:
-                json.dump(_serialize_state(port), f, indent=2)
+            t0 = time.perf_counter()
+            with prof.phase("poll"):
+                _poll_once(pcfg, instruments, sources, strategys, streams, port, journal, nbars, use_closed)
+            prof.count("polls")
+            prof.gauge("last_poll_seconds", time.perf_counter() - t0)
+            prof.gauge("last_poll_timestamp_seconds", time.time())
+            prof.gauge("positions", sum(1 for p in port.positions.values() if p.size))
+            if metrics_file:
+                prof.write_prometheus(metrics_file)
 
             time.sleep(poll)
             loops += 1
@@ -191,4 +189,8 @@ def run_portfolio_live(
             break
         except Exception as e:
             print("Error:", e)
+            prof.count("errors")
             time.sleep(poll)
+    if profile:
+        prof.write_report(profile)
+        log.info("profile written to %s", profile)
@@ -0,0 +1,242 @@
+"""向量化绩效指标：(runs, time) 的权益矩阵与成交账本一次算完，不再逐条序列调用 ``utils`` 的单序列函数。
+
+- :func:`equity_metrics`：每行一条权益曲线，收益率、历史最高与回撤各只算一次，派生出 CAGR、波动率、
+  Sharpe、Sortino、最大回撤及其持续时长、Calmar 等；行数很多时按 chunk_size 分块，临时数组大小有界；
+- :func:`rolling_metrics`：滚动窗口版本（收益、波动率、Sharpe、Sortino、相对窗口内最高点的回撤），
+  用前缀和与 van Herk 滚动最大值，O(runs × time)，与窗口长度无关；
+- :func:`trade_metrics` / :func:`attribution`：成交按标的切成往返交易（与 ``robustness.round_trips`` 相同），
+  一次排序 + reduceat 得到胜率、期望、盈亏比，以及逐标的 / 逐组的已实现与浮动盈亏归因；
+- :func:`evaluate`：以上全部，一次调用。
+
+cagr / sharpe / max_drawdown 与 ``utils`` 中同名函数的定义一致（Sharpe 用 ddof=1、年化 252）。
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .ledger import TradeLedger
+from .utils import _rolling
+
+PERIODS = 252
+
+
+def finite(x) -> Optional[float]:
+    """标量指标写进 metrics.json 前：无下行K线的 sortino（inf）、无回撤的 calmar（NaN）记为 None，保持标准 JSON。"""
+    x = float(x)
+    return x if np.isfinite(x) else None
+
+
+def _years(index: pd.DatetimeIndex) -> float:
+    return max((index[-1] - index[0]).days / 365.25, 1e-6) if len(index) else 1e-6
+
+
+def _equity_chunk(eq: np.ndarray, years: float, risk_free: float, periods: int) -> Dict[str, np.ndarray]:
+    runs, T = eq.shape
+    nan = np.full(runs, np.nan)
+    if T == 0:
+        return {k: nan for k in ("total_return", "cagr", "volatility", "sharpe", "sortino", "max_drawdown",
+                                 "max_drawdown_bars", "calmar", "positive_ratio")}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = eq[:, 1:] / eq[:, :-1] - 1.0
+        peak = np.maximum.accumulate(eq, axis=1)
+        dd = eq / peak - 1.0
+        # 水下时长：距上一个创新高的K线数
+        t = np.arange(T)
+        since = t - np.maximum.accumulate(np.where(dd >= 0, t, 0), axis=1)
+        total = eq[:, -1] / eq[:, 0]
+        cagr = total ** (1 / years) - 1.0
+        n = rets.shape[1]
+        mean = rets.mean(axis=1) if n else nan
+        std = rets.std(axis=1, ddof=1) if n > 1 else nan
+        excess = mean - risk_free / periods
+        sharpe = np.where(std == 0, 0.0, excess / (std + 1e-12) * np.sqrt(periods))
+        neg = np.minimum(rets, 0.0)
+        downside = np.sqrt(np.einsum("ij,ij->i", neg, neg) / n) if n else nan
+        sortino = np.where(downside == 0, np.where(excess > 0, np.inf, 0.0),
+                           excess / downside * np.sqrt(periods))
+        max_dd = dd.min(axis=1)
+        calmar = np.where(max_dd < 0, cagr / -max_dd, np.nan)
+        positive = (rets > 0).mean(axis=1) if n else nan
+    return {"total_return": total - 1.0, "cagr": cagr, "volatility": std * np.sqrt(periods), "sharpe": sharpe,
+            "sortino": sortino, "max_drawdown": max_dd, "max_drawdown_bars": since.max(axis=1), "calmar": calmar,
+            "positive_ratio": positive}
+
+
+def equity_metrics(equity, index: Optional[pd.DatetimeIndex] = None, risk_free: float = 0.0,
+                   periods: int = PERIODS, chunk_size: int = 64) -> pd.DataFrame:
+    """逐行的权益指标：equity 形如 (runs, time)（一维视为一行）或 Series；所有行共用时间轴 index。
+
+    max_drawdown_bars：最长水下K线数；positive_ratio：上涨K线占比；calmar：cagr / |max_drawdown|。
+    chunk_size 行一块：每块的临时数组能留在缓存里，比整块矩阵一次算更快。
+    """
+    if isinstance(equity, pd.Series):
+        index = equity.index if index is None else index
+        equity = equity.to_numpy(dtype=np.float64)
+    eq = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    index = pd.DatetimeIndex(pd.to_datetime(index)) if index is not None else pd.DatetimeIndex([])
+    years = _years(index)
+    parts = [_equity_chunk(eq[i:i + chunk_size], years, risk_free, periods)
+             for i in range(0, max(len(eq), 1), chunk_size)]
+    return pd.DataFrame({k: np.concatenate([p[k] for p in parts]) for k in parts[0]}, index=range(len(eq)))
+
+
+def rolling_metrics(equity, window: int, risk_free: float = 0.0, periods: int = PERIODS) -> Dict[str, np.ndarray]:
+    """滚动 window 根K线的指标，均为 (runs, time)，前 window 列为 NaN（第 t 列用 t-window..t 的权益）。
+
+    return：窗口收益；volatility / sharpe / sortino：窗口内 window 个收益率；drawdown：相对窗口内最高点。
+    """
+    eq = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    runs, T = eq.shape
+    out = {k: np.full((runs, T), np.nan) for k in ("return", "volatility", "sharpe", "sortino", "drawdown")}
+    if window < 2 or window >= T:
+        return out
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = eq[:, 1:] / eq[:, :-1] - 1.0
+
+        def window_sum(x):
+            c = np.zeros((runs, x.shape[1] + 1))
+            np.cumsum(x, axis=1, out=c[:, 1:])
+            return c[:, window:] - c[:, :-window]
+
+        s1, s2 = window_sum(rets), window_sum(rets * rets)
+        down = window_sum(np.minimum(rets, 0.0) ** 2)
+        mean = s1 / window
+        var = np.maximum(s2 - s1 * mean, 0.0) / (window - 1)
+        std = np.sqrt(var)
+        excess = mean - risk_free / periods
+        out["return"][:, window:] = eq[:, window:] / eq[:, :-window] - 1.0
+        out["volatility"][:, window:] = std * np.sqrt(periods)
+        out["sharpe"][:, window:] = np.where(std < 1e-12, 0.0, excess / (std + 1e-12) * np.sqrt(periods))
+        dstd = np.sqrt(down / window)
+        out["sortino"][:, window:] = np.where(dstd == 0, 0.0, excess / dstd * np.sqrt(periods))
+        peak = _rolling(eq, window + 1, np.maximum)
+        out["drawdown"][:, window:] = eq[:, window:] / peak[:, window:] - 1.0
+    return out
+
+
+# ---- 成交 ----
+def _trade_arrays(trades) -> Tuple[np.ndarray, np.ndarray, np.ndarray, list]:
+    """账本 / DataFrame / list[dict] -> (标的编号, size, price, 标的名)，按时间顺序。"""
+    if isinstance(trades, TradeLedger):
+        n = trades.n
+        return (trades.symbol[:n].astype(np.int64), trades.size[:n].astype(np.float64),
+                trades.price[:n].astype(np.float64), list(trades.symbols))
+    df = trades if isinstance(trades, pd.DataFrame) else pd.DataFrame(list(trades), columns=["symbol", "size", "price"])
+    sym = df["symbol"].astype(str).to_numpy() if "symbol" in df else np.full(len(df), "")
+    codes, names = pd.factorize(sym)
+    return codes.astype(np.int64), df["size"].to_numpy(dtype=np.float64), df["price"].to_numpy(dtype=np.float64), \
+        list(names)
+
+
+def _trips(trades) -> Dict[str, Any]:
+    """往返交易（持仓 0 -> 非 0 -> 0）：按标的稳定排序后一次 reduceat 求各段现金流。"""
+    sym, size, price, names = _trade_arrays(trades)
+    keep = size != 0
+    sym, size, price = sym[keep], size[keep], price[keep]
+    order = np.argsort(sym, kind="stable")
+    s, q, cash = sym[order], size[order], -size[order] * price[order]
+    n = len(s)
+    first = np.ones(n, dtype=bool)
+    first[1:] = s[1:] != s[:-1]
+    cpos = np.cumsum(q)
+    g = np.maximum.accumulate(np.where(first, np.arange(n), 0)) if n else np.zeros(0, dtype=np.int64)
+    pos = cpos - (cpos[g] - q[g])
+    flat = pos == 0
+    start = first.copy()
+    start[1:] |= flat[:-1]
+    starts = np.flatnonzero(start)
+    ends = np.append(starts[1:], n)[:len(starts)] - 1
+    trip_cash = np.add.reduceat(cash, starts) if n else np.zeros(0)
+    last = np.flatnonzero(np.append(first[1:], True)) if n else np.zeros(0, dtype=np.int64)
+    return {"names": names, "trip_symbol": s[starts], "trip_cash": trip_cash, "closed": flat[ends],
+            "trades": np.bincount(s, minlength=len(names)) if n else np.zeros(len(names), dtype=np.int64),
+            "last_symbol": s[last], "last_pos": pos[last], "last_price": price[order][last]}
+
+
+def _trade_stats(pnl: np.ndarray) -> Dict[str, float]:
+    wins, losses = pnl[pnl > 0], pnl[pnl < 0]
+    n = len(pnl)
+    avg_win = float(wins.mean()) if len(wins) else 0.0
+    avg_loss = float(losses.mean()) if len(losses) else 0.0
+    gross_loss = float(-losses.sum())
+    return {
+        "round_trips": n,
+        "win_rate": len(wins) / n if n else float("nan"),
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+        "payoff_ratio": avg_win / -avg_loss if avg_loss else float("nan"),
+        "profit_factor": float(wins.sum()) / gross_loss if gross_loss else float("nan"),
+        "expectancy": float(pnl.mean()) if n else float("nan"),
+    }
+
+
+def trade_metrics(trades) -> Dict[str, float]:
+    """已平仓往返交易的胜率、平均盈亏、盈亏比、利润因子与期望（每笔往返的平均盈亏）。"""
+    t = _trips(trades)
+    return _trade_stats(t["trip_cash"][t["closed"]])
+
+
+def _attribution(t: Dict[str, Any], groups: Optional[Mapping[str, str]],
+                 last_prices: Optional[Mapping[str, float]]) -> pd.DataFrame:
+    names, k = t["names"], len(t["names"])
+    closed, sym, cash = t["closed"], t["trip_symbol"], t["trip_cash"]
+    realized = np.bincount(sym[closed], weights=cash[closed], minlength=k).astype(np.float64)
+    trips = np.bincount(sym[closed], minlength=k)
+    wins = np.bincount(sym[closed & (cash > 0)], minlength=k)
+    # 未平的最后一段：现金流 + 持仓 × 标记价（缺省用该标的最后成交价）
+    open_cash = np.bincount(sym[~closed], weights=cash[~closed], minlength=k).astype(np.float64)
+    mark = t["last_price"].copy()
+    if last_prices:
+        mark = np.array([last_prices.get(names[j], m) for j, m in zip(t["last_symbol"].tolist(), mark.tolist())])
+    unrealized = open_cash.copy()
+    unrealized[t["last_symbol"]] += t["last_pos"] * mark
+    pnl = realized + unrealized
+    total = pnl.sum()
+    df = pd.DataFrame({
+        "symbol": names,
+        "group": [(groups or {}).get(s, "default") for s in names],
+        "trades": t["trades"],
+        "round_trips": trips,
+        "win_rate": np.where(trips > 0, wins / np.maximum(trips, 1), np.nan),
+        "realized": realized,
+        "unrealized": unrealized,
+        "pnl": pnl,
+        "contribution": pnl / total if total else np.nan,
+    })
+    return df.set_index("symbol")
+
+
+def attribution(trades, groups: Optional[Mapping[str, str]] = None,
+                last_prices: Optional[Mapping[str, float]] = None) -> Dict[str, pd.DataFrame]:
+    """逐标的与逐组的盈亏归因：{"symbols": 每标的一行, "groups": 每组一行}。
+
+    groups：标的 -> 组（如 ``{ins.symbol: ins.group for ins in cfg.instruments}``）；
+    last_prices：标的 -> 期末标记价（计算浮动盈亏）。
+    """
+    by_symbol = _attribution(_trips(trades), groups, last_prices)
+    return {"symbols": by_symbol, "groups": _group_table(by_symbol)}
+
+
+def _group_table(by_symbol: pd.DataFrame) -> pd.DataFrame:
+    cols = ["trades", "round_trips", "realized", "unrealized", "pnl"]
+    out = by_symbol.groupby("group")[cols].sum()
+    total = out["pnl"].sum()
+    out["contribution"] = out["pnl"] / total if total else np.nan
+    return out
+
+
+def evaluate(equity, index: Optional[pd.DatetimeIndex] = None, trades: Optional[Iterable] = None,
+             groups: Optional[Mapping[str, str]] = None, last_prices: Optional[Mapping[str, float]] = None,
+             window: Optional[int] = None, risk_free: float = 0.0, periods: int = PERIODS) -> Dict[str, Any]:
+    """一次算出：summary（逐行权益指标）、rolling（给定 window 时）、trades（往返交易统计）、
+    symbols / groups（盈亏归因）。"""
+    out: Dict[str, Any] = {"summary": equity_metrics(equity, index, risk_free, periods)}
+    if window:
+        eq = equity.to_numpy(dtype=np.float64) if isinstance(equity, pd.Series) else equity
+        out["rolling"] = rolling_metrics(eq, window, risk_free, periods)
+    if trades is not None:
+        t = _trips(trades)
+        out["trades"] = _trade_stats(t["trip_cash"][t["closed"]])
+        out["symbols"] = _attribution(t, groups, last_prices)
+        out["groups"] = _group_table(out["symbols"])
+    return out
@@ -0,0 +1,232 @@
+"""参数寻优（optuna）：数据只加载一次，多进程并行跑 trial，组合回测按时间分段汇报中间结果以便剪枝。
+
+搜索空间 YAML 的 ``params`` 以点分路径指向配置 dataclass 的字段，例如::
+
+    metric: sharpe            # cagr / sharpe / max_drawdown / end_equity
+    direction: maximize
+    params:
+      turtle.atr_len: [14, 30]                 # 整数区间
+      turtle.risk_per_unit: {low: 0.005, high: 0.02, log: true}
+      turtle.s1.entry_lookback: {low: 15, high: 30, step: 1}
+      turtle.pyramiding.max_units: {choices: [2, 3, 4]}
+      risk_caps.max_units_total: [6, 12]
+
+单标模式下配置根是 TurtleConfig，路径可省略 ``turtle.`` 前缀。
+
+并行：每个工作进程在启动时（initializer）收到一份行情，之后的 trial 不再序列化数据；
+组合行情放进共享内存数据集（:mod:`turtletrader.dataset`），各进程只收到句柄、映射同一份内存；
+各进程通过同一个 optuna 存储（默认 JournalStorage 文件）协作完成同一个 study。
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Optional
+import copy
+import math
+import os
+import numpy as np
+import pandas as pd
+from .config import PortfolioConfig, TurtleConfig
+from .dataset import Dataset, share_dataset
+from .engine import simulate
+from .portfolio_backtest import PortfolioSimulation
+from .sweep import SharedIndicators
+from .utils import annual_return, max_drawdown, sharpe
+
+METRICS = ("cagr", "sharpe", "max_drawdown", "end_equity")
+
+
+def _optuna():
+    try:
+        import optuna  # type: ignore
+    except Exception as e:
+        raise RuntimeError("需要安装 optuna，请执行：pip install optuna") from e
+    return optuna
+
+
+def suggest(trial, name: str, spec: Any):
+    """按搜索空间条目向 trial 取值：[low, high] / {low, high, step, log} / {choices: [...]}。"""
+    if isinstance(spec, (list, tuple)):
+        spec = {"low": spec[0], "high": spec[1]}
+    if "choices" in spec:
+        return trial.suggest_categorical(name, list(spec["choices"]))
+    low, high = spec["low"], spec["high"]
+    if isinstance(low, int) and isinstance(high, int) and not isinstance(spec.get("step", 1), float):
+        return trial.suggest_int(name, low, high, step=spec.get("step", 1), log=spec.get("log", False))
+    return trial.suggest_float(name, float(low), float(high), step=spec.get("step"), log=spec.get("log", False))
+
+
+def apply_params(cfg, params: Dict[str, Any]):
+    """返回 cfg 的深拷贝，按点分路径覆盖字段。"""
+    cfg = copy.deepcopy(cfg)
+    for path, value in params.items():
+        keys = path.split(".")
+        if isinstance(cfg, TurtleConfig) and keys[0] == "turtle":
+            keys = keys[1:]
+        node = cfg
+        for k in keys[:-1]:
+            node = getattr(node, k)
+            if node is None:
+                raise ValueError(f"{path}: '{k}' is not set in the base config")
+        if not hasattr(node, keys[-1]):
+            raise ValueError(f"unknown parameter {path}")
+        setattr(node, keys[-1], value)
+    return cfg
+
+
+def equity_metric(eq: pd.Series, metric: str) -> float:
+    if eq.empty:
+        return float("nan")
+    if metric == "cagr":
+        return float(annual_return(eq))
+    if metric == "sharpe":
+        return float(sharpe(eq.pct_change().dropna()))
+    if metric == "max_drawdown":
+        return float(max_drawdown(eq))
+    if metric == "end_equity":
+        return float(eq.iloc[-1])
+    raise ValueError(f"unknown metric {metric}")
+
+
+# ---- 评估（在工作进程内调用，行情来自 initializer） ----
+_DATA: Dict[str, Any] = {}
+
+
+def _init_worker(data: Dict[str, Any]):
+    _DATA.clear()
+    _DATA.update(data)
+    ds = data.get("data_map")
+    if isinstance(ds, Dataset):
+        # 共享内存数据集：各进程映射同一块内存，DataFrame 只是视图
+        _DATA["dataset"], _DATA["data_map"] = ds, ds.frames()
+
+
+def evaluate_single(cfg: TurtleConfig, metric: str) -> float:
+    """单标：数组引擎跑完整段（毫秒级，不分段）。"""
+    shared: SharedIndicators = _DATA.get("shared")
+    if shared is None:
+        shared = _DATA["shared"] = SharedIndicators(*_DATA["ohlc"])
+    eq, _, _ = simulate(shared.bars(cfg), cfg, init_equity=_DATA["init_equity"])
+    return equity_metric(pd.Series(eq, index=_DATA["dates"]), metric)
+
+
+def evaluate_portfolio(cfg: PortfolioConfig, metric: str, segments: int = 1,
+                       report: Optional[Callable[[int, float], bool]] = None) -> float:
+    """组合：按时间轴等分 segments 段推进，每段结束调用 report(step, 截至当前的指标)，返回 True 则中止。"""
+    sim = PortfolioSimulation(_DATA["data_map"], cfg, start=_DATA.get("start"), end=_DATA.get("end"))
+    n = len(sim)
+    bounds = [int(round(n * (k + 1) / segments)) for k in range(segments)]
+    value = float("nan")
+    for k, until in enumerate(bounds):
+        sim.advance(until)
+        value = equity_metric(sim.equity(), metric)
+        if report is not None and k < segments - 1 and report(k, value):
+            return value
+    return value
+
+
+def _objective(space: Dict[str, Any], metric: str, segments: int):
+    optuna = _optuna()
+    base = _DATA["base"]
+    worst = float("-inf") if _DATA["direction"] == "maximize" else float("inf")
+
+    def objective(trial):
+        cfg = apply_params(base, {name: suggest(trial, name, spec) for name, spec in space.items()})
+        if not isinstance(base, PortfolioConfig):
+            value = evaluate_single(cfg, metric)
+        else:
+            def report(step: int, value: float) -> bool:
+                trial.report(value if math.isfinite(value) else worst, step)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+                return False
+
+            value = evaluate_portfolio(cfg, metric, segments, report)
+        return value if math.isfinite(value) else float("nan")
+
+    return objective
+
+
+def make_storage(storage: Optional[str], out_dir: str):
+    """sqlite:///... 等 URL 原样交给 optuna；其余视为 JournalStorage 日志文件路径。"""
+    optuna = _optuna()
+    if storage and "://" in storage:
+        return storage
+    path = storage or os.path.join(out_dir, "study.log")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        from optuna.storages.journal import JournalFileBackend as Backend  # optuna >= 4
+    except ImportError:
+        from optuna.storages import JournalFileStorage as Backend  # type: ignore
+    return optuna.storages.JournalStorage(Backend(path))
+
+
+def make_pruner(name: str):
+    optuna = _optuna()
+    if name == "median":
+        return optuna.pruners.MedianPruner(n_startup_trials=8, n_warmup_steps=1)
+    if name == "halving":
+        return optuna.pruners.SuccessiveHalvingPruner()
+    return optuna.pruners.NopPruner()
+
+
+def _run_worker(study_name: str, storage: Optional[str], out_dir: str, pruner: str, n_trials: int,
+                space: Dict[str, Any], metric: str, segments: int, seed: Optional[int]):
+    optuna = _optuna()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    sampler = optuna.samplers.TPESampler(seed=seed)
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage, out_dir),
+                              sampler=sampler, pruner=make_pruner(pruner))
+    study.optimize(_objective(space, metric, segments), n_trials=n_trials)
+    return n_trials
+
+
+def run_optimize(base, space: Dict[str, Any], data: Dict[str, Any], n_trials: int = 100, workers: int = 0,
+                 metric: str = "sharpe", direction: str = "maximize", pruner: str = "median", segments: int = 4,
+                 out_dir: str = "./optimize", storage: Optional[str] = None, study_name: str = "turtle",
+                 seed: Optional[int] = None):
+    """创建（或续跑）study 并执行 n_trials 个 trial，返回 optuna Study。
+
+    base 为 TurtleConfig（单标，data 需含 ohlc/dates）或 PortfolioConfig（组合，data 需含 data_map）。
+    workers>1 时用进程池，每个进程跑约 n_trials/workers 个 trial。
+    """
+    optuna = _optuna()
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+    os.makedirs(out_dir, exist_ok=True)
+    data = dict(data, base=base, direction=direction, init_equity=data.get("init_equity", 100_000.0))
+    # 只建 study；trial 由 _run_worker 经各自的 storage 实例写入，结束后重新载入
+    optuna.create_study(study_name=study_name, storage=make_storage(storage, out_dir),
+                        direction=direction, pruner=make_pruner(pruner), load_if_exists=True)
+    segments = max(int(segments), 1) if isinstance(base, PortfolioConfig) else 1
+    workers = min(max(int(workers or 1), 1), n_trials) if n_trials > 0 else 1
+    if workers <= 1:
+        _init_worker(data)
+        _run_worker(study_name, storage, out_dir, pruner, n_trials, space, metric, segments, seed)
+    else:
+        share = [n_trials // workers + (1 if i < n_trials % workers else 0) for i in range(workers)]
+        seeds = [None if seed is None else seed + i for i in range(workers)]
+        with ExitStack() as stack:
+            if isinstance(data.get("data_map"), dict):
+                data["data_map"] = stack.enter_context(share_dataset(data["data_map"]))
+            ex = stack.enter_context(ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                         initargs=(data,)))
+            futs = [ex.submit(_run_worker, study_name, storage, out_dir, pruner, k, space, metric, segments, sd)
+                    for k, sd in zip(share, seeds) if k > 0]
+            for f in futs:
+                f.result()
+    return optuna.load_study(study_name=study_name, storage=make_storage(storage, out_dir))
+
+
+def single_data(df: pd.DataFrame, init_equity: float = 100_000.0) -> Dict[str, Any]:
+    """单标行情 -> 工作进程共享的数组。"""
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date").reset_index(drop=True)
+    ohlc = tuple(np.ascontiguousarray(df[c].to_numpy(dtype=np.float64)) for c in ("open", "high", "low", "close"))
+    return {"ohlc": ohlc, "dates": pd.DatetimeIndex(df["date"]), "init_equity": init_equity}
+
+
+def portfolio_data(data_map: Dict[str, pd.DataFrame], start=None, end=None) -> Dict[str, Any]:
+    """组合行情；start/end 把评估限制在 [start, end)（指标仍用全部历史）。"""
+    return {"data_map": data_map, "start": start, "end": end}
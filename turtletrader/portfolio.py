@@ -1,15 +1,23 @@
-from dataclasses import dataclass
 from typing import Dict, Any, List
 import pandas as pd
 import numpy as np
 from .config import PortfolioConfig, InstrumentConfig
+from .ledger import TradeLedger
 from .strategy import TurtleStrategy, TurtleState
 from .utils import max_drawdown, sharpe, annual_return
 
-@dataclass
 class Position:
-    size: int = 0
-    avg_price: float = 0.0
+    __slots__ = ("size", "avg_price")
+
+    def __init__(self, size: int = 0, avg_price: float = 0.0):
+        self.size = size
+        self.avg_price = avg_price
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Position) and (self.size, self.avg_price) == (other.size, other.avg_price)
+
+    def __repr__(self) -> str:
+        return f"Position(size={self.size!r}, avg_price={self.avg_price!r})"
 
 class Portfolio:
     def __init__(self, cfg: PortfolioConfig):
@@ -19,7 +27,16 @@ class Portfolio:
         self.states: Dict[str, TurtleState] = {}
         self.group_units: Dict[str, int] = {}
         self.total_units: int = 0
-        self.trades: List[Dict[str, Any]] = []
+        self.trades = TradeLedger()
+
+    @property
+    def trades(self) -> TradeLedger:
+        """成交账本；赋值 list[dict] 时转换成账本。"""
+        return self._trades
+
+    @trades.setter
+    def trades(self, trades):
+        self._trades = trades if isinstance(trades, TradeLedger) else TradeLedger(trades)
 
     def _group_of_symbol(self, instruments: Dict[str, InstrumentConfig], symbol: str) -> str:
         return instruments[symbol].group
@@ -51,19 +68,15 @@ class Portfolio:
 
     # T+1：若今天买入，则当天不许卖出
     def _t_plus_one_block(self, today: pd.Timestamp, symbol: str) -> bool:
-        for t in reversed(self.trades):
-            if t["symbol"] == symbol and t["size"] > 0:
-                if pd.to_datetime(t["date"]).date() == today.date():
-                    return True
-                break
-        return False
+        return self._trades.bought_on(symbol, today)
 
     def execute(self, dt: pd.Timestamp, symbol: str, reason: str, size: int, price: float,
                 row: pd.Series, instr: InstrumentConfig):
         side = "buy" if size>0 else "sell"
         # 禁做空
         if size < 0 and not instr.rules.allow_short:
-            if self.positions.get(symbol, Position()).size <= 0:
+            pos = self.positions.get(symbol)
+            if pos is None or pos.size <= 0:
                 return
         # T+1
         if instr.rules.t_plus_one and side == "sell":
@@ -76,7 +89,9 @@ class Portfolio:
                 return
 
         # 执行成交（Paper模式：现金简单扣减，不计滑点与手续费）
-        pos = self.positions.setdefault(symbol, Position())
+        pos = self.positions.get(symbol)
+        if pos is None:
+            pos = self.positions[symbol] = Position()
         self.cash -= price * size
         new_size = pos.size + size
         if pos.size == 0 or (pos.size>0) == (size>0):
@@ -90,7 +105,7 @@ class Portfolio:
             if pos.size == 0: pos.avg_price = 0.0
             else: pos.avg_price = price
 
-        self.trades.append({"date": str(dt), "symbol": symbol, "reason": reason, "size": size, "price": price})
+        self._trades.record(dt, symbol, reason, size, price)
 
     def equity(self, last_prices: Dict[str, float]) -> float:
         eq = self.cash
@@ -1,50 +1,252 @@
-from typing import Dict, Any
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+import numpy as np
 import pandas as pd
 import os, json
-from .config import PortfolioConfig, InstrumentConfig
-from .strategy import TurtleStrategy, TurtleState
+from time import perf_counter
+from .config import PortfolioConfig, InstrumentConfig, TurtleConfig
+from .strategy import TurtleStrategy, TurtleState, indicator_columns
+from .indicator_cache import get_default_cache
 from .portfolio import Portfolio
+from .profiling import get_profiler
+from .metrics import equity_metrics, finite
 from .utils import max_drawdown, sharpe, annual_return
 
-def run_portfolio_backtest(data_map: Dict[str, pd.DataFrame], cfg: PortfolioConfig, out_dir: str=None) -> Dict[str, Any]:
-    instruments: Dict[str, InstrumentConfig] = {ins.symbol: ins for ins in cfg.instruments}
-    strategys = {sym: TurtleStrategy(cfg.turtle) for sym in data_map}
-    dfs = {}
-    states = {}
+@dataclass
+class AlignedPanel:
+    """按联合时间轴对齐的 日期 × 标的 × 字段 数组，加上标的当日是否有K线的 mask。
 
-    for sym, df in data_map.items():
-        df = strategys[sym].prepare_indicators(df.copy())
-        df["prev_close"] = df["close"].shift(1)
-        dfs[sym] = df
-        states[sym] = TurtleState()
+    同一标的同一日期有多根K线时取第一根（与按 date 过滤后 ``iloc[0]`` 一致）。
+    """
+    dates: List[Any]
+    symbols: List[str]
+    fields: List[str]
+    values: np.ndarray            # (dates, symbols, fields), float64
+    mask: np.ndarray              # (dates, symbols), bool
+    symbol_fields: List[Optional[np.ndarray]]  # 该标的实际拥有的字段下标；None 表示全部
 
-    port = Portfolio(cfg)
-    port.states = states
+    @classmethod
+    def build(cls, dfs: Dict[str, pd.DataFrame]) -> "AlignedPanel":
+        symbols = list(dfs)
+        fields: List[str] = []
+        for df in dfs.values():
+            for c in df.select_dtypes(include="number").columns:
+                if c not in fields:
+                    fields.append(c)
+        if dfs:
+            dates_idx = pd.Index(pd.concat([df["date"] for df in dfs.values()], ignore_index=True)).unique().sort_values()
+        else:
+            dates_idx = pd.Index([])
+        values = np.full((len(dates_idx), len(symbols), len(fields)), np.nan)
+        mask = np.zeros((len(dates_idx), len(symbols)), dtype=bool)
+        symbol_fields: List[Optional[np.ndarray]] = []
+        for j, df in enumerate(dfs.values()):
+            first = ~df["date"].duplicated(keep="first").to_numpy()
+            t = dates_idx.get_indexer(df["date"])[first]
+            cols = [f for f in fields if f in df.columns]
+            fidx = np.array([fields.index(f) for f in cols], dtype=np.intp)
+            values[t[:, None], j, fidx[None, :]] = df[cols].to_numpy(dtype=np.float64)[first]
+            mask[t, j] = True
+            symbol_fields.append(None if len(cols) == len(fields) else fidx)
+        return cls(dates_idx.tolist(), symbols, fields, values, mask, symbol_fields)
 
-    # 联合时间轴（按date对齐）
-    all_dates = sorted(set().union(*[set(df["date"]) for df in dfs.values()]))
-    last_prices = {sym: dfs[sym].iloc[0]["close"] for sym in dfs}
-    equity_series = []
+    def rows_at(self, t: int) -> Dict[str, Dict[str, Any]]:
+        """第 t 个日期有K线的标的 -> row（dict，含 date），顺序与 data_map 一致。"""
+        block = self.values[t].tolist()
+        dt = self.dates[t]
+        fields = self.fields
+        rows = {}
+        for j in np.flatnonzero(self.mask[t]).tolist():
+            fidx = self.symbol_fields[j]
+            if fidx is None:
+                row = dict(zip(fields, block[j]))
+            else:
+                row = {fields[k]: block[j][k] for k in fidx.tolist()}
+            row["date"] = dt
+            rows[self.symbols[j]] = row
+        return rows
 
-    for dt in all_dates:
-        rows = {sym: df[df["date"]==dt].iloc[0] for sym, df in dfs.items() if not df[df["date"]==dt].empty}
+    def row(self, t: int, j: int) -> Dict[str, Any]:
+        """第 t 个日期、第 j 个标的的 row（调用方保证 mask[t, j]）。"""
+        values = self.values[t, j].tolist()
+        fidx = self.symbol_fields[j]
+        if fidx is None:
+            row = dict(zip(self.fields, values))
+        else:
+            row = {self.fields[k]: values[k] for k in fidx.tolist()}
+        row["date"] = self.dates[t]
+        return row
+
+    def entry_candidates(self, cfg: TurtleConfig) -> np.ndarray:
+        """(dates, symbols) 布尔阵：空仓时该根K线可能进场（N>0 且突破 S1 或 S2 进场通道）。
+
+        与 ``TurtleStrategy.step`` 的进场判断同口径（NaN 比较为假）；S1 的"上次盈利则跳过"依赖状态，
+        这里按可能进场处理，所以是超集：不在其中的 (日期, 空仓标的) 调用 step 一定没有成交。
+        """
+        def col(name):
+            return self.values[:, :, self.fields.index(name)]
+        with np.errstate(invalid="ignore"):
+            close = col("close")
+            hit = np.zeros(self.mask.shape, dtype=bool)
+            for name, sys_cfg in (("s1", cfg.s1), ("s2", cfg.s2)):
+                if sys_cfg and f"{name}_high" in self.fields:
+                    hit |= (close > col(f"{name}_high")) | (close < col(f"{name}_low"))
+            return hit & (col("N") > 0) & self.mask
+
+
+def _entry_hits(cols: Dict[str, np.ndarray], cfg: TurtleConfig) -> np.ndarray:
+    """单个标的逐根的进场候选：收盘突破任一启用系统的通道且 N>0（NaN 比较为假）。"""
+    close = cols["close"]
+    hit = np.zeros(len(close), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for name, sys_cfg in (("s1", cfg.s1), ("s2", cfg.s2)):
+            if sys_cfg:
+                hit |= (close > cols[f"{name}_high"]) | (close < cols[f"{name}_low"])
+        hit &= cols["N"] > 0
+    return hit
+
+
+def _precompute_shard(ds, symbols: List[str], cfg: TurtleConfig) -> List[tuple]:
+    """一组标的的指标列与进场候选（进程池中执行）：直接在共享数据集的只读列上计算，只回传结果列。"""
+    cache = get_default_cache()
+    out = []
+    for sym in symbols:
+        cols = {f: ds.array(sym, f) for f in ("high", "low", "close")}
+        ind = indicator_columns(cols["high"], cols["low"], cols["close"], cfg, cache=cache)
+        out.append((sym, ind, _entry_hits({**cols, **ind}, cfg)))
+    ds.close()
+    return out
+
+
+class SymbolPanel:
+    """联合时间轴上的逐标的列视图，行取法与 :class:`AlignedPanel` 相同，但不把行情复制进三维数组。
+
+    每个标的保留自己的一维列：行情列直接取传入 DataFrame 的底层数组（共享内存数据集的 frame 即只读视图，
+    不复制），N 与通道由 ``indicator_columns`` 在这些数组上计算（经指标缓存，同一进程内各次回测共用），
+    prev_close 取行时由 close 前一行得到。``pos[t, j]`` 为第 t 个日期在标的 j 的列中的行号，无K线为 -1。
+
+    workers>1 时行情先放进共享内存数据集（:func:`turtletrader.dataset.share_dataset`），指标与进场候选
+    按标的分片交给进程池，工作进程只映射同一块内存、只回传结果列，再并回各标的的列。
+    """
+
+    def __init__(self, dates: List[Any], symbols: List[str], columns: List[Dict[str, np.ndarray]], pos: np.ndarray,
+                 hits: List[np.ndarray]):
+        self.dates = dates
+        self.symbols = symbols
+        self.columns = columns
+        self.pos = pos
+        self.hits = hits
+        self._items = [list(c.items()) for c in columns]
+        self._close = [c["close"] for c in columns]
+
+    @classmethod
+    def build(cls, data_map: Dict[str, pd.DataFrame], cfg: TurtleConfig, workers: int = 0) -> "SymbolPanel":
+        """data_map 各标的需按日期升序（与逐标的计算指标的前提相同）。"""
+        prof = get_profiler()
+        symbols = list(data_map)
+        frames = list(data_map.values())
+        if frames:
+            dates_idx = pd.Index(pd.concat([df["date"] for df in frames], ignore_index=True)).unique().sort_values()
+        else:
+            dates_idx = pd.Index([])
+        pos = np.full((len(dates_idx), len(symbols)), -1, dtype=np.int64)
+        columns: List[Dict[str, np.ndarray]] = []
+        for j, df in enumerate(frames):
+            # float64 列 to_numpy 不复制
+            columns.append({c: df[c].to_numpy(dtype=np.float64) for c in df.select_dtypes(include="number").columns})
+            first = ~df["date"].duplicated(keep="first").to_numpy()
+            pos[dates_idx.get_indexer(df["date"])[first], j] = np.flatnonzero(first)
+
+        workers = min(int(workers or 1), len(symbols))
+        hits: List[np.ndarray] = []
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            from .dataset import share_dataset
+            with prof.phase("prepare_indicators"):
+                with share_dataset(data_map) as ds, ProcessPoolExecutor(max_workers=workers) as ex:
+                    shards = [symbols[i::workers] for i in range(workers)]
+                    done = {sym: (ind, hit) for part in ex.map(_precompute_shard, [ds] * workers, shards,
+                                                               [cfg] * workers) for sym, ind, hit in part}
+            for sym, cols in zip(symbols, columns):
+                ind, hit = done[sym]
+                cols.update(ind)
+                hits.append(hit)
+        else:
+            cache = get_default_cache()
+            for sym, cols in zip(symbols, columns):
+                with prof.phase("prepare_indicators", sym):
+                    cols.update(indicator_columns(cols["high"], cols["low"], cols["close"], cfg, cache=cache))
+                    hits.append(_entry_hits(cols, cfg))
+        return cls(dates_idx.tolist(), symbols, columns, pos, hits)
+
+    @property
+    def mask(self) -> np.ndarray:
+        return self.pos >= 0
+
+    def row(self, t: int, j: int) -> Dict[str, Any]:
+        """第 t 个日期、第 j 个标的的 row（调用方保证该标的当日有K线）。"""
+        i = int(self.pos[t, j])
+        row = {f: a[i].item() for f, a in self._items[j]}
+        row["prev_close"] = self._close[j][i - 1].item() if i else float("nan")
+        row["date"] = self.dates[t]
+        return row
+
+    def rows_at(self, t: int) -> Dict[str, Dict[str, Any]]:
+        return {self.symbols[j]: self.row(t, j) for j in np.flatnonzero(self.pos[t] >= 0).tolist()}
+
+    def close(self, t: int, j: int) -> float:
+        return self._close[j][self.pos[t, j]].item()
+
+    def entry_candidates(self) -> np.ndarray:
+        """同 :meth:`AlignedPanel.entry_candidates`：build 时逐标的算好的候选按 pos 摆到联合时间轴上。"""
+        out = np.zeros(self.pos.shape, dtype=bool)
+        for j, hit in enumerate(self.hits):
+            idx = self.pos[:, j]
+            have = idx >= 0
+            out[have, j] = hit[idx[have]]
+        return out
+
+
+class PortfolioStepper:
+    """逐日推进的组合状态：策略、持仓、最新价与权益序列。
+
+    ``step_rows(dt, rows)`` 处理联合时间轴上的一个日期（rows 为当日有K线的标的 -> row，
+    按标的顺序），内存面板与流式回测共用。
+    """
+
+    def __init__(self, cfg: PortfolioConfig, symbols: List[str]):
+        self.cfg = cfg
+        self.instruments: Dict[str, InstrumentConfig] = {ins.symbol: ins for ins in cfg.instruments}
+        self.strategys = {sym: TurtleStrategy(cfg.turtle) for sym in symbols}
+        self.port = Portfolio(cfg)
+        self.port.states = {sym: TurtleState(cfg.turtle.pyramiding.max_units) for sym in symbols}
+        self.last_prices: Dict[str, float] = {}
+        self.equity_series: List[tuple] = []
+
+    def step_rows(self, dt, rows: Dict[str, Dict[str, Any]], prof=None, timed: bool = False):
+        port, instruments, last_prices = self.port, self.instruments, self.last_prices
         for sym, row in rows.items():
             last_prices[sym] = row["close"]
         equity = port.equity(last_prices)
 
         for sym, row in rows.items():
-            strat = strategys[sym]
+            strat = self.strategys[sym]
             state = port.states[sym]
             ins = instruments[sym]
-            remaining_units = len(state.units)
+            remaining_units = state.book.n
+            if timed:
+                t0 = perf_counter()
             step = strat.step(row=row, state=state, equity=equity, dollar_per_point=ins.dollar_per_point, today=dt)
+            if timed:
+                t1 = perf_counter()
+                prof.add("step", t1 - t0, sym)
             for reason, size, price in step["fills"]:
                 allow = True
                 if reason in ("entry", "add"):
                     if not port.can_open_new_unit(instruments, sym):
                         allow = False
                         # remove the unit that strategy appended but we won't execute
-                        state.units = state.units[:-1]
+                        state.book.pop()
                     else:
                         port._bump_units(instruments, sym, +1)
                         remaining_units += 1
@@ -56,34 +258,130 @@ def run_portfolio_backtest(data_map: Dict[str, pd.DataFrame], cfg: PortfolioConf
                     elif reason == "exit":
                         port._bump_units(instruments, sym, -remaining_units)
                         remaining_units = 0
+            if timed and step["fills"]:
+                prof.add("execute", perf_counter() - t1, sym)
+                prof.count("fills", len(step["fills"]))
+
+        self.equity_series.append((dt, port.equity(last_prices)))
+        if timed:
+            prof.count("bars")
+
+    def equity(self) -> pd.Series:
+        return pd.Series({pd.to_datetime(d): v for d, v in self.equity_series}).sort_index()
+
+    def metrics(self, eq: Optional[pd.Series] = None) -> Dict[str, Any]:
+        eq = self.equity() if eq is None else eq
+        rets = eq.pct_change().dropna()
+        extra = equity_metrics(eq).iloc[0]
+        return {
+            "start": str(eq.index[0].date()) if not eq.empty else None,
+            "end": str(eq.index[-1].date()) if not eq.empty else None,
+            "start_equity": float(eq.iloc[0]) if not eq.empty else 0.0,
+            "end_equity": float(eq.iloc[-1]) if not eq.empty else 0.0,
+            "cagr": float(annual_return(eq)),
+            "sharpe": float(sharpe(rets)),
+            "max_drawdown": float(max_drawdown(eq)),
+            "sortino": finite(extra["sortino"]),
+            "calmar": finite(extra["calmar"]),
+            "total_trades": len(self.port.trades),
+            "final_positions": {k:int(v.size) for k,v in self.port.positions.items()}
+        }
+
+
+class PortfolioSimulation(PortfolioStepper):
+    """可分段推进的组合回测：``advance(t)`` 跑到联合时间轴第 t 个日期之前，结果与一次跑完相同。
+
+    参数寻优用它在部分区间上汇报中间结果（剪枝），``run_portfolio_backtest`` 一次跑完。
+    start/end 把交易限制在 [start, end) 内（空仓起步），指标仍在全部历史上计算，窗口开头无需预热。
+
+    逐标的的部分（指标、进场候选）先向量化算好；逐日推进只对持有单位或当根有突破候选的标的调用 ``step``
+    （其余标的 step 必然无成交），风控上限、按权益定仓位与成交仍按日期、按标的顺序串行处理，
+    结果与逐标的逐日推进相同。workers>1 时逐标的的指标与进场候选在进程池中按标的分片计算（经共享内存
+    数据集，不复制行情），逐日推进仍在本进程串行，结果不变。
+    """
+
+    def __init__(self, data_map: Dict[str, pd.DataFrame], cfg: PortfolioConfig, start=None, end=None,
+                 workers: int = 0):
+        super().__init__(cfg, list(data_map))
+        prof = get_profiler()
+        # 联合时间轴（按date对齐）：逐标的列视图 + 行号表，逐日按下标 O(1) 取行；行情不复制
+        self.panel = SymbolPanel.build(data_map, cfg.turtle, workers=workers)
+        with prof.phase("panel"):
+            self.candidates = self.panel.entry_candidates()
+        self.last_prices = {sym: self.panel.columns[j]["close"][0] for j, sym in enumerate(self.panel.symbols)}
+        self.t = self.begin = self._locate(start, 0)
+        self.stop = self._locate(end, len(self.panel.dates))
+
+    def _locate(self, bound, default: int) -> int:
+        if bound is None:
+            return default
+        dates = pd.DatetimeIndex(pd.to_datetime(pd.Index(self.panel.dates)))
+        return int(dates.searchsorted(pd.Timestamp(bound), "left"))
+
+    def __len__(self) -> int:
+        return self.stop - self.begin
+
+    def advance(self, until: Optional[int] = None) -> "PortfolioSimulation":
+        """推进到窗口内第 until 根（相对窗口起点），None 为跑完整个窗口。"""
+        panel, port = self.panel, self.port
+        states, last_prices = port.states, self.last_prices
+        symbols, candidates, pos = panel.symbols, self.candidates, panel.pos
+        index = {sym: j for j, sym in enumerate(symbols)}
+        books = [states[sym].book for sym in symbols]
+        until = self.stop if until is None else min(self.begin + until, self.stop)
+        # 计时开关在循环外取一次；关闭时每根K线只多一次布尔判断
+        prof = get_profiler()
+        timed = prof.enabled
+        for t in range(self.t, until):
+            dt = panel.dates[t]
+            if timed:
+                t0 = perf_counter()
+            present = pos[t] >= 0
+            # 需要 step 的：当根有K线，且持有单位或有进场候选（按标的顺序）
+            active = np.flatnonzero(candidates[t]).tolist()
+            held = [j for j, b in enumerate(books) if b.n and present[j]]
+            if held:
+                active = sorted(set(active).union(held))
+            rows = {symbols[j]: panel.row(t, j) for j in active}
+            # 持仓（含策略已清空单位但仓位仍在的）按当根收盘更新最新价
+            for sym in port.positions:
+                j = index.get(sym)
+                if j is not None and present[j] and sym not in rows:
+                    last_prices[sym] = panel.close(t, j)
+            if timed:
+                prof.add("rows", perf_counter() - t0)
+                prof.count("skipped", int(present.sum()) - len(rows))
+            self.step_rows(dt, rows, prof, timed)
+        self.t = max(self.t, until)
+        return self
+
+
+def save_summary(eq: pd.Series, metrics: Dict[str, Any], out_dir: str, plot: bool = True):
+    """metrics.json 与权益曲线图（plot=False 时不画图，也不导入 matplotlib）。"""
+    with open(os.path.join(out_dir, "metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+    if not plot:
+        return
+    import matplotlib.pyplot as plt
+    plt.figure()
+    eq.plot(title="Portfolio Equity Curve")
+    plt.tight_layout()
+    plt.savefig(os.path.join(out_dir, "equity_curve.png"), dpi=144)
+    plt.close()
+
 
-        equity_series.append((dt, port.equity(last_prices)))
-
-    eq = pd.Series({pd.to_datetime(d): v for d, v in equity_series}).sort_index()
-    rets = eq.pct_change().dropna()
-    metrics = {
-        "start": str(eq.index[0].date()) if not eq.empty else None,
-        "end": str(eq.index[-1].date()) if not eq.empty else None,
-        "start_equity": float(eq.iloc[0]) if not eq.empty else 0.0,
-        "end_equity": float(eq.iloc[-1]) if not eq.empty else 0.0,
-        "cagr": float(annual_return(eq)),
-        "sharpe": float(sharpe(rets)),
-        "max_drawdown": float(max_drawdown(eq)),
-        "total_trades": len(port.trades),
-        "final_positions": {k:int(v.size) for k,v in port.positions.items()}
-    }
+def run_portfolio_backtest(data_map: Dict[str, pd.DataFrame], cfg: PortfolioConfig, out_dir: str=None,
+                           start=None, end=None, workers: int = 0, plot: bool = True) -> Dict[str, Any]:
+    """workers>1 时逐标的的指标与进场候选在进程池中分片计算，结果不变；plot=False 时 out_dir 下不画权益曲线图。"""
+    sim = PortfolioSimulation(data_map, cfg, start=start, end=end, workers=workers).advance()
+    port = sim.port
+    eq = sim.equity()
+    metrics = sim.metrics(eq)
 
     if out_dir:
         os.makedirs(out_dir, exist_ok=True)
         pd.DataFrame({"equity": eq}).to_csv(os.path.join(out_dir, "equity_curve.csv"))
-        with open(os.path.join(out_dir, "metrics.json"), "w") as f:
-            json.dump(metrics, f, indent=2)
-        import matplotlib.pyplot as plt
-        plt.figure()
-        eq.plot(title="Portfolio Equity Curve")
-        plt.tight_layout()
-        plt.savefig(os.path.join(out_dir, "equity_curve.png"), dpi=144)
-        plt.close()
-        pd.DataFrame(port.trades).to_csv(os.path.join(out_dir, "trades.csv"), index=False)
+        save_summary(eq, metrics, out_dir, plot)
+        port.trades.to_csv(os.path.join(out_dir, "trades.csv"))
 
     return {"metrics": metrics, "equity": eq, "trades": port.trades, "positions": port.positions}
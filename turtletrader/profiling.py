@@ -0,0 +1,217 @@
+"""可选的热点计时：分阶段计时器、计数器与按标的的耗时直方图。
+
+默认是不做事的 :class:`NullProfiler`（``phase()`` 返回共享的空上下文，``add`` / ``count`` 直接返回），
+热路径上的开销只有一次方法调用。需要时 ``enable()`` 换成 :class:`Profiler`::
+
+    prof = enable()
+    with prof.phase("fetch", symbol):
+        ...
+    prof.write_report("profile.json")      # 阶段汇总 + 按标的统计
+    prof.write_prometheus("turtle.prom")   # node exporter textfile collector 格式
+
+直方图用固定的对数分桶（秒），分位数按桶上界估计。
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Any, Dict, Optional, Tuple
+import json
+import os
+import time
+
+# 桶上界（秒），最后隐含 +Inf
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "n", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估计分位数（落在 +Inf 桶时返回最大值）。"""
+        if self.n == 0:
+            return 0.0
+        rank = q * self.n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank and c:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {"count": self.n, "total": self.total, "mean": self.total / self.n if self.n else 0.0,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "max": self.max}
+
+
+class _Phase:
+    __slots__ = ("prof", "name", "symbol", "t0")
+
+    def __init__(self, prof: "Profiler", name: str, symbol: Optional[str]):
+        self.prof, self.name, self.symbol = prof, name, symbol
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.add(self.name, perf_counter() - self.t0, self.symbol)
+        return False
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self):
+        self.phases: Dict[str, Histogram] = {}
+        self.symbols: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.started = time.time()
+
+    def phase(self, name: str, symbol: Optional[str] = None):
+        """计时上下文：耗时记入阶段 name，给定 symbol 时同时记入该标的的直方图。"""
+        return _Phase(self, name, symbol)
+
+    def add(self, name: str, seconds: float, symbol: Optional[str] = None):
+        h = self.phases.get(name)
+        if h is None:
+            h = self.phases[name] = Histogram()
+        h.observe(seconds)
+        if symbol is not None:
+            key = (name, symbol)
+            h = self.symbols.get(key)
+            if h is None:
+                h = self.symbols[key] = Histogram()
+            h.observe(seconds)
+
+    def count(self, name: str, n: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def reset(self):
+        self.__init__()
+
+    # ---- 输出 ----
+    def report(self) -> Dict[str, Any]:
+        return {
+            "elapsed": time.time() - self.started,
+            "phases": {k: h.summary() for k, h in self.phases.items()},
+            "symbols": {f"{p}/{s}": h.summary() for (p, s), h in sorted(self.symbols.items())},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def format_table(self, top: int = 10) -> str:
+        """阶段汇总表（按总耗时降序），以及每个阶段最慢的 top 个标的。"""
+        lines = [f"{'phase':<20}{'count':>10}{'total s':>12}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, h in sorted(self.phases.items(), key=lambda kv: -kv[1].total):
+            s = h.summary()
+            lines.append(f"{name:<20}{s['count']:>10}{s['total']:>12.3f}{s['mean'] * 1e3:>10.3f}"
+                         f"{s['p95'] * 1e3:>10.3f}{s['max'] * 1e3:>10.3f}")
+        for name in self.phases:
+            per = sorted(((sym, h) for (p, sym), h in self.symbols.items() if p == name), key=lambda kv: -kv[1].total)
+            if per:
+                slow = ", ".join(f"{sym} {h.total:.3f}s" for sym, h in per[:top])
+                lines.append(f"  slowest {name}: {slow}")
+        for name, v in sorted(self.counters.items()):
+            lines.append(f"{name:<20}{v:>10g}")
+        return "\n".join(lines)
+
+    def write_report(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def prometheus_text(self, prefix: str = "turtle") -> str:
+        """Prometheus 文本格式：阶段耗时直方图；按标的只输出 _sum/_count（控制基数）；计数器与仪表。"""
+        out = [f"# HELP {prefix}_phase_seconds Time spent per phase.", f"# TYPE {prefix}_phase_seconds histogram"]
+        for name, h in sorted(self.phases.items()):
+            acc = 0
+            for le, c in zip(BUCKETS + ("+Inf",), h.counts):
+                acc += c
+                out.append(f'{prefix}_phase_seconds_bucket{{phase="{name}",le="{le}"}} {acc}')
+            out.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {h.total!r}')
+            out.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {h.n}')
+        if self.symbols:
+            out += [f"# HELP {prefix}_symbol_phase_seconds Time spent per phase and symbol.",
+                    f"# TYPE {prefix}_symbol_phase_seconds summary"]
+            for (name, sym), h in sorted(self.symbols.items()):
+                labels = f'phase="{name}",symbol="{_escape(sym)}"'
+                out.append(f"{prefix}_symbol_phase_seconds_sum{{{labels}}} {h.total!r}")
+                out.append(f"{prefix}_symbol_phase_seconds_count{{{labels}}} {h.n}")
+        for name, v in sorted(self.counters.items()):
+            out += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {v!r}"]
+        for name, v in sorted(self.gauges.items()):
+            out += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {v!r}"]
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = "turtle"):
+        """原子写入（先写临时文件再替换），避免 exporter 读到半截文件。"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text(prefix))
+        os.replace(tmp, path)
+
+
+def _escape(s: str) -> str:
+    return str(s).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_NOOP = nullcontext()
+
+
+class NullProfiler(Profiler):
+    """关闭状态：所有记录操作都是空操作。"""
+    enabled = False
+
+    def phase(self, name: str, symbol: Optional[str] = None):
+        return _NOOP
+
+    def add(self, name: str, seconds: float, symbol: Optional[str] = None):
+        pass
+
+    def count(self, name: str, n: float = 1):
+        pass
+
+    def gauge(self, name: str, value: float):
+        pass
+
+
+_active: Profiler = NullProfiler()
+
+
+def get_profiler() -> Profiler:
+    return _active
+
+
+def set_profiler(prof: Optional[Profiler]) -> Profiler:
+    global _active
+    _active = prof if prof is not None else NullProfiler()
+    return _active
+
+
+def enable() -> Profiler:
+    """换上新的 Profiler（已开启时沿用当前的）。"""
+    return _active if _active.enabled else set_profiler(Profiler())
+
+
+def disable():
+    set_profiler(None)
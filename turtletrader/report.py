@@ -1,16 +1,303 @@
-import os, json, base64
-def save_html_report(res: dict, out_dir: str):
-    eq_png = os.path.join(out_dir, "equity_curve.png")
-    metrics = res["metrics"]
-    b64 = ""
-    if os.path.exists(eq_png):
-        b64 = base64.b64encode(open(eq_png, "rb").read()).decode()
-    html = f"""
-    <html><body>
-    <h1>Portfolio Backtest Report</h1>
-    <pre>{json.dumps(metrics, indent=2)}</pre>
-    {'<img src="data:image/png;base64,' + b64 + '"/>' if b64 else ''}
-    </body></html>
+"""回测报告：从保存的结果目录（equity_curve.csv / trades.csv / metrics.json）事后生成，不重跑回测。
+
+- 图表是纯 SVG（不依赖 matplotlib），另存同样数据的 JSON，便于前端交互式图表直接加载；
+- 长序列按桶降采样：每桶保留首、尾、最小、最大四个点，回撤的极值不会被抹掉；
+- 组合：权益 + 回撤；逐标的：价格与成交标记 + 累计盈亏 + 盈亏回撤，标的多时在进程池中分片渲染；
+- report.html 内嵌组合图，逐标的图按需懒加载（charts/ 下的 SVG）。
+
+逐标的盈亏按现金流计：-Σ size×price + 持仓×标记价。给了 prices（标的 -> 含 date/close 的K线）时
+按每根收盘价逐日标记，否则只在成交点上按成交价标记。
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+from .metrics import trade_metrics
+
+COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd")
+MARKERS = {"entry": ("#2ca02c", "up"), "add": ("#98df8a", "up"), "exit": ("#d62728", "down"),
+           "stop": ("#ff7f0e", "down")}
+
+
+def _local_ns(values) -> np.ndarray:
+    """日期（字符串 / Timestamp，可带时区）-> 本地时间纳秒；带时区的按其本地时间（与 trades.csv 的写法一致）。"""
+    s = pd.Series(values)
+    if s.dtype == object:
+        s = s.astype(str).str.slice(0, 19)  # "YYYY-MM-DD HH:MM:SS"，去掉时区后缀（各行 UTC 偏移可能不同）
+    idx = pd.DatetimeIndex(pd.to_datetime(s))
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    return idx.as_unit("ns").asi8
+
+
+def downsample(y: np.ndarray, max_points: int) -> np.ndarray:
+    """保留的下标（升序）：分成 max_points // 4 个桶，每桶取首、尾、最小、最大。"""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(max_points // 4, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    b = np.searchsorted(edges, np.arange(n), "right") - 1
+    y = np.asarray(y, dtype=np.float64)
+    lo = np.lexsort((y, b))     # 每桶内按 y 升序（NaN 排最后）
+    hi = np.lexsort((-y, b))
+    starts = edges[:-1]
+    keep = np.concatenate([starts, edges[1:] - 1, lo[starts], hi[starts]])
+    return np.unique(keep)
+
+
+def drawdown(y: np.ndarray, pct: bool = True) -> np.ndarray:
+    """相对历史最高的回撤：pct 时为比例（<= 0），否则为金额。"""
+    y = np.asarray(y, dtype=np.float64)
+    peak = np.fmax.accumulate(y)
+    if not pct:
+        return y - peak
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peak > 0, y / peak - 1.0, 0.0)
+
+
+# ---- SVG ----
+def _fmt(v: float) -> str:
+    return f"{v:,.4g}" if abs(v) < 1e4 else f"{v:,.0f}"
+
+
+def svg_chart(x: np.ndarray, panels: Sequence[Dict[str, Any]], title: str = "", width: int = 900,
+              panel_height: int = 180) -> str:
+    """多面板折线图（共用时间轴）。
+
+    x：本地时间纳秒；每个 panel：{"name", "lines": {名称: y}, "markers": [(x, y, reason)], "pct": bool}。
     """
+    left, right, top, gap = 70, 15, 28 if title else 8, 26
+    height = top + len(panels) * (panel_height + gap)
+    x = np.asarray(x, dtype=np.int64)
+    x0, x1 = (int(x.min()), int(x.max())) if len(x) else (0, 1)
+    span = max(x1 - x0, 1)
+    plot_w = width - left - right
+
+    def px(v):
+        return left + (np.asarray(v, dtype=np.float64) - x0) / span * plot_w
+
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+           '<rect width="100%" height="100%" fill="white"/>']
+    if title:
+        out.append(f'<text x="{left}" y="18" font-size="14" font-weight="bold">{escape(title)}</text>')
+    for k, panel in enumerate(panels):
+        y_top = top + k * (panel_height + gap) + 12
+        ys = [np.asarray(y, dtype=np.float64) for y in panel["lines"].values()]
+        ys += [np.asarray(m[1], dtype=np.float64) for m in panel.get("markers", ())]
+        finite = np.concatenate([y[np.isfinite(y)] for y in ys]) if ys else np.empty(0)
+        lo, hi = (float(finite.min()), float(finite.max())) if len(finite) else (0.0, 1.0)
+        if hi == lo:
+            lo, hi = lo - 1.0, hi + 1.0
+        pad = (hi - lo) * 0.05
+        lo, hi = lo - pad, hi + pad
+
+        def py(v):
+            return y_top + (hi - np.asarray(v, dtype=np.float64)) / (hi - lo) * panel_height
+
+        out.append(f'<text x="{left}" y="{y_top - 3}" fill="#444">{escape(panel.get("name", ""))}</text>')
+        out.append(f'<rect x="{left}" y="{y_top}" width="{plot_w}" height="{panel_height}" '
+                   f'fill="none" stroke="#ccc"/>')
+        for t in np.linspace(lo + pad, hi - pad, 4):
+            ty = float(py(t))
+            label = f"{t:.1%}" if panel.get("pct") else _fmt(t)
+            out.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{ty:.1f}" y2="{ty:.1f}" stroke="#eee"/>'
+                       f'<text x="{left - 4}" y="{ty + 4:.1f}" text-anchor="end" fill="#666">{label}</text>')
+        for c, (name, y) in enumerate(panel["lines"].items()):
+            y = np.asarray(y, dtype=np.float64)
+            ok = np.isfinite(y)
+            if not ok.any():
+                continue
+            pts = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(px(x[ok]).tolist(), py(y[ok]).tolist()))
+            out.append(f'<polyline fill="none" stroke="{COLORS[c % len(COLORS)]}" stroke-width="1.2" '
+                       f'points="{pts}"><title>{escape(name)}</title></polyline>')
+        for mx, my, reason in panel.get("markers", ()):
+            color, direction = MARKERS.get(reason, ("#555", "up"))
+            for a, b in zip(px(mx).tolist(), py(my).tolist()):
+                d = 4 if direction == "up" else -4
+                out.append(f'<path d="M{a:.1f},{b - d:.1f} l-3.5,{2 * d} h7 z" fill="{color}">'
+                           f'<title>{reason}</title></path>')
+    if len(x):
+        base = top + len(panels) * (panel_height + gap) - gap + 26
+        for v, anchor in ((x0, "start"), ((x0 + x1) // 2, "middle"), (x1, "end")):
+            label = str(pd.Timestamp(v).date())
+            out.append(f'<text x="{float(px(v)):.1f}" y="{base}" text-anchor="{anchor}" fill="#666">{label}</text>')
+    out.append("</svg>")
+    return "\n".join(out)
+
+
+def _series_json(x: np.ndarray, series: Dict[str, np.ndarray], trades: Optional[pd.DataFrame] = None,
+                 **meta) -> Dict[str, Any]:
+    """交互式图表用的数据：x 为毫秒时间戳（本地时间），NaN 为 null。"""
+    def clean(y):
+        y = np.asarray(y, dtype=np.float64)
+        return [None if v != v else v for v in y.tolist()]
+    out = dict(meta, x=(np.asarray(x, dtype=np.int64) // 10**6).tolist(),
+               series={k: clean(v) for k, v in series.items()})
+    if trades is not None:
+        out["trades"] = [{"t": t // 10**6, "reason": r, "size": s, "price": p} for t, r, s, p in
+                         zip(trades["ns"].tolist(), trades["reason"].tolist(), trades["size"].tolist(),
+                             trades["price"].tolist())]
+    return out
+
+
+def _dumps(obj) -> str:
+    # json.dumps 走 C 编码器（json.dump 写文件对象时逐块用纯 Python 编码，慢数倍）
+    return json.dumps(obj, separators=(",", ":"))
+
+
+# ---- 数据 ----
+def load_results(results_dir: str) -> Dict[str, Any]:
+    """读取回测输出目录：equity（Series）、trades（DataFrame，可能为空）、metrics（dict）。"""
+    eq = pd.read_csv(os.path.join(results_dir, "equity_curve.csv"), index_col=0)["equity"]
+    trades_csv = os.path.join(results_dir, "trades.csv")
+    trades = pd.read_csv(trades_csv) if os.path.exists(trades_csv) else pd.DataFrame(
+        columns=["date", "symbol", "reason", "size", "price"])
+    metrics_json = os.path.join(results_dir, "metrics.json")
+    metrics = json.load(open(metrics_json)) if os.path.exists(metrics_json) else {}
+    return {"equity": eq, "trades": trades, "metrics": metrics}
+
+
+def _from_result(res: Dict[str, Any]) -> Dict[str, Any]:
+    """内存中的回测结果 -> 与 :func:`load_results` 同形（trades 为 TradeLedger / list[dict] 时转成 DataFrame）。"""
+    trades = res["trades"]
+    if hasattr(trades, "to_frame"):
+        trades = trades.to_frame()
+    elif not isinstance(trades, pd.DataFrame):
+        trades = pd.DataFrame(list(trades), columns=["date", "symbol", "reason", "size", "price"])
+    return {"equity": res["equity"], "trades": trades, "metrics": res["metrics"]}
+
+
+def symbol_pnl(trades: pd.DataFrame, bars: Optional[pd.DataFrame] = None) -> Dict[str, np.ndarray]:
+    """单个标的的 x / price / position / pnl（现金流 + 持仓×标记价）。trades 需含 ns/size/price。"""
+    t_ns = trades["ns"].to_numpy(dtype=np.int64)
+    size = trades["size"].to_numpy(dtype=np.float64)
+    price = trades["price"].to_numpy(dtype=np.float64)
+    pos = np.cumsum(size)
+    cash = -np.cumsum(size * price)
+    if bars is None or not len(bars):
+        return {"x": t_ns, "price": price, "position": pos, "pnl": cash + pos * price}
+    x = _local_ns(bars["date"])
+    close = bars["close"].to_numpy(dtype=np.float64)
+    k = np.searchsorted(t_ns, x, "right") - 1
+    held = k >= 0
+    pos_t = np.where(held, pos[np.maximum(k, 0)], 0.0)
+    cash_t = np.where(held, cash[np.maximum(k, 0)], 0.0)
+    return {"x": x, "price": close, "position": pos_t, "pnl": cash_t + pos_t * close}
+
+
+def _safe_name(symbol: str) -> str:
+    return re.sub(r"[^\w.-]", "_", symbol) or "_"
+
+
+def _render_symbol(sym: str, trades: pd.DataFrame, bars: Optional[pd.DataFrame], charts_dir: str,
+                   max_points: int) -> Dict[str, Any]:
+    s = symbol_pnl(trades, bars)
+    dd = drawdown(s["pnl"], pct=False)
+    keep = downsample(s["pnl"], max_points)
+    x = s["x"][keep]
+    markers = [(g["ns"].to_numpy(), g["price"].to_numpy(), reason) for reason, g in trades.groupby("reason")]
+    panels = [{"name": "price", "lines": {"price": s["price"][keep]}, "markers": markers},
+              {"name": "P&L", "lines": {"pnl": s["pnl"][keep]}},
+              {"name": "P&L drawdown", "lines": {"drawdown": dd[keep]}}]
+    name = _safe_name(sym)
+    with open(os.path.join(charts_dir, name + ".svg"), "w") as f:
+        f.write(svg_chart(x, panels, title=sym))
+    with open(os.path.join(charts_dir, name + ".json"), "w") as f:
+        f.write(_dumps(_series_json(x, {"price": s["price"][keep], "pnl": s["pnl"][keep], "drawdown": dd[keep],
+                                        "position": s["position"][keep]}, trades, symbol=sym)))
+    return {"symbol": sym, "chart": f"charts/{name}.svg", "trades": int(len(trades)),
+            "pnl": float(s["pnl"][-1]) if len(s["pnl"]) else 0.0,
+            "max_drawdown": float(dd.min()) if len(dd) else 0.0,
+            "position": float(s["position"][-1]) if len(s["position"]) else 0.0}
+
+
+def _render_shard(items: List[tuple], charts_dir: str, max_points: int) -> List[Dict[str, Any]]:
+    """一组标的的图表（进程池中执行）。"""
+    return [_render_symbol(sym, trades, bars, charts_dir, max_points) for sym, trades, bars in items]
+
+
+def _html(metrics: Dict[str, Any], portfolio_svg: str, rows: List[Dict[str, Any]]) -> str:
+    mrows = "".join(f"<tr><td>{escape(str(k))}</td><td>{escape(str(v))}</td></tr>" for k, v in metrics.items())
+    srows = "".join(
+        f'<tr><td>{escape(r["symbol"])}</td><td>{r["trades"]}</td><td>{_fmt(r["pnl"])}</td>'
+        f'<td>{_fmt(r["max_drawdown"])}</td><td>{_fmt(r["position"])}</td>'
+        f'<td><details><summary>chart</summary><img loading="lazy" src="{escape(r["chart"])}"/></details></td></tr>'
+        for r in rows)
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Portfolio Backtest Report</title>
+<style>body{{font-family:sans-serif;margin:24px}}table{{border-collapse:collapse}}
+td,th{{border:1px solid #ddd;padding:3px 8px;text-align:right}}td:first-child{{text-align:left}}</style>
+</head><body>
+<h1>Portfolio Backtest Report</h1>
+<table>{mrows}</table>
+{portfolio_svg}
+<h2>Symbols ({len(rows)})</h2>
+<table><tr><th>symbol</th><th>trades</th><th>P&amp;L</th><th>max drawdown</th><th>position</th><th></th></tr>
+{srows}</table>
+</body></html>
+"""
+
+
+def render_report(results_dir: str, out_dir: Optional[str] = None, prices: Optional[Dict[str, pd.DataFrame]] = None,
+                  symbols: Optional[Sequence[str]] = None, workers: int = 0, max_points: int = 2000,
+                  res: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """从结果目录生成报告：report.html、report.json（逐标的汇总）、charts/（组合与逐标的的 SVG + JSON）。
+
+    prices：标的 -> K线（逐日标记盈亏），缺省只用成交价；symbols：只画这些标的（默认有成交的全部标的）；
+    workers>1 时逐标的图表在进程池中分片渲染；res：内存中的回测结果（run_portfolio_backtest 的返回值），
+    给定且带 trades 时直接用它，不再读 results_dir。返回 {"portfolio": 组合图路径, "symbols": 逐标的汇总}。
+    """
+    # 流式回测写了 out_dir 时返回的 trades 为 None，仍从目录读
+    res = _from_result(res) if res is not None and res.get("trades") is not None else load_results(results_dir)
+    out_dir = out_dir or results_dir
+    charts_dir = os.path.join(out_dir, "charts")
+    os.makedirs(charts_dir, exist_ok=True)
+
+    eq = res["equity"]
+    x = _local_ns(eq.index)
+    y = eq.to_numpy(dtype=np.float64)
+    dd = drawdown(y)
+    keep = downsample(dd, max_points)  # 按回撤取极值，权益的高低点也在其中
+    keep = np.union1d(keep, downsample(y, max_points))
+    panels = [{"name": "equity", "lines": {"equity": y[keep]}},
+              {"name": "drawdown", "lines": {"drawdown": dd[keep]}, "pct": True}]
+    portfolio_svg = svg_chart(x[keep], panels, title="Portfolio Equity")
+    with open(os.path.join(charts_dir, "portfolio.svg"), "w") as f:
+        f.write(portfolio_svg)
+    with open(os.path.join(charts_dir, "portfolio.json"), "w") as f:
+        f.write(_dumps(_series_json(x[keep], {"equity": y[keep], "drawdown": dd[keep]})))
+
+    trades = res["trades"]
+    trades = trades.assign(ns=_local_ns(trades["date"]) if len(trades) else np.empty(0, dtype=np.int64))
+    trades["symbol"] = trades["symbol"].astype(str)
+    by_symbol = {sym: g.sort_values("ns", kind="stable") for sym, g in trades.groupby("symbol", sort=False)}
+    names = list(symbols) if symbols is not None else list(by_symbol)
+    prices = prices or {}
+    items = [(sym, by_symbol.get(sym, trades.iloc[:0]), prices.get(sym)) for sym in names]
+    if workers > 1 and len(items) > 1:
+        shards = [items[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            done = {r["symbol"]: r for part in ex.map(_render_shard, shards, [charts_dir] * workers,
+                                                      [max_points] * workers) for r in part}
+        rows = [done[sym] for sym in names]
+    else:
+        rows = _render_shard(items, charts_dir, max_points)
+
+    rows.sort(key=lambda r: r["pnl"], reverse=True)
+    with open(os.path.join(out_dir, "report.json"), "w") as f:
+        json.dump({"metrics": res["metrics"], "trade_stats": trade_metrics(trades), "symbols": rows}, f, indent=2)
     with open(os.path.join(out_dir, "report.html"), "w") as f:
-        f.write(html)
+        f.write(_html(res["metrics"], portfolio_svg, rows))
+    return {"portfolio": os.path.join(charts_dir, "portfolio.svg"), "symbols": rows}
+
+
+def save_html_report(res: dict, out_dir: str, workers: int = 0):
+    """回测结束后用返回的结果 res 在 out_dir 生成报告（不依赖 equity_curve.png）。"""
+    return render_report(out_dir, workers=workers, res=res)
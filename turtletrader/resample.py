@@ -0,0 +1,324 @@
+"""多周期K线聚合：只拉取最细的一档（如 1m），按交易时段合成 5m/15m/60m/4h/1d 等更粗周期。
+
+- 时段感知：按交易所的连续竞价时段（如 A 股 09:30–11:30、13:00–15:00）计"交易分钟"，
+  桶从开盘起按交易分钟切分，不跨午休、不跨交易日；时段外（盘前盘后）的K线不计入；
+- 批量：:func:`resample_bars` 对整段历史向量化聚合；
+- 实时：:class:`BarAggregator` 每进一根细K线，对每个周期 O(1) 更新当前桶；
+  同一时间戳的K线再次到来（未收盘K线被刷新）时替换上一根，而不是重复累加；
+- :class:`ResampledSource` 包装任意 DataSource：同一标的只拉一份细周期K线，多个周期共用。
+
+聚合后的K线以桶的起始时间标记（与 yfinance 一致），open/close 取首尾、high/low 取极值、volume 求和。
+"""
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+import re
+import time
+import numpy as np
+import pandas as pd
+from .data_sources import DataSource, _bars
+from .streaming import _fmax
+
+# 交易所 -> (时区, 连续竞价时段)
+SESSIONS: Dict[str, Tuple[str, Tuple[Tuple[str, str], ...]]] = {
+    "NYSE": ("America/New_York", (("09:30", "16:00"),)),
+    "NASDAQ": ("America/New_York", (("09:30", "16:00"),)),
+    "SSE": ("Asia/Shanghai", (("09:30", "11:30"), ("13:00", "15:00"))),
+    "SZSE": ("Asia/Shanghai", (("09:30", "11:30"), ("13:00", "15:00"))),
+    "HKEX": ("Asia/Hong_Kong", (("09:30", "12:00"), ("13:00", "16:00"))),
+}
+
+
+# K线时区 -> 交易所（推断聚合时段用）
+TZ_MARKETS = {"Asia/Shanghai": "SSE", "Asia/Hong_Kong": "HKEX", "America/New_York": "NYSE"}
+
+
+def instrument_market(ins, dates=None) -> Optional[str]:
+    """标的所在交易所：配置的 market > K线时区 > T+1 规则（A 股）> 单一市场的数据源；推不出时为 None（整天计）。"""
+    from .cal import GLOBAL_SOURCES, SOURCE_MARKETS
+    if getattr(ins, "market", None):
+        return ins.market.upper()
+    if dates is not None and len(dates):
+        tz = pd.DatetimeIndex(pd.to_datetime(pd.Series(dates).iloc[:1])).tz
+        if tz is not None and str(tz) in TZ_MARKETS:
+            return TZ_MARKETS[str(tz)]
+    if ins.rules.t_plus_one:
+        return "SSE"
+    source = (ins.source or "").lower()
+    if source in SOURCE_MARKETS and source not in GLOBAL_SOURCES:
+        return SOURCE_MARKETS[source]
+    return None
+
+
+def interval_minutes(interval: str) -> Optional[int]:
+    """"15m" / "60min" / "4h" -> 分钟数；"1d" -> None（整个交易日一根）。"""
+    m = re.fullmatch(r"(\d+)\s*(m|min|h|d)", interval.strip().lower())
+    if not m:
+        raise ValueError(f"unsupported interval {interval!r}; use e.g. 1m, 15m, 60m, 4h, 1d")
+    n, unit = int(m.group(1)), m.group(2)
+    if unit == "d":
+        if n != 1:
+            raise ValueError(f"unsupported interval {interval!r}; only 1d is supported for days")
+        return None
+    return n * 60 if unit == "h" else n
+
+
+def _clock(s: str) -> int:
+    h, m = s.split(":")
+    return int(h) * 60 + int(m)
+
+
+class Session:
+    """一个交易所的日内时段：把本地时间换算成"当日第几个交易分钟"。"""
+
+    def __init__(self, tz: Optional[str], segments: Sequence[Tuple[str, str]] = (("00:00", "24:00"),)):
+        self.tz = tz
+        self.starts = np.array([_clock(a) for a, _ in segments], dtype=np.float64)
+        self.ends = np.array([_clock(b) for _, b in segments], dtype=np.float64)
+        lengths = self.ends - self.starts
+        self.before = np.concatenate([[0.0], np.cumsum(lengths)[:-1]])  # 各时段之前的交易分钟数
+        self.length = float(lengths.sum())
+
+    @classmethod
+    def for_market(cls, market: Optional[str]) -> "Session":
+        """已知交易所用其时段；未知时整天（K线自身时区）都算交易时间。"""
+        if market in SESSIONS:
+            tz, segments = SESSIONS[market]
+            return cls(tz, segments)
+        return cls(None)
+
+    def _local(self, dates: pd.DatetimeIndex) -> pd.DatetimeIndex:
+        if self.tz is None:
+            return dates
+        return dates.tz_localize(self.tz) if dates.tz is None else dates.tz_convert(self.tz)
+
+    def offsets(self, dates: pd.DatetimeIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """(本地日期的午夜 ns, 当日交易分钟偏移)；时段外为 NaN。"""
+        local = self._local(dates)
+        naive = (local.tz_localize(None) if local.tz is not None else local).as_unit("ns")
+        day = naive.normalize()
+        minute = (naive.asi8 - day.asi8) / 60e9
+        offset = np.full(len(minute), np.nan)
+        for s, e, b in zip(self.starts, self.ends, self.before):
+            inside = (minute >= s) & (minute < e)
+            offset[inside] = b + minute[inside] - s
+        return day.asi8, offset
+
+    def offset_of(self, ts: pd.Timestamp) -> Tuple[int, float]:
+        """单根K线的 (本地日期 ns, 交易分钟偏移)，O(时段数)。"""
+        if self.tz is not None:
+            ts = ts.tz_localize(self.tz) if ts.tz is None else ts.tz_convert(self.tz)
+        if ts.tz is not None:
+            ts = ts.tz_localize(None)
+        day = ts.normalize()
+        minute = (ts.value - day.value) / 60e9
+        for s, e, b in zip(self.starts.tolist(), self.ends.tolist(), self.before.tolist()):
+            if s <= minute < e:
+                return day.value, b + minute - s
+        return day.value, float("nan")
+
+    def clock_of(self, offset: np.ndarray) -> np.ndarray:
+        """交易分钟偏移 -> 当日本地时钟分钟（桶起点落在哪个时段里）。"""
+        k = np.searchsorted(self.before, offset, "right") - 1
+        return self.starts[k] + offset - self.before[k]
+
+    def label(self, day_ns: np.ndarray, offset: Optional[np.ndarray], tz) -> pd.DatetimeIndex:
+        """桶起点的时间戳，时区与输入K线一致（输入无时区时为交易所本地时间）；offset 为 None 时是日线（当日午夜）。"""
+        ns = np.asarray(day_ns, dtype=np.int64)
+        if offset is not None:
+            ns = ns + np.round(self.clock_of(offset) * 60e9).astype(np.int64)
+        idx = pd.DatetimeIndex(ns.astype("datetime64[ns]"))
+        if self.tz is not None and tz is not None:
+            return idx.tz_localize(self.tz).tz_convert(tz)
+        return idx.tz_localize(tz) if tz is not None else idx
+
+
+def _bucket_offset(offset, minutes: Optional[int]):
+    """桶起点的交易分钟偏移；日线为 0。"""
+    if minutes is None:
+        return offset * 0.0
+    return (offset // minutes) * minutes
+
+
+def resample_bars(df: pd.DataFrame, interval: str, market: Optional[str] = None,
+                  session: Optional[Session] = None) -> pd.DataFrame:
+    """把细周期K线聚合成 interval（批量、向量化）。df 需按时间升序，含 date/open/high/low/close[/volume]。"""
+    session = session or Session.for_market(market)
+    minutes = interval_minutes(interval)
+    df = _bars(df)
+    cols = [c for c in ("open", "high", "low", "close", "volume") if c in df.columns]
+    if df.empty:
+        return df[["date"] + cols]
+    dates = pd.DatetimeIndex(df["date"])
+    day, offset = session.offsets(dates)
+    keep = ~np.isnan(offset)
+    day, offset = day[keep], offset[keep]
+    bucket = _bucket_offset(offset, minutes)
+    values = {c: df[c].to_numpy(dtype=np.float64)[keep] for c in cols}
+    if not len(day):
+        raise ValueError(f"all {len(dates)} bars fall outside the trading session (tz {session.tz}); "
+                         "set the instrument's market to match the data")
+    # 输入按时间升序：桶键变化处即新桶的第一根
+    change = np.ones(len(day), dtype=bool)
+    change[1:] = (day[1:] != day[:-1]) | (bucket[1:] != bucket[:-1])
+    first = np.flatnonzero(change)
+    last = np.append(first[1:], len(day)) - 1
+    out = {"date": session.label(day[first], None if minutes is None else bucket[first], dates.tz)}
+    if "open" in values:
+        out["open"] = values["open"][first]
+    if "high" in values:
+        out["high"] = np.fmax.reduceat(values["high"], first)
+    if "low" in values:
+        out["low"] = np.fmin.reduceat(values["low"], first)
+    if "close" in values:
+        out["close"] = values["close"][last]
+    if "volume" in values:
+        out["volume"] = np.add.reduceat(np.nan_to_num(values["volume"]), first)
+    return pd.DataFrame(out)[["date"] + cols].reset_index(drop=True)
+
+
+def _fmin(a: float, b: float) -> float:
+    return -_fmax(-a, -b)
+
+
+def _merge(agg: Optional[list], bar: list) -> list:
+    """[open, high, low, close, volume] 合并：agg 在前、bar 在后；与批量版一样 high/low 忽略 NaN。"""
+    if agg is None:
+        return list(bar)
+    return [agg[0], _fmax(agg[1], bar[1]), _fmin(agg[2], bar[2]), bar[3], agg[4] + bar[4]]
+
+
+class _Bucket:
+    """一个周期的当前桶：已确定部分 + 最近一根（可能被同一时间戳的新数据替换）。"""
+    __slots__ = ("minutes", "key", "settled", "last", "last_ts")
+
+    def __init__(self, minutes: Optional[int]):
+        self.minutes = minutes
+        self.key: Optional[Tuple[int, float]] = None
+        self.settled: Optional[list] = None
+        self.last: Optional[list] = None
+        self.last_ts: Optional[int] = None
+
+    def value(self) -> Optional[list]:
+        return _merge(self.settled, self.last) if self.last is not None else self.settled
+
+
+class BarAggregator:
+    """实时多周期聚合：``push`` 一根细K线，返回因此收盘的各周期K线。
+
+    每根细K线对每个周期只做常数次比较与合并；``partial(interval)`` 给出当前未收盘的桶。
+    细K线需按时间非降序到达；与上一根时间戳相同视为刷新（替换），更早的K线被忽略。
+    """
+
+    def __init__(self, intervals: Iterable[str], market: Optional[str] = None, session: Optional[Session] = None):
+        self.session = session or Session.for_market(market)
+        self.buckets: Dict[str, _Bucket] = {iv: _Bucket(interval_minutes(iv)) for iv in intervals}
+        self.tz: Any = None
+        self.last_ts: Optional[int] = None
+
+    def _bar(self, b: _Bucket) -> Dict[str, Any]:
+        offset = None if b.minutes is None else np.array([b.key[1]])
+        date = self.session.label(np.array([b.key[0]]), offset, self.tz)[0]
+        value = b.value()
+        return {"date": date, "open": value[0], "high": value[1], "low": value[2], "close": value[3],
+                "volume": value[4]}
+
+    def push(self, bar: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        ts = pd.Timestamp(bar["date"])
+        if self.last_ts is not None and ts.value < self.last_ts:
+            return {}
+        self.tz = ts.tz
+        revision = ts.value == self.last_ts
+        self.last_ts = ts.value
+        day, offset = self.session.offset_of(ts)
+        if offset != offset:
+            return {}  # 时段外
+        vol = bar.get("volume", 0.0)
+        value = [float(bar["open"]), float(bar["high"]), float(bar["low"]), float(bar["close"]),
+                 0.0 if vol is None or vol != vol else float(vol)]
+        closed = {}
+        for iv, b in self.buckets.items():
+            key = (day, float(_bucket_offset(offset, b.minutes)))
+            if b.key != key:
+                if b.key is not None:
+                    closed[iv] = self._bar(b)
+                b.key, b.settled, b.last = key, None, value
+            elif revision and b.last_ts == ts.value:
+                b.last = value
+            else:
+                b.settled = b.value()
+                b.last = value
+            b.last_ts = ts.value
+        return closed
+
+    def partial(self, interval: str) -> Optional[Dict[str, Any]]:
+        b = self.buckets[interval]
+        return None if b.key is None else self._bar(b)
+
+
+class ResampledSource(DataSource):
+    """细周期数据源 -> 任意更粗周期。
+
+    ``get_history``：拉 base_interval 的历史再批量聚合；``recent_bars``：每个标的一条细K线流，
+    首次按需回补，之后每轮只取上次最后一根之后的增量，逐根喂给 :class:`BarAggregator`，
+    各周期的已收盘K线存在有界缓冲里，最后附上当前未收盘的桶。同一标的的多个周期共用一次拉取
+    （min_refetch 秒内的重复请求不再访问数据源）。
+    """
+
+    def __init__(self, source: DataSource, base_interval: str = "1m", market: Optional[str] = None,
+                 capacity: int = 2000, min_refetch: float = 1.0):
+        self.source = source
+        self.base_interval = base_interval
+        self.base_minutes = interval_minutes(base_interval) or 24 * 60
+        self.session = Session.for_market(market)
+        self.capacity = capacity
+        self.min_refetch = min_refetch
+        self._feeds: Dict[str, Dict[str, Any]] = {}
+
+    def get_history(self, symbol: str, start: Optional[str], end: Optional[str], interval: str) -> pd.DataFrame:
+        df = self.source.get_history(symbol, start, end, self.base_interval)
+        if interval == self.base_interval:
+            return df
+        return resample_bars(df, interval, session=self.session)
+
+    def _base_per_bar(self, interval: str) -> int:
+        minutes = interval_minutes(interval)
+        per = (minutes or self.session.length) / self.base_minutes
+        return max(int(np.ceil(per)), 1)
+
+    def _feed(self, symbol: str, n: int, interval: str) -> Dict[str, Any]:
+        feed = self._feeds.get(symbol)
+        if feed is None or interval not in feed["agg"].buckets or feed["n"].get(interval, 0) < n:
+            # 新标的或新周期：按最大需求回补细K线，重建聚合状态
+            need = dict(feed["n"]) if feed else {}
+            need[interval] = max(need.get(interval, 0), n)
+            agg = BarAggregator(list(need), session=self.session)
+            feed = self._feeds[symbol] = {"agg": agg, "n": need, "fetched": 0.0,
+                                          "bars": {iv: [] for iv in need}}
+            m = max((k + 1) * self._base_per_bar(iv) for iv, k in need.items())
+            self._consume(feed, _bars(self.source.recent_bars(symbol, m, self.base_interval)))
+            feed["fetched"] = time.time()
+        elif time.time() - feed["fetched"] >= self.min_refetch:
+            last = feed["agg"].last_ts
+            since = pd.Timestamp(last, tz="UTC").tz_convert(feed["agg"].tz) if feed["agg"].tz else pd.Timestamp(last)
+            self._consume(feed, _bars(self.source.get_history(symbol, since, None, self.base_interval)))
+            feed["fetched"] = time.time()
+        return feed
+
+    def _consume(self, feed: Dict[str, Any], df: pd.DataFrame):
+        agg, bars = feed["agg"], feed["bars"]
+        cap = max([self.capacity] + list(feed["n"].values()))
+        for rec in df.to_dict("records"):
+            for iv, bar in agg.push(rec).items():
+                buf = bars[iv]
+                buf.append(bar)
+                if len(buf) > 2 * cap:
+                    del buf[:-cap]
+
+    def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
+        if interval == self.base_interval:
+            return self.source.recent_bars(symbol, n, interval)
+        feed = self._feed(symbol, n, interval)
+        rows = feed["bars"][interval][-n:]
+        partial = feed["agg"].partial(interval)
+        if partial is not None:
+            rows = rows[-(n - 1):] + [partial] if n > 1 else [partial]
+        return pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
@@ -0,0 +1,212 @@
+"""组合回测结果缓存：按内容寻址，输入不变的回测直接取上次结果，不再重跑。
+
+键 = blake2b(库版本 + 配置 + 各标的行情内容指纹 + 回测区间)：
+
+- 配置取校验后的 PortfolioConfig（YAML 经 PortfolioSchema 校验再转 dataclass），字段有任何变化即换键；
+- 行情按标的逐列（date/OHLCV）哈希，某个标的多了一根K线或改了一个价格都会换键；
+- 版本号变化（逻辑可能已变）使旧条目自然失效。
+
+每个条目是一个目录：``result.pkl``（metrics / equity / trades / positions）加上回测输出目录里的文件
+（equity_curve.csv、trades.csv、metrics.json、equity_curve.png），命中时原样复制到 out_dir。
+条目整体写好后原子改名，多个进程同时跑同一份配置也不会读到半截的条目。
+
+容量按字节计，超出后按最近使用时间（命中时刷新）淘汰最旧的条目。
+
+环境变量：``TURTLE_RESULT_CACHE_DIR``（默认 ``~/.cache/turtletrader/results``）、
+``TURTLE_RESULT_CACHE_MB``（容量上限，默认 2048）。
+"""
+from __future__ import annotations
+from dataclasses import asdict
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from .config import PortfolioConfig
+from .store import COLUMNS, _to_ns
+
+RESULT_FILE = "result.pkl"
+OUTPUT_FILES = ("equity_curve.csv", "trades.csv", "metrics.json", "equity_curve.png")
+
+
+def default_dir() -> str:
+    return os.getenv("TURTLE_RESULT_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "turtletrader", "results")
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """单个标的行情的内容指纹（date + OHLCV，列名不分大小写，含长度）。"""
+    cols = {c.lower(): c for c in df.columns}
+    h = hashlib.blake2b(digest_size=16)
+    ns, tz = _to_ns(df[cols.get("date", "date")])
+    names = [c for c in COLUMNS[1:] if c in cols]
+    h.update(f"{len(df)}|{tz}|{','.join(names)}".encode())
+    h.update(np.ascontiguousarray(ns).view(np.uint8))
+    for c in names:
+        h.update(np.ascontiguousarray(df[cols[c]].to_numpy(dtype=np.float64)).view(np.uint8))
+    return h.hexdigest()
+
+
+def result_key(cfg: PortfolioConfig, data_map: Dict[str, pd.DataFrame], start=None, end=None) -> str:
+    from . import __version__
+    payload = {
+        "version": __version__,
+        "config": asdict(cfg),
+        "data": [[sym, data_fingerprint(df)] for sym, df in data_map.items()],  # 保留标的顺序
+        "window": [None if start is None else str(pd.Timestamp(start)), None if end is None else str(pd.Timestamp(end))],
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+class ResultCache:
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or default_dir()
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("TURTLE_RESULT_CACHE_MB", "2048")) * 2**20)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _entries(self):
+        """[(路径, 最近使用时间, 字节数)]。"""
+        out = []
+        for shard in os.listdir(self.root):
+            d = os.path.join(self.root, shard)
+            if not os.path.isdir(d):
+                continue
+            for name in os.listdir(d):
+                path = os.path.join(d, name)
+                res = os.path.join(path, RESULT_FILE)
+                if ".tmp" in name or not os.path.exists(res):
+                    continue
+                try:
+                    out.append((path, os.path.getmtime(res), _dir_size(path)))
+                except FileNotFoundError:  # 其他进程刚淘汰
+                    continue
+        return out
+
+    # ---- 命中计数（跨运行累计，写在 counters.json） ----
+    def _count(self, field: str, n: int = 1):
+        path = os.path.join(self.root, "counters.json")
+        try:
+            with open(path) as f:
+                counters = json.load(f)
+        except (OSError, ValueError):
+            counters = {}
+        counters[field] = counters.get(field, 0) + n
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(counters, f)
+        os.replace(tmp, path)
+
+    def _counters(self) -> Dict[str, int]:
+        try:
+            with open(os.path.join(self.root, "counters.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str, out_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """命中返回回测结果（并把输出文件复制到 out_dir），否则 None。"""
+        path = self._path(key)
+        try:
+            res = pd.read_pickle(os.path.join(path, RESULT_FILE))
+            os.utime(os.path.join(path, RESULT_FILE))
+        except (OSError, EOFError, ValueError, ImportError, AttributeError):
+            self._count("misses")
+            return None
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            for name in OUTPUT_FILES:
+                src = os.path.join(path, name)
+                if os.path.exists(src):
+                    shutil.copyfile(src, os.path.join(out_dir, name))
+        self._count("hits")
+        return res
+
+    def put(self, key: str, res: Dict[str, Any], out_dir: Optional[str] = None):
+        """写入条目（连同 out_dir 下的输出文件），再按容量淘汰。"""
+        path = self._path(key)
+        tmp = f"{path}.tmp{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        pd.to_pickle({k: res[k] for k in ("metrics", "equity", "trades", "positions") if k in res},
+                     os.path.join(tmp, RESULT_FILE))
+        if out_dir:
+            for name in OUTPUT_FILES:
+                src = os.path.join(out_dir, name)
+                if os.path.exists(src):
+                    shutil.copyfile(src, os.path.join(tmp, name))
+        try:
+            os.rename(tmp, path)
+        except OSError:  # 其他进程已写入同一个键
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """按最近使用时间淘汰，直到总大小不超过 max_bytes；返回淘汰条数。"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(e[2] for e in entries)
+        n = 0
+        for path, _, size in entries:
+            if total <= limit:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            n += 1
+        if n:
+            self._count("evictions", n)
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        counters = self._counters()
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "dir": self.root,
+            "entries": len(entries),
+            "bytes": sum(e[2] for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": counters.get("hits", 0) / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        for name in os.listdir(self.root):
+            p = os.path.join(self.root, name)
+            if os.path.isdir(p):
+                shutil.rmtree(p, ignore_errors=True)
+            else:
+                os.remove(p)
+
+
+def cached_portfolio_backtest(data_map: Dict[str, pd.DataFrame], cfg: PortfolioConfig, out_dir: Optional[str] = None,
+                              cache: Optional[ResultCache] = None, start=None, end=None, workers: int = 0,
+                              plot: bool = True) -> Dict[str, Any]:
+    """同 :func:`turtletrader.portfolio_backtest.run_portfolio_backtest`，输入不变时直接取缓存。
+
+    返回结果多一个 ``cache`` 字段：``"hit"`` / ``"miss"``；cache 为 None 时不读写缓存（``"off"``）。
+    """
+    from .portfolio_backtest import run_portfolio_backtest, save_summary
+    if cache is None:
+        return dict(run_portfolio_backtest(data_map, cfg, out_dir=out_dir, start=start, end=end, workers=workers,
+                                           plot=plot), cache="off")
+    key = result_key(cfg, data_map, start, end)
+    res = cache.get(key, out_dir)
+    if res is not None:
+        if out_dir and plot and not os.path.exists(os.path.join(out_dir, "equity_curve.png")):
+            save_summary(res["equity"], res["metrics"], out_dir, plot)
+        return dict(res, cache="hit")
+    res = run_portfolio_backtest(data_map, cfg, out_dir=out_dir, start=start, end=end, workers=workers, plot=plot)
+    cache.put(key, res, out_dir)
+    return dict(res, cache="miss")
@@ -0,0 +1,149 @@
+"""稳健性检验：基于回测的 equity / trades 一次生成 N 个重采样情景，向量化算出 CAGR / Sharpe / 最大回撤的分布。
+
+情景（均为 (情景数, 时间) 的二维数组，共用原净值的日期轴）：
+
+- ``bootstrap``：日收益率的循环块自助抽样（保留 block 天内的自相关）；
+- ``reshuffle``：已平仓交易的收益率随机重排后，依次落在原平仓日期上；
+- ``skip``：每笔交易以概率 skip_prob 被跳过（模拟漏单 / 随机放弃进场）。
+
+按 chunk_size 分块生成、分块算指标，内存只与块大小有关。
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from .utils import annual_return_2d, max_drawdown_2d, sharpe_2d
+
+METHODS = ("bootstrap", "reshuffle", "skip")
+
+
+def round_trips(trades: Iterable[Dict]) -> pd.DataFrame:
+    """把成交按标的切成往返交易（持仓从 0 到非 0 再回到 0），返回 symbol/entry_date/exit_date/pnl。
+
+    pnl 为该往返内的现金流之和；期末未平的仓位不计入。
+    """
+    pos: Dict[str, int] = {}
+    cash: Dict[str, float] = {}
+    entry: Dict[str, object] = {}
+    out = []
+    for t in trades:
+        sym = t.get("symbol", "")
+        size = int(t["size"])
+        if size == 0:
+            continue
+        if pos.get(sym, 0) == 0:
+            entry[sym] = t["date"]
+            cash[sym] = 0.0
+        cash[sym] -= float(t["price"]) * size
+        pos[sym] = pos.get(sym, 0) + size
+        if pos[sym] == 0:
+            out.append({"symbol": sym, "entry_date": entry[sym], "exit_date": t["date"], "pnl": cash[sym]})
+    return pd.DataFrame(out, columns=["symbol", "entry_date", "exit_date", "pnl"])
+
+
+def trade_returns(equity: pd.Series, trades: Iterable[Dict]) -> pd.DataFrame:
+    """往返交易 + 收益率（pnl / 进场前一日净值）与平仓日在净值轴上的位置。"""
+    rt = round_trips(trades)
+    idx = pd.DatetimeIndex(pd.to_datetime(equity.index))
+    values = equity.to_numpy(dtype=np.float64)
+    if rt.empty:
+        return rt.assign(ret=[], exit_pos=[])
+    entry_pos = np.clip(idx.searchsorted(pd.to_datetime(rt["entry_date"]), "left") - 1, 0, len(idx) - 1)
+    exit_pos = np.clip(idx.searchsorted(pd.to_datetime(rt["exit_date"]), "left"), 0, len(idx) - 1)
+    rt["ret"] = rt["pnl"].to_numpy() / values[entry_pos]
+    rt["exit_pos"] = exit_pos
+    return rt.sort_values("exit_pos", kind="stable").reset_index(drop=True)
+
+
+def _paths(e0: float, rets: np.ndarray) -> np.ndarray:
+    """收益率矩阵 (k, T-1) -> 净值矩阵 (k, T)，首列为 e0。"""
+    out = np.empty((rets.shape[0], rets.shape[1] + 1))
+    out[:, 0] = e0
+    np.cumprod(1.0 + rets, axis=1, out=out[:, 1:])
+    out[:, 1:] *= e0
+    return out
+
+
+def bootstrap_paths(returns: np.ndarray, e0: float, k: int, block: int, rng: np.random.Generator) -> np.ndarray:
+    """循环块自助抽样 k 条净值路径。"""
+    T = len(returns)
+    if T == 0:
+        return np.full((k, 1), e0)
+    block = max(1, min(block, T))
+    nblocks = -(-T // block)
+    starts = rng.integers(0, T, size=(k, nblocks))
+    idx = (starts[:, :, None] + np.arange(block)[None, None, :]).reshape(k, -1)[:, :T] % T
+    return _paths(e0, returns[idx])
+
+
+def trade_paths(tr: pd.DataFrame, T: int, e0: float, k: int, rng: np.random.Generator,
+                shuffle: bool = True, skip_prob: float = 0.0) -> np.ndarray:
+    """交易级情景：收益率（可重排 / 随机跳过）依次落在原平仓位置上，其余日子收益为 0。"""
+    r = tr["ret"].to_numpy(dtype=np.float64)
+    m = len(r)
+    if m == 0 or T < 2:
+        return _paths(e0, np.zeros((k, max(T - 1, 0))))
+    cols = np.clip(tr["exit_pos"].to_numpy() - 1, 0, T - 2)
+    draws = np.broadcast_to(r, (k, m))
+    if shuffle:
+        draws = np.take_along_axis(draws, np.argsort(rng.random((k, m)), axis=1), axis=1)
+    if skip_prob > 0:
+        draws = np.where(rng.random((k, m)) < skip_prob, 0.0, draws)
+    # 同一天平仓的多笔交易复利合并
+    growth = np.ones((k, T - 1))
+    np.multiply.at(growth, (np.arange(k)[:, None], np.broadcast_to(cols, (k, m))), 1.0 + draws)
+    return _paths(e0, growth - 1.0)
+
+
+def scenario_metrics(paths: np.ndarray, index: pd.DatetimeIndex) -> pd.DataFrame:
+    rets = paths[:, 1:] / paths[:, :-1] - 1.0 if paths.shape[1] > 1 else np.empty((len(paths), 0))
+    return pd.DataFrame({
+        "cagr": annual_return_2d(paths, index),
+        "sharpe": sharpe_2d(rets),
+        "max_drawdown": max_drawdown_2d(paths),
+        "end_equity": paths[:, -1],
+    })
+
+
+def run_robustness(equity: pd.Series, trades: Optional[Sequence[Dict]] = None, n: int = 1000,
+                   methods: Sequence[str] = METHODS, block: int = 20, skip_prob: float = 0.1,
+                   chunk_size: int = 1000, seed: Optional[int] = None) -> pd.DataFrame:
+    """每种方法 n 个情景，返回逐情景指标表（method 列区分方法）。没有 trades 时只做 bootstrap。"""
+    equity = equity.dropna()
+    index = pd.DatetimeIndex(pd.to_datetime(equity.index))
+    values = equity.to_numpy(dtype=np.float64)
+    e0 = float(values[0]) if len(values) else 0.0
+    daily = values[1:] / values[:-1] - 1.0 if len(values) > 1 else np.empty(0)
+    tr = trade_returns(equity, trades) if trades is not None else None
+    rng = np.random.default_rng(seed)
+    parts: List[pd.DataFrame] = []
+    for method in methods:
+        if method not in METHODS:
+            raise ValueError(f"unknown method {method}; choose from {METHODS}")
+        if method != "bootstrap" and tr is None:
+            continue
+        for lo in range(0, n, chunk_size):
+            k = min(chunk_size, n - lo)
+            if method == "bootstrap":
+                paths = bootstrap_paths(daily, e0, k, block, rng)
+            elif method == "reshuffle":
+                paths = trade_paths(tr, len(values), e0, k, rng, shuffle=True)
+            else:
+                paths = trade_paths(tr, len(values), e0, k, rng, shuffle=False, skip_prob=skip_prob)
+            parts.append(scenario_metrics(paths, index).assign(method=method))
+    if not parts:
+        return pd.DataFrame(columns=["cagr", "sharpe", "max_drawdown", "end_equity", "method"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def summarize(metrics: pd.DataFrame, quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> pd.DataFrame:
+    """按方法汇总各指标的分位数与均值（行：method × metric）。"""
+    rows = []
+    for method, g in metrics.groupby("method", sort=False):
+        for col in ("cagr", "sharpe", "max_drawdown", "end_equity"):
+            v = g[col].to_numpy(dtype=np.float64)
+            row = {"method": method, "metric": col}
+            row.update({f"p{int(round(q * 100))}": float(np.nanquantile(v, q)) for q in quantiles})
+            row["mean"] = float(np.nanmean(v))
+            rows.append(row)
+    return pd.DataFrame(rows).set_index(["method", "metric"])
@@ -20,6 +20,8 @@ class InstrumentSchema(BaseModel):
     start: Optional[str] = None
     end: Optional[str] = None
     interval: str = "1d"
+    base_interval: Optional[str] = None
+    market: Optional[str] = None
     dollar_per_point: float = 1.0
     rules: RuleSchema = RuleSchema()
 
@@ -0,0 +1,217 @@
+"""本地列式行情库：包装任意 DataSource，按 (interval, symbol) 落盘并增量追加。
+
+目录结构::
+
+    <root>/<interval>/<symbol>/meta.json
+    <root>/<interval>/<symbol>/v000003/{date,open,high,low,close,volume}.npy
+
+每列一个 ``.npy``（date 为 UTC 纳秒 int64），读取时内存映射后按日期二分切片。
+更新时写入新版本目录，再原子替换 ``meta.json`` 指向它，中途崩溃不会留下半截数据。
+日期区间语义与 yfinance 一致：``[start, end)``。
+"""
+from __future__ import annotations
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+from .data_sources import DataSource
+from .utils import unify_ohlcv
+
+COLUMNS = ("date", "open", "high", "low", "close", "volume")
+
+
+def _to_ns(dates: pd.Series) -> tuple:
+    """日期列 -> (UTC 纳秒 int64, 时区名或 None)。"""
+    idx = pd.DatetimeIndex(dates if pd.api.types.is_datetime64_any_dtype(dates) else pd.to_datetime(dates))
+    tz = str(idx.tz) if idx.tz is not None else None
+    if tz is not None:
+        idx = idx.tz_convert("UTC").tz_localize(None)
+    return idx.as_unit("ns").asi8, tz
+
+
+def _from_ns(values: np.ndarray, tz: Optional[str]) -> pd.DatetimeIndex:
+    idx = pd.DatetimeIndex(np.asarray(values, dtype="datetime64[ns]"))
+    return idx.tz_localize("UTC").tz_convert(tz) if tz else idx
+
+
+def _bound_ns(x: Any, tz: Optional[str]) -> Optional[int]:
+    if x is None:
+        return None
+    ts = pd.Timestamp(x)
+    if tz and ts.tz is None:
+        ts = ts.tz_localize(tz)
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.as_unit("ns").value)
+
+
+class MarketStore(DataSource):
+    """本地行情库。``source`` 为空时只读本地（离线）。
+
+    ttl：开放区间（end=None）的尾部最多每 ttl 秒向数据源补一次新K线。
+    """
+
+    def __init__(self, root: str, source: Optional[DataSource] = None, ttl: float = 12 * 3600):
+        self.root = root
+        self.source = source
+        self.ttl = ttl
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # ---- 路径与元数据 ----
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, quote(interval, safe=""), quote(symbol, safe=""))
+
+    def _lock(self, symbol: str, interval: str) -> threading.Lock:
+        key = f"{interval}/{symbol}"
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def meta(self, symbol: str, interval: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._dir(symbol, interval), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _write_meta(self, d: str, meta: Dict[str, Any]):
+        tmp = os.path.join(d, f"meta.json.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(d, "meta.json"))
+
+    def symbols(self, interval: str = "1d") -> list:
+        from urllib.parse import unquote
+        d = os.path.join(self.root, quote(interval, safe=""))
+        if not os.path.isdir(d):
+            return []
+        return sorted(unquote(s) for s in os.listdir(d) if os.path.exists(os.path.join(d, s, "meta.json")))
+
+    # ---- 读写 ----
+    def _columns(self, symbol: str, interval: str, meta: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        vdir = os.path.join(self._dir(symbol, interval), meta["version"])
+        return {c: np.load(os.path.join(vdir, f"{c}.npy"), mmap_mode="r") for c in COLUMNS}
+
+    def read(self, symbol: str, interval: str = "1d", start=None, end=None,
+             tail: Optional[int] = None) -> pd.DataFrame:
+        """只读本地，返回 [start, end) 内的K线（date/open/high/low/close/volume）；tail 只取最后若干根。"""
+        meta = self.meta(symbol, interval)
+        if meta is None or meta["rows"] == 0:
+            return pd.DataFrame(columns=list(COLUMNS))
+        cols = self._columns(symbol, interval, meta)
+        lo = 0 if start is None else int(np.searchsorted(cols["date"], _bound_ns(start, meta["tz"]), "left"))
+        hi = len(cols["date"]) if end is None else int(np.searchsorted(cols["date"], _bound_ns(end, meta["tz"]), "left"))
+        if tail is not None:
+            lo = max(lo, hi - tail)
+        out = {c: np.array(cols[c][lo:hi]) for c in COLUMNS[1:]}
+        df = pd.DataFrame({"date": _from_ns(cols["date"][lo:hi], meta["tz"]), **out})
+        return df
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame, merge: bool = True,
+              **meta_updates) -> int:
+        """把 df 写入库中；merge=True 时与已有数据合并（重叠部分以新数据为准）。返回总行数。"""
+        d = self._dir(symbol, interval)
+        os.makedirs(d, exist_ok=True)
+        with self._lock(symbol, interval):
+            old_meta = self.meta(symbol, interval)
+            new = unify_ohlcv(df)
+            dates, tz = _to_ns(new["date"])
+            if old_meta is not None and tz is None:
+                tz = old_meta["tz"]
+            data = {"date": dates}
+            for c in COLUMNS[1:]:
+                data[c] = new[c].to_numpy(dtype=np.float64) if c in new.columns else np.full(len(new), np.nan)
+            order = np.argsort(data["date"], kind="stable")
+            data = {c: v[order] for c, v in data.items()}
+            if merge and old_meta is not None and old_meta["rows"] > 0 and len(data["date"]):
+                old = self._columns(symbol, interval, old_meta)
+                first_new, last_new = data["date"][0], data["date"][-1]
+                head = old["date"] < first_new
+                tail = old["date"] > last_new
+                data = {c: np.concatenate([np.asarray(old[c])[head], data[c], np.asarray(old[c])[tail]]) for c in COLUMNS}
+            elif merge and old_meta is not None and old_meta["rows"] > 0 and not len(data["date"]):
+                data = {c: np.array(v) for c, v in self._columns(symbol, interval, old_meta).items()}
+            # 同一时间戳保留最后一根
+            if len(data["date"]) > 1:
+                keep = np.append(data["date"][1:] != data["date"][:-1], True)
+                data = {c: v[keep] for c, v in data.items()}
+
+            version = f"v{(int(old_meta['version'][1:]) + 1) if old_meta else 1:06d}"
+            vdir = os.path.join(d, version)
+            os.makedirs(vdir, exist_ok=True)
+            for c in COLUMNS:
+                np.save(os.path.join(vdir, f"{c}.npy"), np.ascontiguousarray(data[c]))
+            meta = dict(old_meta or {"symbol": symbol, "interval": interval, "head": None,
+                                     "fetched_until": None, "checked_at": 0.0})
+            meta.update(version=version, tz=tz, rows=int(len(data["date"])),
+                        first=int(data["date"][0]) if len(data["date"]) else None,
+                        last=int(data["date"][-1]) if len(data["date"]) else None)
+            meta.update(meta_updates)
+            self._write_meta(d, meta)
+            if old_meta is not None and old_meta["version"] != version:
+                shutil.rmtree(os.path.join(d, old_meta["version"]), ignore_errors=True)
+            return meta["rows"]
+
+    # ---- 增量更新 ----
+    def update(self, symbol: str, interval: str = "1d", start=None, end=None) -> int:
+        """按需向数据源补齐 [start, end)：缺头补头、缺尾只拉最后一根之后的新K线。返回拉取行数。"""
+        if self.source is None:
+            return 0
+        meta = self.meta(symbol, interval)
+        if meta is None or meta["rows"] == 0:
+            df = self.source.get_history(symbol, start, end, interval)
+            self.write(symbol, interval, df, head=start and str(start),
+                       fetched_until=end and str(end), checked_at=time.time() if end is None else 0.0)
+            return len(df)
+
+        fetched = 0
+        tz = meta["tz"]
+        head = meta.get("head")
+        if head is not None and (start is None or _bound_ns(start, tz) < _bound_ns(head, tz)):
+            first = _from_ns(np.array([meta["first"]]), tz)[0]
+            df = self.source.get_history(symbol, start, str(first.date()), interval)
+            self.write(symbol, interval, df, head=start and str(start))
+            fetched += len(df)
+
+        need_tail = end is None or _bound_ns(end, tz) > meta["last"]
+        if need_tail and end is not None and meta.get("fetched_until") is not None:
+            need_tail = _bound_ns(end, tz) > _bound_ns(meta["fetched_until"], tz)
+        if need_tail and end is None:
+            need_tail = time.time() - float(meta.get("checked_at") or 0.0) >= self.ttl
+        if need_tail:
+            # 从最后一根的日期重新拉：最后一根可能是未收盘的半截K线
+            last = _from_ns(np.array([meta["last"]]), tz)[0]
+            df = self.source.get_history(symbol, str(last.date()), end, interval)
+            until = meta.get("fetched_until")
+            if end is not None and (until is None or _bound_ns(end, tz) > _bound_ns(until, tz)):
+                until = str(end)
+            checked = time.time() if end is None else meta.get("checked_at", 0.0)
+            self.write(symbol, interval, df, fetched_until=until, checked_at=checked)
+            fetched += len(df)
+        return fetched
+
+    # ---- DataSource 接口 ----
+    def get_history(self, symbol: str, start: Optional[str], end: Optional[str], interval: str) -> pd.DataFrame:
+        self.update(symbol, interval, start, end)
+        return self.read(symbol, interval, start, end)
+
+    def recent_bars(self, symbol: str, n: int, interval: str) -> pd.DataFrame:
+        meta = self.meta(symbol, interval)
+        if self.source is not None:
+            if meta is None or meta["rows"] == 0:
+                df = unify_ohlcv(self.source.recent_bars(symbol, n, interval))
+                head = str(pd.to_datetime(df["date"]).min()) if len(df) else None
+                self.write(symbol, interval, df, head=head, checked_at=time.time())
+            else:
+                last = _from_ns(np.array([meta["last"]]), meta["tz"])[0]
+                self.write(symbol, interval, self.source.get_history(symbol, str(last.date()), None, interval),
+                           checked_at=time.time())
+        return self.read(symbol, interval, tail=n)
@@ -1,41 +1,242 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from array import array
+from typing import Dict, Iterable, Iterator, Optional
+import numpy as np
 import pandas as pd
 from .config import TurtleConfig
-from .utils import donchian_high, donchian_low, atr_ema
+from .utils import atr_ema_values, rolling_max, rolling_min, shift1
+from .indicator_cache import IndicatorCache, fingerprint, get_default_cache
+
+def epoch_ns(ts) -> int:
+    """时间点 -> 纳秒整数（tz-aware 按 UTC）。"""
+    if type(ts) is pd.Timestamp:
+        return ts.value
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    return pd.Timestamp(ts).value
+
 
-@dataclass
 class Unit:
-    entry_price: float
-    direction: int  # +1 long, -1 short
-    size: int
-    stop: float
-    entry_date: pd.Timestamp
+    """单个持仓单位（视图 / 构造用）；入场时间以纳秒整数保存。"""
+    __slots__ = ("entry_price", "direction", "size", "stop", "entry_ns", "tz")
+
+    def __init__(self, entry_price: float, direction: int, size: int, stop: float, entry_date, tz=None):
+        self.entry_price = float(entry_price)
+        self.direction = int(direction)  # +1 long, -1 short
+        self.size = int(size)
+        self.stop = float(stop)
+        self.entry_ns = epoch_ns(entry_date)
+        self.tz = tz if tz is not None else getattr(entry_date, "tz", None)
+
+    @property
+    def entry_date(self) -> pd.Timestamp:
+        ts = pd.Timestamp(self.entry_ns)
+        return ts.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else ts
+
+    def _key(self):
+        return (self.entry_price, self.direction, self.size, self.stop, self.entry_ns)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Unit) and self._key() == other._key()
+
+    def __repr__(self) -> str:
+        return (f"Unit(entry_price={self.entry_price!r}, direction={self.direction}, size={self.size}, "
+                f"stop={self.stop!r}, entry_date={self.entry_date!r})")
+
+
+class UnitBook:
+    """一个标的的持仓单位，存放在定长的类型化数组里。
+
+    海龟的所有单位同向（空仓才会开新方向），方向只存一份；每个单位的 入场价 / 止损 / 数量
+    依次排在一个 double 数组里，入场时间（纳秒）在一个 int64 数组里。数组在第一次开仓时按
+    ``max_units`` 分配、满了才扩容，空仓标的不占数组；止损出场在原地前移压缩，逐根K线不分配对象。
+    ``tight`` 为当前最先触发的止损价（多头取最高、空头取最低），在开仓 / 压缩时维护，
+    多数K线只与它比较一次。
+    作为序列使用时（``len`` / 下标 / 迭代 / ``append(Unit)``）返回 :class:`Unit` 视图，供序列化与兼容旧代码。
+    """
+    __slots__ = ("capacity", "data", "dates", "n", "direction", "tz", "tight")
+
+    def __init__(self, capacity: int = 4):
+        self.capacity = max(int(capacity), 1)
+        self.data: Optional[array] = None   # [entry_price, stop, size] * capacity
+        self.dates: Optional[array] = None  # entry_ns * capacity
+        self.n = 0
+        self.direction = 0
+        self.tz = None  # 入场时间的时区（同一标的相同），序列化时还原
+        self.tight = 0.0  # n>0 时有效
+
+    def push(self, entry_price: float, direction: int, size: int, stop: float, entry_date):
+        n = self.n
+        if self.data is None:
+            self.data = array("d", bytes(24 * self.capacity))
+            self.dates = array("q", bytes(8 * self.capacity))
+        elif n == len(self.dates):
+            self.data.extend(self.data)
+            self.dates.extend(self.dates)
+        if type(entry_date) is pd.Timestamp:
+            ns, tz = entry_date.value, entry_date.tz
+        else:
+            ns, tz = epoch_ns(entry_date), getattr(entry_date, "tz", None)
+        k = 3 * n
+        data = self.data
+        data[k] = entry_price
+        data[k + 1] = stop
+        data[k + 2] = size
+        self.dates[n] = ns
+        if tz is not None:
+            self.tz = tz
+        if n == 0 or (stop > self.tight if direction == 1 else stop < self.tight):
+            self.tight = stop
+        self.direction = direction
+        self.n = n + 1
+
+    def append(self, u: Unit):
+        self.push(u.entry_price, u.direction, u.size, u.stop, u.entry_ns)
+        if u.tz is not None:
+            self.tz = u.tz
+
+    def pop(self) -> Unit:
+        if self.n == 0:
+            raise IndexError("pop from empty UnitBook")
+        u = self[self.n - 1]
+        self.n -= 1
+        self._retighten()
+        return u
+
+    def _retighten(self):
+        data, d = self.data, self.direction
+        for i in range(self.n):
+            stop = data[3 * i + 1]
+            if i == 0 or (stop > self.tight if d == 1 else stop < self.tight):
+                self.tight = stop
+
+    def clear(self):
+        self.n = 0
+
+    def replace(self, units: Iterable[Unit]):
+        units = list(units)  # 允许传入自身的切片
+        self.n = 0
+        for u in units:
+            self.append(u)
+
+    def entry_price(self, i: int) -> float:
+        return self.data[3 * i]
+
+    def take_stops(self, low: float, high: float, fills: list):
+        """触发止损的单位追加 ("stop", 数量, 止损价) 到 fills，并在原地移除。"""
+        d = self.direction
+        data, dates = self.data, self.dates
+        # 多数K线没有止损触发：先与最紧的止损价比较，可能命中才逐个处理
+        tight = self.tight
+        if (d == 1 and low > tight) or (d == -1 and high < tight):
+            return
+        j = 0
+        for i in range(self.n):
+            stop = data[3 * i + 1]
+            if (d == 1 and low <= stop) or (d == -1 and high >= stop):
+                fills.append(("stop", -d * int(data[3 * i + 2]), stop))
+            else:
+                if j != i:
+                    data[3 * j] = data[3 * i]
+                    data[3 * j + 1] = stop
+                    data[3 * j + 2] = data[3 * i + 2]
+                    dates[j] = dates[i]
+                # 留下的单位里重新取最紧的止损
+                if j == 0 or (stop > tight if d == 1 else stop < tight):
+                    tight = stop
+                j += 1
+        self.n = j
+        self.tight = tight
+
+    def total_size(self) -> int:
+        return int(sum(self.data[2:3 * self.n:3]))
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __bool__(self) -> bool:
+        return self.n > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(self.n))]
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("UnitBook index out of range")
+        data = self.data
+        return Unit(data[3 * i], self.direction, int(data[3 * i + 2]), data[3 * i + 1], self.dates[i], tz=self.tz)
+
+    def __iter__(self) -> Iterator[Unit]:
+        return (self[i] for i in range(self.n))
+
+    def __eq__(self, other) -> bool:
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
 
 class TurtleState:
-    def __init__(self):
-        self.units: List[Unit] = []
+    __slots__ = ("book", "last_s1_win", "last_breakout_price")
+
+    def __init__(self, capacity: int = 4):
+        self.book = UnitBook(capacity)
         self.last_s1_win: bool = False
         self.last_breakout_price: Optional[float] = None
 
+    @property
+    def units(self) -> UnitBook:
+        return self.book
+
+    @units.setter
+    def units(self, units: Iterable[Unit]):
+        if units is not self.book:
+            self.book.replace(units)
+
+def indicator_columns(high, low, close, cfg: TurtleConfig,
+                      cache: Optional[IndicatorCache] = None) -> Dict[str, np.ndarray]:
+    """N 与 S1/S2 唐奇安通道（均基于前一根K线），与 utils 中 pandas 版本逐位一致。
+
+    给定 cache 时按 (行情指纹, 种类, 长度, 字段) 复用已算过的序列。
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    fp = fingerprint(high, low, close) if cache is not None else ""
+
+    def series(kind: str, length: int) -> np.ndarray:
+        if kind == "atr":
+            field, fn = "hlc", lambda: atr_ema_values(high, low, close, length)
+        elif kind == "max":
+            field, fn = "high", lambda: rolling_max(shift1(high), length)
+        else:
+            field, fn = "low", lambda: rolling_min(shift1(low), length)
+        return fn() if cache is None else cache.get((fp, kind, length, field), fn)
+
+    cols = {"N": series("atr", cfg.atr_len)}
+    for name, sys_cfg in (("s1", cfg.s1), ("s2", cfg.s2)):
+        if sys_cfg:
+            cols[f"{name}_high"] = series("max", sys_cfg.entry_lookback)
+            cols[f"{name}_low"] = series("min", sys_cfg.entry_lookback)
+            cols[f"{name}_exit_high"] = series("max", sys_cfg.exit_lookback)
+            cols[f"{name}_exit_low"] = series("min", sys_cfg.exit_lookback)
+    return cols
+
 class TurtleStrategy:
-    def __init__(self, cfg: TurtleConfig):
+    def __init__(self, cfg: TurtleConfig, cache: Optional[IndicatorCache] = None):
         self.cfg = cfg
+        self.cache = cache  # None 时使用进程级默认缓存
 
     def prepare_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
-        df["N"] = atr_ema(df["high"], df["low"], df["close"], self.cfg.atr_len)
-        if self.cfg.s1:
-            df["s1_high"] = donchian_high(df["high"].shift(1), self.cfg.s1.entry_lookback)
-            df["s1_low"]  = donchian_low(df["low"].shift(1),  self.cfg.s1.entry_lookback)
-            df["s1_exit_high"] = donchian_high(df["high"].shift(1), self.cfg.s1.exit_lookback)
-            df["s1_exit_low"]  = donchian_low(df["low"].shift(1),  self.cfg.s1.exit_lookback)
-        if self.cfg.s2:
-            df["s2_high"] = donchian_high(df["high"].shift(1), self.cfg.s2.entry_lookback)
-            df["s2_low"]  = donchian_low(df["low"].shift(1),  self.cfg.s2.entry_lookback)
-            df["s2_exit_high"] = donchian_high(df["high"].shift(1), self.cfg.s2.exit_lookback)
-            df["s2_exit_low"]  = donchian_low(df["low"].shift(1), self.cfg.s2.exit_lookback)
-        return df
+        cache = self.cache if self.cache is not None else get_default_cache()
+        cols = indicator_columns(df["high"], df["low"], df["close"], self.cfg, cache=cache)
+        if any(c in df.columns for c in cols):
+            df = df.copy()
+            for c, v in cols.items():
+                df[c] = np.array(v)
+            return df
+        # 一次性拼接，避免逐列插入
+        return pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1)
 
     def _unit_size(self, equity: float, N: float, dollar_per_point: float) -> int:
         unit_risk = equity * self.cfg.risk_per_unit
@@ -52,18 +253,13 @@ class TurtleStrategy:
         fills = []
 
         # 1) 止损
-        still = []
-        for u in state.units:
-            stop_hit = (u.direction == 1 and row["low"] <= u.stop) or (u.direction == -1 and row["high"] >= u.stop)
-            if stop_hit:
-                fills.append(("stop", -u.direction * u.size, u.stop))
-            else:
-                still.append(u)
-        state.units = still
+        book = state.book
+        if book.n:
+            book.take_stops(row["low"], row["high"], fills)
 
         # 2) 系统退出（通道退出信号 -> 平仓）
-        if state.units:
-            direction = state.units[0].direction
+        if book.n:
+            direction = book.direction
             exit_hit = False
             if "s1_exit_low" in row and "s1_exit_high" in row:
                 if direction == 1 and row["close"] < row["s1_exit_low"]: exit_hit = True
@@ -72,16 +268,16 @@ class TurtleStrategy:
                 if direction == 1 and row["close"] < row["s2_exit_low"]: exit_hit = True
                 if direction == -1 and row["close"] > row["s2_exit_high"]: exit_hit = True
             if exit_hit:
-                total = sum(u.size for u in state.units) * direction
+                total = book.total_size() * direction
                 if total != 0:
                     fills.append(("exit", -direction * total, last_price))
                 if state.last_breakout_price is not None and "s1_high" in row:
                     pnl = (last_price - state.last_breakout_price) * direction
                     state.last_s1_win = pnl > 0
-                state.units = []
+                book.clear()
 
         # 3) 进场（若空仓）
-        if not state.units and N > 0:
+        if not book.n and N > 0:
             choose_dir = 0
             # S1：仅当上次S1非盈利时才进场
             if "s1_high" in row and "s1_low" in row:
@@ -102,22 +298,22 @@ class TurtleStrategy:
                 if size > 0:
                     entry_price = last_price
                     stop = self._new_stop(entry_price, choose_dir, N)
-                    state.units.append(Unit(entry_price, choose_dir, size, stop, today))
+                    book.push(entry_price, choose_dir, size, stop, today)
                     state.last_breakout_price = entry_price
                     state.last_s1_win = False
                     fills.append(("entry", choose_dir * size, entry_price))
 
         # 4) 金字塔加仓
-        if state.units and len(state.units) < self.cfg.pyramiding.max_units:
-            first = state.units[0]
-            k = len(state.units)  # 下一单位的索引
-            trigger = first.entry_price + first.direction * k * self.cfg.pyramiding.step_N * N
-            hit = (first.direction == 1 and row["high"] >= trigger) or (first.direction == -1 and row["low"] <= trigger)
+        if book.n and book.n < self.cfg.pyramiding.max_units:
+            direction = book.direction
+            k = book.n  # 下一单位的索引
+            trigger = book.entry_price(0) + direction * k * self.cfg.pyramiding.step_N * N
+            hit = (direction == 1 and row["high"] >= trigger) or (direction == -1 and row["low"] <= trigger)
             if hit:
                 size = self._unit_size(equity, N, dollar_per_point=dollar_per_point)
                 if size > 0:
-                    stop = self._new_stop(trigger, first.direction, N)
-                    state.units.append(Unit(trigger, first.direction, size, stop, today))
-                    fills.append(("add", first.direction * size, trigger))
+                    stop = self._new_stop(trigger, direction, N)
+                    book.push(trigger, direction, size, stop, today)
+                    fills.append(("add", direction * size, trigger))
 
-        return {"fills": fills, "units": state.units}
+        return {"fills": fills, "units": book}
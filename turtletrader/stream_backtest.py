@@ -0,0 +1,157 @@
+"""流式组合回测：按日期分块从本地行情库读K线，不把全部历史装进内存。
+
+每个标的只保留按块推进的指标状态（:class:`BlockIndicators`，大小受最长回看窗口限制）与策略状态；
+每读完一块，权益与成交追加写入 out_dir，内存中的成交账本只留 T+1 判断所需的最后一笔买入。
+峰值内存约为 标的数 ×（回看窗口 + 一块的K线数），与历史长度无关（权益序列每个日期一个数）。
+
+分块指标与 ``prepare_indicators`` 逐位一致，逐日撮合与内存引擎共用
+``PortfolioStepper.step_rows``，结果与 ``run_portfolio_backtest`` 相同。
+"""
+from typing import Any, Dict, List, Optional
+import os
+import numpy as np
+import pandas as pd
+from .config import PortfolioConfig
+from .portfolio_backtest import AlignedPanel, PortfolioStepper, save_summary
+from .profiling import get_profiler
+from .store import COLUMNS, MarketStore, _bound_ns, _from_ns
+from .streaming import BlockIndicators
+
+
+class StreamingSimulation(PortfolioStepper):
+    """从 MarketStore 分块推进的组合回测。
+
+    各标的读取 [ins.start, ins.end) 内的K线（与 ``--store`` 下内存引擎读到的相同），
+    指标从第一根起增量计算；start/end 把交易限制在 [start, end) 内。
+    chunk：每块覆盖的时间跨度（pandas Timedelta 字符串），决定一次读入多少根K线。
+    """
+    max_open = 2048
+
+    def __init__(self, store: MarketStore, cfg: PortfolioConfig, start=None, end=None, chunk: str = "180D"):
+        symbols = [ins.symbol for ins in cfg.instruments]
+        super().__init__(cfg, symbols)
+        self.store = store
+        self.indicators = {sym: BlockIndicators(cfg.turtle) for sym in symbols}
+        self.chunk = pd.Timedelta(chunk).value
+        self._written = 0   # 已写入 trades.csv 的成交数
+        self._kept = 0      # 账本中已写入、因 T+1 判断保留的行数
+        self._flushed = False
+        self._open: Dict[tuple, Dict[str, np.ndarray]] = {}
+        self._ranges: List[tuple] = []  # (标的, 周期, 时区, 起, 止)，UTC 纳秒
+        for ins in cfg.instruments:
+            if ins.base_interval and ins.base_interval != ins.interval:
+                raise ValueError(f"streaming backtest reads {ins.interval} bars directly; "
+                                 f"base_interval is not supported ({ins.symbol})")
+            meta = store.meta(ins.symbol, ins.interval)
+            if meta is None or not meta["rows"]:
+                raise ValueError(f"no {ins.interval} bars for {ins.symbol} in store {store.root}")
+            tz = meta["tz"]
+            lo = max(meta["first"], _bound_ns(ins.start, tz) or meta["first"])
+            hi = min(meta["last"] + 1, _bound_ns(ins.end, tz) or meta["last"] + 1)
+            self._ranges.append((ins.symbol, ins.interval, tz, lo, hi))
+        self.first = min((r[3] for r in self._ranges), default=0)
+        self.last = max((r[4] for r in self._ranges), default=0)
+        self.tz = next((r[2] for r in self._ranges if r[2]), None)
+        self.begin = _bound_ns(start, self.tz)
+        self.stop = _bound_ns(end, self.tz)
+
+    def _columns(self, sym: str, interval: str) -> Dict[str, np.ndarray]:
+        """标的的内存映射列，跨块复用；最多同时打开 max_open 个标的（每列一个映射，受进程映射数上限约束）。"""
+        key = (sym, interval)
+        cols = self._open.pop(key, None)
+        if cols is None:
+            if len(self._open) >= self.max_open:
+                self._open.pop(next(iter(self._open)))
+            cols = self.store._columns(sym, interval, self.store.meta(sym, interval))
+        self._open[key] = cols
+        return cols
+
+    def _read_chunk(self, c0: int, c1: int, prof) -> Optional[AlignedPanel]:
+        """[c0, c1) 内有K线的标的按联合时间轴对齐成面板（含指标列），标的顺序同配置。"""
+        parts = []
+        for sym, interval, tz, lo, hi in self._ranges:
+            a, b = max(c0, lo), min(c1, hi)
+            if a >= b:
+                continue
+            with prof.phase("read", sym):
+                mm = self._columns(sym, interval)
+                i, k = np.searchsorted(mm["date"], (a, b), "left").tolist()
+                cols = {c: np.array(mm[c][i:k]) for c in COLUMNS}
+            if i == k:
+                continue
+            with prof.phase("indicators", sym):
+                cols.update(self.indicators[sym].push(cols["high"], cols["low"], cols["close"]))
+            parts.append((sym, cols.pop("date"), cols))
+        if not parts:
+            return None
+        fields = list(parts[0][2])
+        keys = np.unique(np.concatenate([ns for _, ns, _ in parts]))
+        values = np.full((len(keys), len(parts), len(fields)), np.nan)
+        mask = np.zeros((len(keys), len(parts)), dtype=bool)
+        for j, (_, ns, cols) in enumerate(parts):
+            t = np.searchsorted(keys, ns)
+            values[t, j, :] = np.column_stack([cols[f] for f in fields])
+            mask[t, j] = True
+        self._keys = keys
+        return AlignedPanel(_from_ns(keys, self.tz).tolist(), [p[0] for p in parts], fields, values, mask,
+                            [None] * len(parts))
+
+    def run(self, out_dir: Optional[str] = None) -> "StreamingSimulation":
+        """跑完全部区间。给定 out_dir 时每块结束把权益与成交追加到 equity_curve.csv / trades.csv。"""
+        prof = get_profiler()
+        timed = prof.enabled
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        flushed_eq = 0
+        stop = self.last if self.stop is None else min(self.last, self.stop)
+        c0 = self.first
+        while c0 < stop:
+            c1 = min(c0 + self.chunk, stop)
+            panel = self._read_chunk(c0, c1, prof)
+            if panel is not None:
+                # 窗口之前只预热指标
+                t0 = 0 if self.begin is None else int(np.searchsorted(self._keys, self.begin))
+                for t in range(t0, len(panel.dates)):
+                    self.step_rows(panel.dates[t], panel.rows_at(t), prof, timed)
+            if out_dir:
+                flushed_eq = self._flush(out_dir, flushed_eq)
+            c0 = c1
+        if out_dir and c0 == self.first:
+            self._flush(out_dir, 0)  # 空区间也写出表头
+        return self
+
+    @property
+    def trade_count(self) -> int:
+        return self._written + len(self.port.trades) - self._kept
+
+    def _flush(self, out_dir: str, flushed_eq: int) -> int:
+        part = self.equity_series[flushed_eq:]
+        eq = pd.Series({pd.to_datetime(d): v for d, v in part}, dtype=float).sort_index()
+        pd.DataFrame({"equity": eq}).to_csv(os.path.join(out_dir, "equity_curve.csv"),
+                                            mode="a" if flushed_eq else "w", header=not flushed_eq)
+        trades = self.port.trades
+        trades.to_csv(os.path.join(out_dir, "trades.csv"), start=self._kept, append=self._flushed)
+        self._written += len(trades) - self._kept
+        self._flushed = True
+        # 落盘后只留每个标的最后一笔买入（T+1 判断用），持仓累计照旧
+        self.port.trades = trades.keep_last_buys()
+        self._kept = len(self.port.trades)
+        return len(self.equity_series)
+
+    def metrics(self, eq: Optional[pd.Series] = None) -> Dict[str, Any]:
+        out = super().metrics(eq)
+        out["total_trades"] = self.trade_count
+        return out
+
+
+def run_portfolio_backtest_streaming(store: MarketStore, cfg: PortfolioConfig, out_dir: str = None,
+                                     start=None, end=None, chunk: str = "180D", plot: bool = True) -> Dict[str, Any]:
+    """与 ``run_portfolio_backtest`` 相同的结果字典；给定 out_dir 时成交已分块写入
+    trades.csv，返回的 trades 为 None（不在内存中保留全部成交）。"""
+    sim = StreamingSimulation(store, cfg, start=start, end=end, chunk=chunk).run(out_dir)
+    eq = sim.equity()
+    metrics = sim.metrics(eq)
+    if out_dir:
+        save_summary(eq, metrics, out_dir, plot)
+    return {"metrics": metrics, "equity": eq, "trades": None if out_dir else sim.port.trades,
+            "positions": sim.port.positions}
@@ -0,0 +1,185 @@
+"""增量指标：每根新收盘K线 O(1) 更新 N 与 S1/S2 唐奇安通道。
+
+与 ``prepare_indicators``（utils 中的批量实现）在同一段K线序列上逐位一致：
+- N：true range 的 EMA（``ewm(span, adjust=False)``，递推公式与 pandas 相同）；
+- 通道：前一根及更早 lookback 根的最高/最低价，单调队列维护，窗口内有 NaN 时为 NaN。
+
+``push`` 提交一根已收盘K线；``peek`` 计算一根未收盘K线的指标但不改变状态。
+"""
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import math
+import numpy as np
+from .config import TurtleConfig
+from .utils import rolling_max, rolling_min, shift1
+
+
+def _fmax(a: float, b: float) -> float:
+    # 与 np.fmax 相同：忽略 NaN
+    if a != a:
+        return b
+    if b != b:
+        return a
+    return a if a >= b else b
+
+
+class RollingExtreme:
+    """滑动窗口最大/最小值（单调队列，摊还 O(1)）。"""
+
+    def __init__(self, lookback: int, is_max: bool = True):
+        self.lookback = lookback
+        self.is_max = is_max
+        self._dq: Deque[Tuple[int, float]] = deque()
+        self._nans: Deque[int] = deque()
+        self._n = 0
+
+    def push(self, x: float):
+        i = self._n
+        self._n += 1
+        if x != x:
+            self._nans.append(i)
+        else:
+            dq = self._dq
+            if self.is_max:
+                while dq and dq[-1][1] <= x:
+                    dq.pop()
+            else:
+                while dq and dq[-1][1] >= x:
+                    dq.pop()
+            dq.append((i, x))
+        lo = self._n - self.lookback
+        while self._dq and self._dq[0][0] < lo:
+            self._dq.popleft()
+        while self._nans and self._nans[0] < lo:
+            self._nans.popleft()
+
+    @property
+    def value(self) -> float:
+        """最近 lookback 个值的极值；不足 lookback 个或含 NaN 时为 NaN。"""
+        if self.lookback <= 0 or self._n < self.lookback or self._nans or not self._dq:
+            return math.nan
+        return self._dq[0][1]
+
+
+def _ema_step(alpha: float, weighted: float, old_wt: float, started: bool, tr: float) -> Tuple[float, float, bool]:
+    # pandas ewm(adjust=False, ignore_na=False) 的递推（含 NaN 时的权重衰减）
+    if not started:
+        return tr, 1.0, True
+    if weighted == weighted:
+        old_wt *= 1.0 - alpha
+        if tr == tr:
+            if weighted != tr:
+                weighted = old_wt * weighted + alpha * tr
+                weighted /= (old_wt + alpha)
+            old_wt = 1.0
+    elif tr == tr:
+        weighted = tr
+    return weighted, old_wt, True
+
+
+def _channel_specs(cfg: TurtleConfig):
+    """(列名, 回看长度, 是否取最高价)。"""
+    out = []
+    for name, sys_cfg in (("s1", cfg.s1), ("s2", cfg.s2)):
+        if sys_cfg:
+            out += [(f"{name}_high", sys_cfg.entry_lookback, True), (f"{name}_low", sys_cfg.entry_lookback, False),
+                    (f"{name}_exit_high", sys_cfg.exit_lookback, True), (f"{name}_exit_low", sys_cfg.exit_lookback, False)]
+    return out
+
+
+class IndicatorStream:
+    """单个标的的增量指标状态。"""
+
+    def __init__(self, cfg: TurtleConfig):
+        self.cfg = cfg
+        com = (cfg.atr_len - 1) / 2
+        self._alpha = 1.0 / (1.0 + com)
+        self._ema: float = math.nan
+        self._old_wt = 1.0
+        self._ema_started = False
+        self._prev_close: float = math.nan
+        self._channels: Dict[str, RollingExtreme] = {
+            col: RollingExtreme(lookback, is_max) for col, lookback, is_max in _channel_specs(cfg)}
+        self.count = 0
+        self.last_date: Any = None
+        self.last_row: Optional[Dict[str, Any]] = None
+
+    def _ema_next(self, tr: float) -> Tuple[float, float, bool]:
+        return _ema_step(self._alpha, self._ema, self._old_wt, self._ema_started, tr)
+
+    def _row(self, bar: Dict[str, Any]) -> Tuple[Dict[str, Any], Tuple[float, float, bool]]:
+        h, l, pc = float(bar["high"]), float(bar["low"]), self._prev_close
+        tr = _fmax(h - l, _fmax(abs(h - pc), abs(l - pc)))
+        ema = self._ema_next(tr)
+        row = dict(bar)
+        row["N"] = ema[0]
+        for name, ch in self._channels.items():
+            row[name] = ch.value  # 通道只用此前已收盘的K线
+        row["prev_close"] = pc
+        return row, ema
+
+    def peek(self, bar: Dict[str, Any]) -> Dict[str, Any]:
+        """未收盘K线的 row（含 N、通道、prev_close），不改变状态。"""
+        return self._row(bar)[0]
+
+    def push(self, bar: Dict[str, Any]) -> Dict[str, Any]:
+        """提交一根已收盘K线，返回其 row。"""
+        row, (self._ema, self._old_wt, self._ema_started) = self._row(bar)
+        h, l = float(bar["high"]), float(bar["low"])
+        for name, ch in self._channels.items():
+            ch.push(h if ch.is_max else l)
+        self._prev_close = float(bar["close"])
+        self.count += 1
+        self.last_date = bar.get("date")
+        self.last_row = row
+        return row
+
+
+class BlockIndicators:
+    """按块推进的增量指标：一次提交一段已收盘K线（NumPy 列），结果与逐根 ``push`` 相同。
+
+    通道在 [保留的最近 max(lookback) 根 + 本块] 上用向量化的 rolling 计算，N 的 EMA 逐根递推；
+    状态只有最近 max(lookback) 根的高低价、前收与 EMA 权重，适合流式回测分块读取。
+    """
+
+    def __init__(self, cfg: TurtleConfig):
+        self.cfg = cfg
+        self._alpha = 1.0 / (1.0 + (cfg.atr_len - 1) / 2)
+        self._ema = (math.nan, 1.0, False)
+        self._prev_close = math.nan
+        self._specs = _channel_specs(cfg)
+        self._keep = max((lookback for _, lookback, _ in self._specs), default=0)
+        self._high = np.empty(0)
+        self._low = np.empty(0)
+        self.count = 0
+
+    def push(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Dict[str, np.ndarray]:
+        """提交一段K线，返回同长度的 N、各通道与 prev_close 列。"""
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        close = np.asarray(close, dtype=np.float64)
+        n = len(close)
+        prev_close = np.empty(n)
+        prev_close[:1] = self._prev_close
+        prev_close[1:] = close[:-1]
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        N = np.empty(n)
+        alpha, state = self._alpha, self._ema
+        for i, x in enumerate(tr.tolist()):
+            state = _ema_step(alpha, state[0], state[1], state[2], x)
+            N[i] = state[0]
+        out = {"N": N}
+        k = len(self._high)
+        hist_high = np.concatenate([self._high, high])
+        hist_low = np.concatenate([self._low, low])
+        for col, lookback, is_max in self._specs:
+            fn = rolling_max if is_max else rolling_min
+            out[col] = fn(shift1(hist_high if is_max else hist_low), lookback)[k:]
+        out["prev_close"] = prev_close
+        if n:
+            self._ema = state
+            self._prev_close = float(close[-1])
+            self._high = hist_high[-self._keep:] if self._keep else hist_high[:0]
+            self._low = hist_low[-self._keep:] if self._keep else hist_low[:0]
+        self.count += n
+        return out
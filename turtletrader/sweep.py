@@ -0,0 +1,153 @@
+"""参数批量回测（sweep）：多组 TurtleConfig 在同一份行情上共享指标计算。
+
+每个不同的 ATR 长度、唐奇安回看期只算一次；各组参数随后在共享数组上跑
+:func:`turtletrader.engine.simulate`，净值按块堆成 (configs, time) 矩阵后一次性算出指标。
+单组结果与 ``run_backtest(df, cfg)`` 一致。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import copy
+import itertools
+import numpy as np
+import pandas as pd
+from .config import TurtleConfig
+from .engine import BarArrays, simulate
+from .indicator_cache import IndicatorCache, fingerprint, get_default_cache
+from .utils import atr_ema_values, rolling_max, rolling_min, shift1
+from .metrics import equity_metrics
+
+
+class SharedIndicators:
+    """同一份 OHLC 上按 (种类, 长度) 记忆化的 N 与通道数组。
+
+    本地 memo 保证一次 sweep 内每个序列只算一次；未命中时再经由 IndicatorCache
+    （默认进程级缓存，可带磁盘层）在多次运行、多个进程间复用。
+    """
+
+    def __init__(self, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 cache: Optional[IndicatorCache] = None):
+        self.open = np.ascontiguousarray(open_, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.cache = cache if cache is not None else get_default_cache()
+        self._fp = fingerprint(self.high, self.low, self.close)
+        self._memo: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def _get(self, kind: str, length: int) -> np.ndarray:
+        key = (kind, length)
+        out = self._memo.get(key)
+        if out is None:
+            if kind == "atr":
+                field, fn = "hlc", lambda: atr_ema_values(self.high, self.low, self.close, length)
+            elif kind == "max":
+                field, fn = "high", lambda: rolling_max(shift1(self.high), length)
+            else:
+                field, fn = "low", lambda: rolling_min(shift1(self.low), length)
+            out = self._memo[key] = self.cache.get((self._fp, kind, length, field), fn)
+        return out
+
+    def bars(self, cfg: TurtleConfig) -> BarArrays:
+        channels = {}
+        for name, sys_cfg in (("s1", cfg.s1), ("s2", cfg.s2)):
+            if sys_cfg:
+                channels[f"{name}_high"] = self._get("max", sys_cfg.entry_lookback)
+                channels[f"{name}_low"] = self._get("min", sys_cfg.entry_lookback)
+                channels[f"{name}_exit_high"] = self._get("max", sys_cfg.exit_lookback)
+                channels[f"{name}_exit_low"] = self._get("min", sys_cfg.exit_lookback)
+        return BarArrays(open=self.open, high=self.high, low=self.low, close=self.close,
+                         N=self._get("atr", cfg.atr_len), **channels)
+
+    def __len__(self) -> int:
+        return len(self._memo)
+
+
+def config_params(cfg: TurtleConfig) -> Dict[str, Any]:
+    """把一组参数摊平成一行（sweep 结果表的参数列）。"""
+    p: Dict[str, Any] = {"risk_per_unit": cfg.risk_per_unit, "atr_len": cfg.atr_len}
+    for name, sys_cfg in (("s1", cfg.s1), ("s2", cfg.s2)):
+        p[f"{name}_entry"] = sys_cfg.entry_lookback if sys_cfg else None
+        p[f"{name}_exit"] = sys_cfg.exit_lookback if sys_cfg else None
+    p["step_N"] = cfg.pyramiding.step_N
+    p["max_units"] = cfg.pyramiding.max_units
+    p["stop_N"] = cfg.pyramiding.stop_N
+    return p
+
+
+def expand_grid(base: Dict[str, Any], grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按 grid 中的列表做笛卡尔积，逐个深度覆盖到 base（与单标配置 YAML 同结构）。"""
+    def leaves(d: Dict[str, Any], prefix: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], list]]:
+        for k, v in d.items():
+            if isinstance(v, dict):
+                yield from leaves(v, prefix + (k,))
+            else:
+                yield prefix + (k,), v if isinstance(v, list) else [v]
+
+    items = list(leaves(grid or {}))
+    if not items:
+        return [copy.deepcopy(base)]
+    paths = [p for p, _ in items]
+    out = []
+    for combo in itertools.product(*[vals for _, vals in items]):
+        y = copy.deepcopy(base)
+        for path, val in zip(paths, combo):
+            node = y
+            for k in path[:-1]:
+                node = node.setdefault(k, {})
+            node[path[-1]] = val
+        out.append(y)
+    return out
+
+
+def _sweep_chunk(ohlc: Tuple[np.ndarray, ...], dates: np.ndarray, configs: Sequence[TurtleConfig],
+                 init_equity: float) -> pd.DataFrame:
+    shared = SharedIndicators(*ohlc)
+    index = pd.DatetimeIndex(dates)
+    eq = np.empty((len(configs), len(index)))
+    n_trades = np.empty(len(configs), dtype=np.int64)
+    final_pos = np.empty(len(configs), dtype=np.int64)
+    for k, cfg in enumerate(configs):
+        eq[k], fills, final_pos[k] = simulate(shared.bars(cfg), cfg, init_equity=init_equity)
+        n_trades[k] = len(fills)
+
+    perf = equity_metrics(eq, index)
+    empty = len(index) == 0
+    metrics = pd.DataFrame({
+        "start": None if empty else str(index[0].date()),
+        "end": None if empty else str(index[-1].date()),
+        "start_equity": 0.0 if empty else eq[:, 0],
+        "end_equity": 0.0 if empty else eq[:, -1],
+        "cagr": perf["cagr"].to_numpy(),
+        "sharpe": perf["sharpe"].to_numpy(),
+        "max_drawdown": perf["max_drawdown"].to_numpy(),
+        "sortino": perf["sortino"].to_numpy(),
+        "calmar": perf["calmar"].to_numpy(),
+        "total_trades": n_trades,
+        "final_position": final_pos,
+    }, index=range(len(configs)))
+    params = pd.DataFrame([config_params(c) for c in configs])
+    return pd.concat([params, metrics], axis=1)
+
+
+def run_sweep(df: pd.DataFrame, configs: Sequence[TurtleConfig], init_equity: float = 100_000.0,
+              workers: int = 0, chunk_size: int = 256) -> pd.DataFrame:
+    """对同一标的批量评估多组参数，返回 参数列 + run_backtest 同名指标列 的表（顺序同 configs）。
+
+    workers>1 时按块分发到进程池；每块在进程内共享指标。
+    """
+    df = df.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date").reset_index(drop=True)
+    ohlc = tuple(df[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close"))
+    dates = df["date"].to_numpy()
+    configs = list(configs)
+    chunks = [configs[i:i + chunk_size] for i in range(0, len(configs), chunk_size)]
+    if not chunks:
+        return pd.DataFrame()
+    if workers and workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_sweep_chunk, [ohlc] * len(chunks), [dates] * len(chunks),
+                                chunks, [init_equity] * len(chunks)))
+    else:
+        parts = [_sweep_chunk(ohlc, dates, chunk, init_equity) for chunk in chunks]
+    return pd.concat(parts, ignore_index=True)
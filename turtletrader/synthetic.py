@@ -0,0 +1,81 @@
+"""可复现的合成行情：带趋势/震荡/高波动的 regime 切换、跳空，以及 A 股涨跌停封板日。
+
+只依赖 NumPy 随机数（给定 seed 结果固定），用于基准测试与离线测试，不访问任何数据源。
+"""
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from .config import InstrumentConfig, RuleConfig
+
+# (日漂移, 日波动) —— 上升趋势 / 下降趋势 / 震荡 / 高波动
+REGIMES = ((0.0012, 0.012), (-0.0010, 0.014), (0.0, 0.008), (0.0, 0.030))
+
+
+def synthetic_ohlcv(n: int = 2500, seed: int = 0, start: str = "2010-01-04", start_price: float = 100.0,
+                    regime_len: float = 120.0, gap_prob: float = 0.02, gap_scale: float = 0.04,
+                    limit_rate: float = 0.0, lock_prob: float = 0.01) -> pd.DataFrame:
+    """生成 n 根日线（工作日）。
+
+    regime 平均持续 regime_len 根后随机切换；每根以 gap_prob 的概率在开盘跳空。
+    limit_rate>0 时按 A 股规则把涨跌幅截断在 ±limit_rate，并以 lock_prob 的概率出现
+    一字板（开=高=低=收=涨停或跌停价）。
+    """
+    rng = np.random.default_rng(seed)
+    switch = rng.random(n) < 1.0 / max(regime_len, 1.0)
+    regime = np.cumsum(switch) % len(REGIMES)
+    regime = (regime + rng.integers(len(REGIMES))) % len(REGIMES)
+    drift = np.array([REGIMES[r][0] for r in range(len(REGIMES))])[regime]
+    vol = np.array([REGIMES[r][1] for r in range(len(REGIMES))])[regime]
+    gaps = np.where(rng.random(n) < gap_prob, rng.normal(0, gap_scale, n), 0.0)
+    intraday = rng.normal(drift, vol, n)
+    open_ret = gaps + rng.normal(0, vol * 0.25, n)
+    lock = rng.random(n) < lock_prob if limit_rate > 0 else np.zeros(n, dtype=bool)
+    lock_dir = np.where(rng.random(n) < 0.5, 1.0, -1.0)
+    wick_hi = np.abs(rng.normal(0, 0.5, n)) * vol
+    wick_lo = np.abs(rng.normal(0, 0.5, n)) * vol
+    volume = np.round(rng.lognormal(13, 0.5, n))
+
+    o = np.empty(n); h = np.empty(n); l = np.empty(n); c = np.empty(n)
+    prev = start_price
+    for i in range(n):
+        if lock[i]:
+            # 不取整：封板价与 Portfolio._cn_limit_block 用前收算出的涨跌停价一致
+            px = prev * (1 + lock_dir[i] * limit_rate)
+            o[i] = h[i] = l[i] = c[i] = px
+            prev = px
+            continue
+        op = prev * np.exp(open_ret[i])
+        cl = op * np.exp(intraday[i])
+        hi = max(op, cl) * (1 + wick_hi[i])
+        lo = min(op, cl) * (1 - wick_lo[i])
+        if limit_rate > 0:
+            up, dn = prev * (1 + limit_rate), prev * (1 - limit_rate)
+            op, cl, hi, lo = (min(max(x, dn), up) for x in (op, cl, hi, lo))
+        o[i], h[i], l[i], c[i] = op, hi, lo, cl
+        prev = cl
+    dates = pd.bdate_range(start, periods=n)
+    return pd.DataFrame({"date": dates, "open": o, "high": h, "low": l, "close": c, "volume": volume})
+
+
+def synthetic_universe(n_symbols: int, n_bars: int = 2500, seed: int = 0, cn_fraction: float = 0.3,
+                       start: str = "2010-01-04") -> Tuple[Dict[str, pd.DataFrame], List[InstrumentConfig]]:
+    """n_symbols 个标的的行情与对应 InstrumentConfig；前 cn_fraction 比例为 A 股规则（T+1、10% 涨跌停、禁空）。
+
+    各标的起始日期错开若干根，使联合时间轴上的缺失更接近真实组合。
+    """
+    data: Dict[str, pd.DataFrame] = {}
+    instruments: List[InstrumentConfig] = []
+    n_cn = int(round(n_symbols * cn_fraction))
+    rng = np.random.default_rng(seed)
+    offsets = rng.integers(0, max(n_bars // 20, 1), n_symbols)
+    for k in range(n_symbols):
+        cn = k < n_cn
+        sym = f"{600000 + k}" if cn else f"SYN{k:04d}"
+        df = synthetic_ohlcv(n_bars - int(offsets[k]), seed=seed * 100_003 + k,
+                             start=str(pd.bdate_range(start, periods=int(offsets[k]) + 1)[-1].date()),
+                             start_price=float(rng.uniform(5, 300)),
+                             limit_rate=0.10 if cn else 0.0)
+        data[sym] = df
+        rules = RuleConfig(allow_short=False, t_plus_one=True, limit_rate=0.10) if cn else RuleConfig()
+        instruments.append(InstrumentConfig(sym, group="a_shares" if cn else "equities", rules=rules))
+    return data, instruments
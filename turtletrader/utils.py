@@ -33,6 +33,47 @@ def donchian_high(series: pd.Series, lookback: int) -> pd.Series:
 def donchian_low(series: pd.Series, lookback: int) -> pd.Series:
     return series.rolling(lookback).min()
 
+def shift1(values: np.ndarray) -> np.ndarray:
+    """NumPy 版 ``Series.shift(1)``（首元素为 NaN）。"""
+    out = np.empty(len(values), dtype=np.float64)
+    out[:1] = np.nan
+    out[1:] = values[:-1]
+    return out
+
+def _rolling(values: np.ndarray, lookback: int, ufunc) -> np.ndarray:
+    # van Herk / Gil-Werman：按 lookback 分块做块内前缀/后缀累积，O(n) 且结果精确；二维时沿最后一维逐行计算
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    out = np.full(values.shape, np.nan)
+    if lookback <= 0 or lookback > n:
+        return out
+    nblocks = -(-n // lookback)
+    padded = np.empty(values.shape[:-1] + (nblocks * lookback,))
+    padded[..., :n] = values
+    padded[..., n:] = values[..., -1:]
+    blocks = padded.reshape(values.shape[:-1] + (nblocks, lookback))
+    prefix = ufunc.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    # 窗口 [i, i+lookback-1] = 块后缀(i) ∪ 块前缀(i+lookback-1)；NaN 会传播，与 rolling(min_periods=lookback) 一致
+    out[..., lookback - 1:] = ufunc(suffix[..., :n - lookback + 1], prefix[..., lookback - 1:n])
+    return out
+
+def rolling_max(values: np.ndarray, lookback: int) -> np.ndarray:
+    """NumPy 版 ``donchian_high``，结果与 pandas rolling 逐位相同。"""
+    return _rolling(values, lookback, np.maximum)
+
+def rolling_min(values: np.ndarray, lookback: int) -> np.ndarray:
+    """NumPy 版 ``donchian_low``，结果与 pandas rolling 逐位相同。"""
+    return _rolling(values, lookback, np.minimum)
+
+def atr_ema_values(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
+    """NumPy 输入输出的 ``atr_ema``（true range 用 fmax 等价于 skipna 的 max）。"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    prev_close = shift1(np.asarray(close, dtype=np.float64))
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return ema(pd.Series(tr), length).to_numpy()
+
 def max_drawdown(equity: pd.Series) -> float:
     cummax = equity.cummax()
     dd = (equity / cummax) - 1.0
@@ -51,6 +92,33 @@ def annual_return(equity: pd.Series) -> float:
     years = max((equity.index[-1] - equity.index[0]).days / 365.25, 1e-6)
     return (end / start) ** (1/years) - 1.0
 
+def max_drawdown_2d(equity: np.ndarray) -> np.ndarray:
+    """逐行的 ``max_drawdown``：equity 形如 (runs, time)。"""
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    if equity.shape[1] == 0:
+        return np.full(equity.shape[0], np.nan)
+    cummax = np.maximum.accumulate(equity, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.min(equity / cummax - 1.0, axis=1)
+
+def sharpe_2d(returns: np.ndarray, risk_free=0.0) -> np.ndarray:
+    """逐行的 ``sharpe``：returns 形如 (runs, time)，std 与 pandas 一样取 ddof=1。"""
+    returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = returns.mean(axis=1) if returns.shape[1] else np.full(returns.shape[0], np.nan)
+        std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.full(returns.shape[0], np.nan)
+        out = (mean - risk_free/252) / (std + 1e-12) * (252 ** 0.5)
+    return np.where(std == 0, 0.0, out)
+
+def annual_return_2d(equity: np.ndarray, index: pd.DatetimeIndex) -> np.ndarray:
+    """逐行的 ``annual_return``：所有行共用同一个时间轴 index。"""
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    if equity.shape[1] == 0:
+        return np.zeros(equity.shape[0])
+    years = max((index[-1] - index[0]).days / 365.25, 1e-6)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (equity[:, -1] / equity[:, 0]) ** (1/years) - 1.0
+
 def unify_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
     """Normalize column names: date/open/high/low/close[/volume]."""
     cols = {c.lower(): c for c in df.columns}
@@ -0,0 +1,154 @@
+"""Walk-forward 分析：滚动（rolling）或锚定（anchored）的训练/测试窗口，每折在独立进程里寻优并做样本外评估。
+
+- 折按组合联合时间轴的K线数切分：训练 ``train`` 根、测试 ``test`` 根，最后一折测试窗延伸到末尾；
+- 指标在全部历史上计算（经 IndicatorCache，按行情指纹复用，可挂磁盘层在进程间共享），
+  每折只在自己的日期窗口内交易，窗口开头无需重新预热；
+- 行情放进共享内存数据集，经进程池 initializer 只传句柄，各进程映射同一份内存；
+- 输出拼接后的样本外净值（各折收益率首尾相接）与逐折指标。
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+import json
+import os
+import pandas as pd
+from .config import PortfolioConfig
+from .dataset import Dataset, share_dataset
+from .portfolio_backtest import PortfolioSimulation
+from .utils import annual_return, max_drawdown, sharpe
+
+
+@dataclass
+class Fold:
+    index: int
+    train_start: Any
+    train_end: Any   # 不含
+    test_start: Any
+    test_end: Any    # 不含；最后一折为 None（到末尾）
+
+
+def union_dates(data_map: Dict[str, pd.DataFrame]) -> pd.DatetimeIndex:
+    if not data_map:
+        return pd.DatetimeIndex([])
+    dates = pd.concat([pd.to_datetime(df["date"]) for df in data_map.values()], ignore_index=True)
+    return pd.DatetimeIndex(dates.unique()).sort_values()
+
+
+def make_folds(dates: pd.DatetimeIndex, folds: int, train: Optional[int] = None, test: Optional[int] = None,
+               anchored: bool = False) -> List[Fold]:
+    """在日期轴上切 folds 折。train/test 为K线数；省略 test 时用 train 之后的部分等分。"""
+    n = len(dates)
+    if folds < 1:
+        raise ValueError("folds must be >= 1")
+    if test is None:
+        train = train if train is not None else n // (folds + 1)
+        test = (n - train) // folds
+    if train is None:
+        train = n - folds * test
+    if train <= 0 or test <= 0 or train + folds * test > n:
+        raise ValueError(f"cannot fit {folds} folds of train={train}, test={test} into {n} bars")
+    out = []
+    first_test = n - folds * test
+    for i in range(folds):
+        ts = first_test + i * test
+        te = ts + test
+        tr = 0 if anchored else ts - train
+        out.append(Fold(i, dates[tr], dates[ts], dates[ts], dates[te] if te < n and i < folds - 1 else None))
+    return out
+
+
+def stitch(curves: List[pd.Series], init_equity: float) -> pd.Series:
+    """把各折样本外净值按收益率首尾相接成一条曲线。"""
+    parts = []
+    level = init_equity
+    for eq in curves:
+        if eq.empty:
+            continue
+        part = eq / float(eq.iloc[0]) * level
+        parts.append(part)
+        level = float(part.iloc[-1])
+    return pd.concat(parts) if parts else pd.Series(dtype=float)
+
+
+def curve_metrics(eq: pd.Series) -> Dict[str, Any]:
+    rets = eq.pct_change().dropna()
+    return {
+        "start": str(eq.index[0].date()) if not eq.empty else None,
+        "end": str(eq.index[-1].date()) if not eq.empty else None,
+        "start_equity": float(eq.iloc[0]) if not eq.empty else 0.0,
+        "end_equity": float(eq.iloc[-1]) if not eq.empty else 0.0,
+        "cagr": float(annual_return(eq)),
+        "sharpe": float(sharpe(rets)),
+        "max_drawdown": float(max_drawdown(eq)),
+    }
+
+
+# ---- 每折（在工作进程内执行） ----
+_DATA: Dict[str, Any] = {}
+
+
+def _init_worker(data_map: Dict[str, pd.DataFrame], cache_dir: Optional[str]):
+    if isinstance(data_map, Dataset):
+        _DATA["dataset"], data_map = data_map, data_map.frames()
+    _DATA["data_map"] = data_map
+    if cache_dir:
+        from .indicator_cache import IndicatorCache, set_default_cache
+        set_default_cache(IndicatorCache(disk_dir=cache_dir))
+
+
+def run_fold(fold: Fold, base: PortfolioConfig, space: Dict[str, Any], opt_kwargs: Dict[str, Any],
+             out_dir: str) -> Dict[str, Any]:
+    """训练窗内寻优（space 为空则直接用 base），再在测试窗做样本外回测。"""
+    data_map = _DATA["data_map"]
+    cfg, params, is_value = base, {}, None
+    if space and opt_kwargs.get("n_trials", 0) > 0:
+        from .optimize import apply_params, portfolio_data, run_optimize
+        study = run_optimize(base, space, portfolio_data(data_map, fold.train_start, fold.train_end),
+                             workers=1, out_dir=os.path.join(out_dir, f"fold_{fold.index:02d}"),
+                             study_name=f"fold_{fold.index:02d}", **opt_kwargs)
+        params, is_value = study.best_params, study.best_value
+        cfg = apply_params(base, params)
+    sim = PortfolioSimulation(data_map, cfg, start=fold.test_start, end=fold.test_end).advance()
+    eq = sim.equity()
+    return {"fold": fold, "params": params, "is_value": is_value, "equity": eq,
+            "metrics": dict(curve_metrics(eq), total_trades=len(sim.port.trades))}
+
+
+def run_walk_forward(data_map: Dict[str, pd.DataFrame], base: PortfolioConfig, space: Optional[Dict[str, Any]] = None,
+                     folds: int = 5, train: Optional[int] = None, test: Optional[int] = None, anchored: bool = False,
+                     workers: int = 0, out_dir: Optional[str] = None, indicator_cache: Optional[str] = None,
+                     **opt_kwargs) -> Dict[str, Any]:
+    """返回 {"folds": 逐折表, "equity": 拼接的样本外净值, "metrics": 样本外整体指标}。
+
+    opt_kwargs 透传给 :func:`turtletrader.optimize.run_optimize`（n_trials、metric、pruner、segments...）。
+    """
+    dates = union_dates(data_map)
+    fold_list = make_folds(dates, folds, train, test, anchored)
+    out_dir = out_dir or "./walkforward"
+    os.makedirs(out_dir, exist_ok=True)
+    workers = min(max(int(workers or 1), 1), len(fold_list))
+    space = space or {}
+    if workers <= 1:
+        _init_worker(data_map, indicator_cache)
+        results = [run_fold(f, base, space, opt_kwargs, out_dir) for f in fold_list]
+    else:
+        # 行情放进共享内存，只把句柄传给各进程
+        with share_dataset(data_map) as ds, ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(ds, indicator_cache)) as ex:
+            futs = [ex.submit(run_fold, f, base, space, opt_kwargs, out_dir) for f in fold_list]
+            results = [f.result() for f in futs]
+
+    oos = stitch([r["equity"] for r in results], base.account_init_equity)
+    rows = []
+    for r in results:
+        f = asdict(r["fold"])
+        rows.append({**{k: (str(v.date()) if isinstance(v, pd.Timestamp) else v) for k, v in f.items()},
+                     "is_value": r["is_value"], "params": json.dumps(r["params"]), **r["metrics"]})
+    table = pd.DataFrame(rows)
+    metrics = curve_metrics(oos)
+    table.to_csv(os.path.join(out_dir, "folds.csv"), index=False)
+    pd.DataFrame({"equity": oos}).to_csv(os.path.join(out_dir, "oos_equity.csv"))
+    with open(os.path.join(out_dir, "metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+    return {"folds": table, "equity": oos, "metrics": metrics}